@@ -1,3 +1,65 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+
+from core.models import Category, Item, Order, OrderItem, SubCategory
+
+
+class OrderHistoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        merch = Category.objects.create(label="Merch", url_name="merch")
+        mugs = SubCategory.objects.create(category=merch, label="Mugs", url_name="mugs")
+        self.mug = Item.objects.create(
+            label="Everroot Grove Mug", category=merch, subcategory=mugs, price=Decimal("18.00")
+        )
+        self.poster = Item.objects.create(
+            label="Vaeloria Poster", category=merch, subcategory=mugs, price=Decimal("7.50")
+        )
+        self.user = User.objects.create_user("buyer", password="pw")
+        self.client.login(username="buyer", password="pw")
+
+    def add_orders(self, n):
+        for _ in range(n):
+            order = Order.objects.create(user=self.user, total_price=Decimal("43.50"))
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, item=self.mug, quantity=2, price_at_purchase=Decimal("18.00")),
+                OrderItem(order=order, item=self.poster, quantity=1, price_at_purchase=Decimal("7.50")),
+            ])
+
+    def test_page_costs_the_same_for_any_number_of_orders(self):
+        self.add_orders(3)
+        # session, user, cart badge, one page of orders with their unit counts
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("order_history"))
+        self.assertEqual([o.item_count for o in response.context["orders"]], [3, 3, 3])
+
+        self.add_orders(60)
+        with self.settings(ORDER_HISTORY_PAGE_SIZE=50), self.assertNumQueries(4):
+            response = self.client.get(reverse("order_history"))
+        page = response.context["page"]
+        self.assertEqual(len(page), 50)
+
+        response = self.client.get(reverse("order_history"), {"cursor": page.next_cursor})
+        self.assertEqual(len(response.context["page"]), 13)
+        self.assertFalse(response.context["page"].has_next)
+
+    def test_line_totals_come_from_sql(self):
+        self.add_orders(1)
+        order = Order.objects.get()
+        self.client.get(reverse("order_detail", args=[order.id]))
+        # session, user, cart badge, order, lines with their items
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse("order_detail", args=[order.id]))
+        self.assertEqual([row.total for row in response.context["order_items"]],
+                         [Decimal("36.00"), Decimal("7.50")])
+        self.assertContains(response, "36.00")
 
-# Create your tests here.
+    def test_other_users_orders_are_hidden(self):
+        other = User.objects.create_user("other", password="pw")
+        Order.objects.create(user=other)
+        response = self.client.get(reverse("order_history"))
+        self.assertEqual(len(response.context["orders"]), 0)
@@ -7,6 +7,7 @@ urlpatterns = [
     path("logout/", views.logout_view, name="logout"),
     path("profile/", views.profile_view, name="profile"),
     path("dashboard/", views.dashboard_view, name="dashboard"),
+    path("orders/", views.order_history_view, name="order_history"),
     path("orders/<int:order_id>/", views.order_detail_view, name="order_detail"),
 
 ]
@@ -1,13 +1,16 @@
-from decimal import Decimal
+import uuid
 
+from django.conf import settings
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 
 from .forms import UserRegisterForm, UserProfileForm
-from core.models import WishlistItem, Item, Order, OrderItem
-from core.views import _get_cart
+from core.models import WishlistItem, Order, OrderItem
+from core.cart import get_cart
+from core.pagination import paginate_keyset
 
 
 def register_view(request):
@@ -69,44 +72,56 @@ def dashboard_view(request):
         .order_by("-created_at")
     )
 
-    cart = _get_cart(request.session)
-    item_ids = [int(k) for k in cart.keys()]
-    items = Item.objects.filter(id__in=item_ids)
-
-    cart_items = []
-    cart_total = 0
-    for item in items:
-        qty = cart.get(str(item.id), 0)
-        if qty <= 0:
-            continue
-        line_total = item.price * qty
-        cart_total += line_total
-        cart_items.append(
-            {
-                "item": item,
-                "quantity": qty,
-                "line_total": line_total,
-            }
-        )
+    priced = get_cart(request).priced()
 
-    orders = (
-        Order.objects.filter(user=request.user)
-        .order_by("-created_at")[:5]
-    )
+    orders = _orders_with_totals(request.user).order_by("-created_at", "-id")[:5]
 
     context = {
         "wishlist_items": wishlist_items,
-        "cart_items": cart_items,
-        "cart_total": cart_total,
+        "cart_items": priced.lines,
+        "cart_total": priced.total,
         "orders": orders,
+        "checkout_key": uuid.uuid4().hex,
     }
     return render(request, "accounts/dashboard.html", context)
 
 
+def _orders_with_totals(user):
+    """The user's orders with their number of units counted in SQL."""
+    return (
+        Order.objects.filter(user=user)
+        .only("id", "created_at", "status", "total_price")
+        .annotate(item_count=Sum("items__quantity"))
+    )
+
+
+@login_required
+def order_history_view(request):
+    page = paginate_keyset(
+        _orders_with_totals(request.user),
+        ("-created_at", "-id"),
+        cursor=request.GET.get("cursor", ""),
+        page_size=getattr(settings, "ORDER_HISTORY_PAGE_SIZE", 50),
+    )
+    return render(request, "accounts/order_history.html", {"page": page, "orders": page.object_list})
+
+
 @login_required
 def order_detail_view(request, order_id):
     order = get_object_or_404(Order, pk=order_id, user=request.user)
-    order_items = OrderItem.objects.filter(order=order).select_related("item")
+    order_items = (
+        OrderItem.objects.filter(order=order)
+        .select_related("item")
+        .only(
+            "quantity", "price_at_purchase", "order_id",
+            "item__label", "item__reality_fragment", "item__rarity",
+        )
+        .annotate(total=ExpressionWrapper(
+            F("price_at_purchase") * F("quantity"),
+            output_field=DecimalField(max_digits=9, decimal_places=2),
+        ))
+        .order_by("id")
+    )
 
     context = {
         "order": order,
@@ -2,5 +2,8 @@
 set -o errexit
 
 pip install -r requirements.txt
-python manage.py collectstatic --noinput
 python manage.py migrate
+# static build: bundles + thumbnails, then hashed and precompressed copies
+python manage.py build_assets
+python manage.py generate_thumbnails
+python manage.py collectstatic --noinput
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, SubCategory, Item, WishlistItem, Order, OrderItem
+from .models import Category, SubCategory, Item, StockReservation, WishlistItem, Order, OrderItem
 
 # Register your models here.
 @admin.register(Category)
@@ -17,11 +17,18 @@ class SubCategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Item)
 class ItemAdmin(admin.ModelAdmin):
-    list_display = ("label", "category", "subcategory", "price", "rarity")
+    list_display = ("label", "category", "subcategory", "price", "rarity", "stock")
     list_filter = ("category", "subcategory", "rarity")
     search_fields = ("label", "description", "element", "reality_fragment")
 
 
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ("item", "holder", "quantity", "expires_at")
+    list_filter = ("expires_at",)
+    search_fields = ("item__label", "holder")
+
+
 @admin.register(WishlistItem)
 class WishlistItemAdmin(admin.ModelAdmin):
     list_display = ("user", "item", "created_at")
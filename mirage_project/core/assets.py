@@ -0,0 +1,106 @@
+"""
+CSS/JS bundles.
+
+Each page loads one stylesheet and one script bundle per group below
+instead of the separate files. ``manage.py build_assets`` concatenates
+them (minifying the CSS) into core/static/bundles/ (same depth as css-files/,
+so relative url()s keep working); collectstatic then gives them content
+hashed names and gzip/brotli copies (see settings.STORAGES), which
+WhiteNoise serves with a year-long immutable Cache-Control.
+
+Templates use ``{% bundle "site.css" %}`` (core.templatetags.assets).
+With ASSET_BUNDLES = False (the default when DEBUG is on) the tag links
+the source files one by one, so editing CSS/JS needs no rebuild.
+"""
+import os
+import re
+
+from django.conf import settings
+
+
+BUNDLES = {
+    "site.css": ["css-files/global.css", "css-files/theme-dark.css", "css-files/theme-light.css"],
+    "site.js": ["js-files/theme.js", "js-files/navbar.js"],
+    "home.css": ["css-files/catalogue.css", "css-files/home.css"],
+    "catalogue.css": ["css-files/catalogue.css"],
+    "catalogue.js": ["js-files/catalogue.js"],
+}
+
+BUNDLE_DIR = "bundles"
+
+
+def enabled():
+    return getattr(settings, "ASSET_BUNDLES", not settings.DEBUG)
+
+
+def source_dir():
+    return os.path.join(settings.BASE_DIR, "core", "static")
+
+
+def bundle_path(name):
+    return f"{BUNDLE_DIR}/{name}"
+
+
+# Minifying (CSS only, conservative: only whitespace and comments go).
+# Scripts are just concatenated: without a real JS parser there is no
+# telling a comment from the inside of a string, regex or template
+# literal, and the gzip/brotli copies already take most of the slack.
+
+_CSS_TOKENS = re.compile(
+    r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')"""  # strings, kept as they are
+    r"|(/\*.*?\*/)"                               # comments
+    r"|(\s+)",                                    # whitespace
+    re.S,
+)
+_CSS_PUNCTUATION = re.compile(r" ?([{};,]) ?")
+
+
+def minify_css(text):
+    out, code = [], []
+
+    def flush():
+        squeezed = _CSS_PUNCTUATION.sub(r"\1", "".join(code))
+        out.append(squeezed.replace(";}", "}"))
+        code.clear()
+
+    position = 0
+    for match in _CSS_TOKENS.finditer(text):
+        code.append(text[position:match.start()])
+        string, _comment, space = match.groups()
+        if string:
+            flush()
+            out.append(string)
+        elif space:
+            code.append(" ")
+        position = match.end()
+    code.append(text[position:])
+    flush()
+    return "".join(out).strip()
+
+
+# Building
+
+def build(out_dir=None):
+    """
+    Write every bundle; returns [(name, source bytes, bundle bytes)].
+    """
+    base = source_dir()
+    out_dir = out_dir or os.path.join(base, BUNDLE_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+
+    report = []
+    for name, sources in BUNDLES.items():
+        texts = []
+        for source in sources:
+            with open(os.path.join(base, source), encoding="utf-8") as handle:
+                texts.append(handle.read())
+        if name.endswith(".css"):
+            content = "\n".join(minify_css(text) for text in texts)
+        else:
+            # each file on its own statement boundary (and out of a
+            # trailing // comment)
+            content = "\n;\n".join(text.strip() for text in texts)
+        with open(os.path.join(out_dir, name), "w", encoding="utf-8") as handle:
+            handle.write(content + "\n")
+        report.append((name, sum(len(text.encode()) for text in texts), len(content.encode()) + 1))
+    return report
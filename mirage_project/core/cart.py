@@ -0,0 +1,320 @@
+"""
+Cart storage, kept out of the session.
+
+- Anonymous visitors: a small signed cookie ("token.count.id:qty,..."),
+  written by core.middleware.CartMiddleware only when the cart changed.
+- Logged-in users: one CartLine row per item, changed with single-row
+  UPDATE/INSERT/DELETE statements.
+
+The navbar badge never needs the lines: anonymous carts keep a running
+unit count in the cookie, logged-in ones take one SUM over the user's
+CartLines (the (user, item) unique index covers it).
+The anonymous cart is merged into the user's CartLines at login.
+Use ``get_cart(request)`` to get the (per-request) Cart.
+"""
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+
+from . import stock
+from .pricing import aprice_cart, price_cart
+from .models import CartLine, Item
+
+
+COOKIE_SALT = "mirage.cart"
+
+
+def cookie_name():
+    return getattr(settings, "CART_COOKIE_NAME", "mirage_cart")
+
+
+def max_lines():
+    return getattr(settings, "CART_MAX_LINES", 100)
+
+
+def _parse_cookie(value):
+    """'token.3.1:2,5:1' -> ('token', 3, {1: 2, 5: 1})"""
+    parts = (value or "").split(".", 2)
+    token, count, body = parts[0], None, parts[-1]
+    if len(parts) == 3:
+        try:
+            count = int(parts[1])
+        except ValueError:
+            pass
+    lines = {}
+    for part in body.split(","):
+        item_id, _, qty = part.partition(":")
+        try:
+            item_id, qty = int(item_id), int(qty)
+        except ValueError:
+            continue
+        if qty > 0:
+            lines[item_id] = qty
+    return token or None, count, lines
+
+
+def _format_cookie(token, count, lines):
+    body = ",".join(f"{item_id}:{qty}" for item_id, qty in lines.items())
+    return f"{token}.{count}.{body}"
+
+
+class Cart:
+    """
+    The current visitor's cart: {item_id: quantity}.
+    """
+    def __init__(self, request, user=None):
+        self.request = request
+        if user is None:
+            user = getattr(request, "user", None)
+        self.user = user if user is not None and user.is_authenticated else None
+        self._lines = None
+        self._count = None
+        self._token = None
+        self._priced = None
+        self.dirty = False
+
+    # reading
+
+    @property
+    def lines(self):
+        if self._lines is None:
+            self._lines = self._load()
+        return self._lines
+
+    def quantity(self, item_id):
+        return self.lines.get(int(item_id), 0)
+
+    @property
+    def count(self):
+        """Number of units in the cart, without loading the lines."""
+        if self._count is None and self.user and self._lines is None:
+            self._count = self._db_lines().aggregate(units=Sum("quantity"))["units"] or 0
+        if self._count is None:
+            lines = self.lines  # anonymous carts read the count from the cookie
+            if self._count is None:
+                self._count = sum(lines.values())
+        return self._count
+
+    @property
+    def revision(self):
+        """
+        Changes whenever the cart does (part of the page validators): the
+        cookie, or the user's (item, quantity) pairs as they are in the
+        database, whichever worker changed them.
+        """
+        if not self.user:
+            return self.request.COOKIES.get(cookie_name(), "")
+        return tuple(sorted(self.lines.items()))
+
+    # async views (core.views_async) await these first; the properties
+    # above then answer from what they loaded
+
+    async def alines(self):
+        if self._lines is None:
+            session = getattr(self.request, "session", None)
+            if session is not None and await session.ahas_key("cart"):
+                self._lines = await sync_to_async(self._load)()  # one-off legacy import
+            elif self.user:
+                self._lines = {
+                    item_id: qty
+                    async for item_id, qty in CartLine.objects.filter(user=self.user)
+                    .values_list("item_id", "quantity")
+                }
+            else:
+                self._lines = self._load()  # just the cookie
+        return self._lines
+
+    async def acount(self):
+        if self._count is None and self.user and self._lines is None:
+            self._count = (await self._db_lines().aaggregate(units=Sum("quantity")))["units"] or 0
+        if self._count is None:
+            lines = await self.alines()
+            if self._count is None:
+                self._count = sum(lines.values())
+        return self._count
+
+    async def arevision(self):
+        if not self.user:
+            return self.revision
+        return tuple(sorted((await self.alines()).items()))
+
+    async def apriced(self):
+        if self._priced is None:
+            self._priced = await aprice_cart(await self.alines())
+        return self._priced
+
+    def __bool__(self):
+        return bool(self.lines)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def priced(self):
+        """
+        The cart with prices and totals (one query, then memoized until the
+        cart changes).
+        """
+        if self._priced is None:
+            self._priced = price_cart(self.lines)
+        return self._priced
+
+    @property
+    def holder(self):
+        """Identifies this cart's stock reservations."""
+        if self.user:
+            return f"user:{self.user.pk}"
+        self.lines  # loads the token from the cookie
+        if not self._token:
+            self._token = uuid.uuid4().hex[:16]
+            self.dirty = True
+        return self._token
+
+    def _db_lines(self):
+        return CartLine.objects.filter(user=self.user)
+
+    def _load(self):
+        if self.user:
+            lines = dict(
+                CartLine.objects.filter(user=self.user).values_list("item_id", "quantity")
+            )
+        else:
+            raw = self.request.get_signed_cookie(cookie_name(), default=None, salt=COOKIE_SALT)
+            self._token, self._count, lines = _parse_cookie(raw)
+
+        # one-off import of carts stored in the session by older versions
+        session = getattr(self.request, "session", None)
+        if session is not None and "cart" in session:
+            legacy = {int(k): qty for k, qty in session.pop("cart").items() if qty > 0}
+            for item_id in _existing(legacy):
+                lines[item_id] = lines.get(item_id, 0) + legacy[item_id]
+                if self.user:
+                    self._db_add(item_id, legacy[item_id])
+            self._count = None
+            self.dirty = True
+        return lines
+
+    # writing
+
+    def add(self, item_id, quantity=1):
+        item_id = int(item_id)
+        lines = self.lines
+        if item_id not in lines and len(lines) >= max_lines():
+            return False
+        lines[item_id] = lines.get(item_id, 0) + quantity
+        if self.user:
+            self._db_add(item_id, quantity)
+        self._changed(quantity)
+        return True
+
+    def decrement(self, item_id):
+        """Remove one unit; returns the quantity before the change."""
+        item_id = int(item_id)
+        qty = self.lines.get(item_id, 0)
+        if qty > 1:
+            self.lines[item_id] = qty - 1
+            if self.user:
+                CartLine.objects.filter(user=self.user, item_id=item_id).update(
+                    quantity=F("quantity") - 1
+                )
+        elif qty == 1:
+            self._remove(item_id)
+        if qty:
+            self._changed(-1)
+        return qty
+
+    def remove(self, item_id):
+        qty = self._remove(int(item_id))
+        if qty:
+            self._changed(-qty)
+
+    def clear(self):
+        self._lines = {}
+        if self.user:
+            CartLine.objects.filter(user=self.user).delete()
+        self._count = 0
+        self._changed(0)
+
+    def _changed(self, delta):
+        if self._count is not None:
+            self._count += delta
+        else:
+            self._count = sum(self.lines.values())
+        self._priced = None
+        self.dirty = True
+
+    def _remove(self, item_id):
+        qty = self.lines.pop(item_id, 0)
+        if self.user and qty:
+            CartLine.objects.filter(user=self.user, item_id=item_id).delete()
+        return qty
+
+    def _db_add(self, item_id, quantity):
+        updated = CartLine.objects.filter(user=self.user, item_id=item_id).update(
+            quantity=F("quantity") + quantity
+        )
+        if updated:
+            return
+        try:
+            with transaction.atomic():
+                CartLine.objects.create(user=self.user, item_id=item_id, quantity=quantity)
+        except IntegrityError:
+            # created by a parallel request in the meantime
+            CartLine.objects.filter(user=self.user, item_id=item_id).update(
+                quantity=F("quantity") + quantity
+            )
+
+    # persistence (anonymous carts)
+
+    def save_cookie(self, response):
+        name = cookie_name()
+        if self.user:
+            # merged into CartLines at login, the cookie is no longer needed
+            if name in self.request.COOKIES:
+                response.delete_cookie(name)
+            return
+        if not self.dirty:
+            return
+        if not self.lines and not self._token:
+            response.delete_cookie(name)
+            return
+        response.set_signed_cookie(
+            name,
+            _format_cookie(self._token or self.holder, self.count, self.lines),
+            salt=COOKIE_SALT,
+            max_age=getattr(settings, "CART_COOKIE_AGE", 60 * 60 * 24 * 30),
+            httponly=True,
+            samesite="Lax",
+            secure=settings.SESSION_COOKIE_SECURE,
+        )
+
+
+def _existing(item_ids):
+    if not item_ids:
+        return []
+    return list(Item.objects.filter(id__in=list(item_ids)).values_list("id", flat=True))
+
+
+def get_cart(request):
+    """The Cart for this request (created once per request)."""
+    cart = getattr(request, "_cart", None)
+    if cart is None:
+        cart = request._cart = Cart(request)
+    return cart
+
+
+def merge_anonymous_cart(request, user):
+    """
+    Move the anonymous cookie cart (and its stock reservations) into the
+    user's CartLines. Called on login.
+    """
+    raw = request.get_signed_cookie(cookie_name(), default=None, salt=COOKIE_SALT)
+    token, _count, lines = _parse_cookie(raw)
+
+    request._cart = cart = Cart(request, user)
+    for item_id in _existing(lines):
+        cart.add(item_id, lines[item_id])
+    if token:
+        stock.transfer(token, cart.holder)
@@ -0,0 +1,185 @@
+"""
+Shared catalogue cache.
+
+Everything cached here is the same for every visitor (result id lists,
+facet counts, the sidebar, rendered item cards). Per-user bits such as
+cart quantities and wishlist hearts are added by the views afterwards.
+
+Keys embed a catalogue version number; saving or deleting an Item,
+Category or SubCategory bumps the version (see core.signals), which makes
+every older entry unreachable at once. Old entries simply expire.
+
+Works with any Django cache backend (LocMemCache, FileBasedCache, ...).
+With LocMemCache each worker process has its own copy, so an edit is only
+seen by the other workers once their entries time out; use a shared
+backend (file, database, memcached) when running several workers.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+
+VERSION_KEY = "catalogue:version"
+CHANGED_KEY = "catalogue:changed_at"
+
+# where item_card.html leaves room for the per-user buttons
+ACTIONS_MARKER = "<!-- item-actions -->"
+
+
+def timeout():
+    return getattr(settings, "CATALOGUE_CACHE_TIMEOUT", 600)
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # start from the clock so a lost counter never reuses an old number
+        cache.add(VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+async def aget_version():
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = await cache.aget(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, int(time.time() * 1000), timeout=None)
+    cache.set(CHANGED_KEY, time.time(), timeout=None)
+
+
+def changed_at():
+    """
+    Time of the last catalogue change (for Last-Modified). Deletions leave
+    no updated_at behind, so this is tracked with the version; when the
+    cache doesn't know it, "now" is the safe answer.
+    """
+    value = cache.get(CHANGED_KEY)
+    if value is None:
+        cache.add(CHANGED_KEY, time.time(), timeout=None)
+        value = cache.get(CHANGED_KEY)
+    return value
+
+
+async def achanged_at():
+    value = await cache.aget(CHANGED_KEY)
+    if value is None:
+        await cache.aadd(CHANGED_KEY, time.time(), timeout=None)
+        value = await cache.aget(CHANGED_KEY)
+    return value
+
+
+def make_key(name, *parts, version=None):
+    if version is None:
+        version = get_version()
+    digest = hashlib.md5(repr(parts).encode()).hexdigest() if parts else "-"
+    return f"catalogue:{version}:{name}:{digest}"
+
+
+def get_or_set(name, parts, compute, version=None):
+    """
+    Return the cached value for (name, parts), computing and storing it on
+    a miss.
+    """
+    key = make_key(name, *parts, version=version)
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, timeout())
+    return value
+
+
+async def aget_or_set(name, parts, compute, version=None):
+    """get_or_set() for async views; ``compute`` is a coroutine function."""
+    if version is None:
+        version = await aget_version()
+    key = make_key(name, *parts, version=version)
+    value = await cache.aget(key)
+    if value is None:
+        value = await compute()
+        await cache.aset(key, value, timeout())
+    return value
+
+
+class Card:
+    """
+    A rendered item card split around the per-user action buttons.
+    """
+    def __init__(self, item_id, html):
+        self.id = item_id
+        before, _, after = html.partition(ACTIONS_MARKER)
+        self.before = mark_safe(before)
+        self.after = mark_safe(after)
+        self.in_cart = False
+        self.cart_qty = 0
+        self.wishlisted = False
+
+    def __eq__(self, other):
+        return isinstance(other, Card) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+def render_cards(item_ids, load_items, version=None):
+    """
+    Return a Card per id (in order), rendering only the cards that are not
+    cached yet. ``load_items(ids)`` must return the Item objects for ids.
+    """
+    if version is None:
+        version = get_version()
+    keys = _card_keys(item_ids, version)
+    html, missing = _cached_cards(keys, cache.get_many(keys.values()))
+    if missing:
+        cache.set_many(_render(load_items(missing), keys, html), timeout())
+    return _cards(item_ids, html)
+
+
+async def arender_cards(item_ids, load_items, version=None):
+    """render_cards() for async views; ``load_items`` is a coroutine function."""
+    if version is None:
+        version = await aget_version()
+    keys = _card_keys(item_ids, version)
+    html, missing = _cached_cards(keys, await cache.aget_many(keys.values()))
+    if missing:
+        await cache.aset_many(_render(await load_items(missing), keys, html), timeout())
+    return _cards(item_ids, html)
+
+
+def _card_keys(item_ids, version):
+    return {item_id: make_key("card", item_id, version=version) for item_id in item_ids}
+
+
+def _cached_cards(keys, cached):
+    html = {}
+    missing = []
+    for item_id, key in keys.items():
+        if key in cached:
+            html[item_id] = cached[key]
+        else:
+            missing.append(item_id)
+    return html, missing
+
+
+def _render(items, keys, html):
+    rendered = {}
+    for item in items:
+        html[item.id] = render_to_string("partials/item_card.html", {"item": item})
+        rendered[keys[item.id]] = html[item.id]
+    return rendered
+
+
+def _cards(item_ids, html):
+    # items deleted since the id list was cached are dropped
+    return [Card(item_id, html[item_id]) for item_id in item_ids if item_id in html]
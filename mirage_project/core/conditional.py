@@ -0,0 +1,157 @@
+"""
+Conditional GET (ETag / Last-Modified) for the catalogue pages.
+
+A page's ETag hashes everything it shows: the shared part given by the
+view (catalogue version, the ids on the page, ...) plus the visitor's
+part (visitor_state): who is logged in, what is in their cart and
+wishlist (read from the database, so a change made through any worker
+shows up), and the CSRF cookie the page's forms derive their token
+from. When nothing changed the browser gets a 304 before anything is
+rendered.
+
+Last-Modified is only sent on responses without visitor state (it can't
+express a cart change) and only once the last change is a full second
+old, so a later change always gets a later HTTP date. Pages with flash
+messages waiting are never answered with a 304.
+
+Every such response carries "Cache-Control: no-cache" (store, but
+always revalidate) and "Vary: Cookie"; it is only "public" when it has
+no visitor state and sets no cookie (the first page a visitor gets sets
+the CSRF cookie its forms' token comes from, which a shared cache must
+never hand to someone else).
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib import messages
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .cart import cookie_name, get_cart
+from .models import WishlistItem
+
+
+# Wishlist revisions (the cart keeps its own, see Cart.revision)
+
+def _wishlisted_ids(user_id):
+    return (
+        WishlistItem.objects.filter(user_id=user_id)
+        .order_by("item_id")
+        .values_list("item_id", flat=True)
+    )
+
+
+def wishlist_revision(user_id):
+    """The user's wishlisted item ids (one query on the (user, item) index)."""
+    return tuple(_wishlisted_ids(user_id))
+
+
+async def awishlist_revision(user_id):
+    return tuple([item_id async for item_id in _wishlisted_ids(user_id)])
+
+
+# Validators
+
+def visitor_state(request):
+    """What the page shows differently per visitor; empty for a new visitor."""
+    user = request.user
+    if user.is_authenticated:
+        return _state(request, get_cart(request).revision, wishlist_revision(user.pk))
+    return _state(request)
+
+
+async def avisitor_state(request):
+    """visitor_state() for async views (request.user must be loaded)."""
+    user = request.user
+    if user.is_authenticated:
+        return _state(
+            request, await get_cart(request).arevision(), await awishlist_revision(user.pk)
+        )
+    return _state(request)
+
+
+def _state(request, cart_revision=None, wishlist=None):
+    state = []
+    user = request.user
+    if user.is_authenticated:
+        state += ["user", user.pk, user.is_staff, cart_revision, wishlist]
+    elif request.COOKIES.get(cookie_name()):
+        state += ["cart", request.COOKIES[cookie_name()]]
+    csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+    if csrf_cookie:
+        state += ["csrf", csrf_cookie]
+    return tuple(state)
+
+
+def _has_messages(request):
+    # len() loads the messages without marking them as shown
+    return len(messages.get_messages(request)) > 0
+
+
+def _sets_cookie(request, response):
+    # most cookies are only added by the middleware, after the view
+    cart = getattr(request, "_cart", None)
+    session = getattr(request, "session", None)
+    return bool(
+        response.cookies
+        or request.META.get("CSRF_COOKIE_NEEDS_UPDATE")  # the page has a {% csrf_token %}
+        or (cart is not None and cart.dirty)
+        or (session is not None and session.modified)
+    )
+
+
+class Validators:
+    """
+    ETag/Last-Modified of one page:
+
+        validators = Validators(request, ("catalogue", version, ids), modified_at)
+        response = validators.not_modified()
+        if response is None:
+            response = validators.apply(render(...))
+    """
+    def __init__(self, request, parts, modified_at=None, per_visitor=True, visitor=None):
+        self.request = request
+        self.etag = None
+        self.last_modified = None
+        self.private = False
+        if _has_messages(request):
+            return
+
+        if visitor is None:
+            visitor = visitor_state(request) if per_visitor else ()
+        self.private = bool(visitor)
+        self.etag = quote_etag(hashlib.md5(repr((parts, visitor)).encode()).hexdigest())
+        if not visitor and modified_at is not None and time.time() - modified_at >= 1:
+            self.last_modified = int(modified_at)
+
+    @classmethod
+    async def acreate(cls, request, parts, modified_at=None, per_visitor=True):
+        """
+        For async views: request.user must be loaded (the session with it,
+        so the flash messages can be read without a query).
+        """
+        visitor = await avisitor_state(request) if per_visitor else ()
+        return cls(request, parts, modified_at, per_visitor, visitor=visitor)
+
+    def not_modified(self):
+        """A 304 (or 412) response when the client's copy is current, else None."""
+        if self.etag is None:
+            return None
+        response = get_conditional_response(
+            self.request, etag=self.etag, last_modified=self.last_modified
+        )
+        return self.apply(response) if response is not None else None
+
+    def apply(self, response):
+        if self.etag is None:
+            return response
+        response.headers["ETag"] = self.etag
+        if self.last_modified is not None:
+            response.headers["Last-Modified"] = http_date(self.last_modified)
+        if self.private or _sets_cookie(self.request, response):
+            patch_cache_control(response, no_cache=True, private=True)
+        else:
+            patch_cache_control(response, no_cache=True, public=True)
+        patch_vary_headers(response, ["Cookie"])
+        return response
@@ -0,0 +1,11 @@
+from .cart import get_cart
+
+
+def cart(request):
+    """
+    ``cart_count`` for the navbar badge on every page.
+
+    Passed as a callable, so the template only evaluates it when it
+    actually renders the badge; the Cart memoizes it for the request.
+    """
+    return {"cart_count": lambda: get_cart(request).count}
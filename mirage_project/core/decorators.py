@@ -2,6 +2,9 @@ from functools import wraps
 from django.contrib.auth.decorators import login_required
 from django.http import HttpResponseForbidden
 
+from .roles import has_role
+
+
 def role_required(*roles):
     """
     @role_required("Owner") -> only Owner (and superuser)
@@ -21,8 +24,7 @@ def role_required(*roles):
             if not user.is_staff:
                 return HttpResponseForbidden("Admins only.")
 
-            user_roles = set(user.groups.values_list("name", flat=True))
-            if any(r in user_roles for r in roles):
+            if has_role(request, *roles):
                 return view_func(request, *args, **kwargs)
 
             return HttpResponseForbidden("Insufficient role.")
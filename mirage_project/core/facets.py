@@ -0,0 +1,106 @@
+"""
+Facet counts for the catalogue sidebar.
+
+All four facets (category, subcategory, rarity, price bucket) come out of
+a single GROUP BY over the filtered items and are folded in Python.
+
+The sidebar counts every facet with its own filter left out (disjunctive
+faceting, see catalogue_counts), so once a category is picked the other
+categories still show how many items they would give.
+"""
+from collections import Counter
+from decimal import Decimal
+
+from django.db.models import Case, CharField, Count, Value, When
+
+from .models import RARITY_CHOICES
+
+
+# the catalogue filters that select within each facet
+FACET_FILTERS = {
+    "categories": ("category",),
+    "subcategories": ("subcategory",),
+    "rarities": ("rarity",),
+    "price_buckets": ("min_price", "max_price"),
+}
+
+# (key, label, min_price, max_price) – bounds match the min/max_price filters
+PRICE_BUCKETS = [
+    ("under-10", "Under €10", None, Decimal("9.99")),
+    ("10-25", "€10 – €25", Decimal("10.00"), Decimal("24.99")),
+    ("25-50", "€25 – €50", Decimal("25.00"), Decimal("49.99")),
+    ("50-plus", "€50 and up", Decimal("50.00"), None),
+]
+
+
+def _price_bucket():
+    whens = [
+        When(price__lte=max_price, then=Value(key))
+        for key, _label, _min_price, max_price in PRICE_BUCKETS
+        if max_price is not None
+    ]
+    return Case(*whens, default=Value(PRICE_BUCKETS[-1][0]), output_field=CharField())
+
+
+def facet_counts(items):
+    """
+    Count ``items`` per category id, subcategory id, rarity and price bucket.
+    Runs exactly one query.
+    """
+    rows = (
+        items.order_by()
+        .annotate(price_bucket=_price_bucket())
+        .values("category_id", "subcategory_id", "rarity", "price_bucket")
+        .annotate(n=Count("id"))
+    )
+
+    counts = {
+        "categories": Counter(),
+        "subcategories": Counter(),
+        "rarities": Counter(),
+        "price_buckets": Counter(),
+        "total": 0,
+    }
+    for row in rows:
+        n = row["n"]
+        counts["categories"][row["category_id"]] += n
+        counts["subcategories"][row["subcategory_id"]] += n
+        counts["rarities"][row["rarity"]] += n
+        counts["price_buckets"][row["price_bucket"]] += n
+        counts["total"] += n
+    return counts
+
+
+def catalogue_counts(filter_items, filters):
+    """
+    facet_counts() for the catalogue filters: "total" counts the fully
+    filtered items, each facet the items matching every filter but its
+    own. ``filter_items(filters)`` returns the filtered queryset.
+    One query, plus one per facet that has a filter set.
+    """
+    counts = facet_counts(filter_items(filters))
+    for facet, names in FACET_FILTERS.items():
+        if any(filters.get(name) for name in names):
+            others = filter_items(dict(filters, **dict.fromkeys(names, "")))
+            counts[facet] = facet_counts(others)[facet]
+    return counts
+
+
+def rarity_facets(counts):
+    return [
+        {"value": value, "label": label, "count": counts["rarities"][value]}
+        for value, label in RARITY_CHOICES
+    ]
+
+
+def price_facets(counts):
+    return [
+        {
+            "key": key,
+            "label": label,
+            "min_price": min_price or "",
+            "max_price": max_price or "",
+            "count": counts["price_buckets"][key],
+        }
+        for key, label, min_price, max_price in PRICE_BUCKETS
+    ]
@@ -0,0 +1,208 @@
+"""
+Home page shelves ("slates"): the featured items plus the most wished and
+best selling ones.
+
+The slates are computed ahead of time and kept in the cache as plain
+dicts, so the landing page renders them without any catalogue query.
+The featured shelf follows settings.FEATURED_STRATEGY:
+
+- "newest"   latest items (the old behaviour)
+- "curated"  items ticked as featured on the item form, newest first
+- "rarity"   a random draw among the newest FEATURED_POOL items,
+             weighted towards rare and legendary ones (a new draw on
+             every refresh, so the shelf rotates)
+- "popular"  most wished items
+
+Shelves that come up short are topped up with the newest items.
+
+Refreshing happens off the request path: after a catalogue edit commits
+(core.signals) and whenever a slate is older than FEATURED_TIMEOUT, a
+background thread rebuilds them while the previous ones keep being
+served. Only a cold cache makes a request build them itself.
+"""
+import logging
+import random
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from . import thumbnails
+from .models import Item
+
+
+logger = logging.getLogger(__name__)
+
+SLATES_KEY = "featured:slates"
+
+STRATEGIES = ("newest", "curated", "rarity", "popular")
+
+SHELVES = ("featured", "popular", "bestsellers")
+
+RARITY_WEIGHTS = {"common": 1, "rare": 3, "legendary": 6}
+
+FIELDS = ("id", "label", "description", "price", "image_url", "rarity")
+
+
+def strategy():
+    name = getattr(settings, "FEATURED_STRATEGY", "newest")
+    return name if name in STRATEGIES else "newest"
+
+
+def size():
+    return getattr(settings, "FEATURED_COUNT", 3)
+
+
+def timeout():
+    return getattr(settings, "FEATURED_TIMEOUT", 15 * 60)
+
+
+def pool_size():
+    return getattr(settings, "FEATURED_POOL", 48)
+
+
+def in_background():
+    return getattr(settings, "FEATURED_REFRESH_IN_BACKGROUND", True)
+
+
+# Strategies (each returns up to n item dicts)
+
+def _rows(queryset, n):
+    return list(queryset.values(*FIELDS)[:n])
+
+
+def _newest(n):
+    return _rows(Item.objects.order_by("-created_at", "-id"), n)
+
+
+def _curated(n):
+    return _rows(Item.objects.filter(featured=True).order_by("-created_at", "-id"), n)
+
+
+def _popular(n):
+    return _rows(
+        Item.objects.filter(wishlist_count__gt=0).order_by("-wishlist_count", "-id"), n
+    )
+
+
+def _bestsellers(n):
+    return _rows(Item.objects.filter(units_sold__gt=0).order_by("-units_sold", "-id"), n)
+
+
+def _rarity(n, rng=random):
+    pool = _newest(pool_size())
+    # weighted sample without replacement: keep the n largest u ** (1 / w)
+    keyed = [
+        (rng.random() ** (1 / RARITY_WEIGHTS.get(row["rarity"], 1)), row) for row in pool
+    ]
+    keyed.sort(key=lambda pair: pair[0], reverse=True)
+    return [row for _key, row in keyed[:n]]
+
+
+_PICKERS = {
+    "newest": _newest,
+    "curated": _curated,
+    "rarity": _rarity,
+    "popular": _popular,
+}
+
+
+def _topped_up(rows, n):
+    if len(rows) >= n:
+        return rows
+    seen = {row["id"] for row in rows}
+    extra = [row for row in _newest(n + len(rows)) if row["id"] not in seen]
+    return rows + extra[:n - len(rows)]
+
+
+# Building and reading
+
+def build():
+    """Compute every shelf and store them; returns the stored dict."""
+    n = size()
+    slates = {
+        "strategy": strategy(),
+        "built_at": time.time(),
+        "featured": _topped_up(_PICKERS[strategy()](n), n),
+        "popular": _popular(n),
+        "bestsellers": _bestsellers(n),
+    }
+    found = thumbnails.pictures(
+        row["image_url"] for name in SHELVES for row in slates[name]
+    )
+    for name in SHELVES:
+        for row in slates[name]:
+            row["picture"] = found.get(row["image_url"])
+    # kept well past the refresh point: a stale slate is served while
+    # the next one is built
+    cache.set(SLATES_KEY, slates, timeout() * 4)
+    return slates
+
+
+def get_slates():
+    """
+    The shelves for the home page: {"featured": [...], "popular": [...],
+    "bestsellers": [...]} (lists of item dicts).
+    """
+    slates = cache.get(SLATES_KEY)
+    if slates is None or slates["strategy"] != strategy():
+        return build()
+    if time.time() - slates["built_at"] > timeout():
+        schedule_refresh()
+    return slates
+
+
+async def aget_slates():
+    """get_slates() for async views."""
+    slates = await cache.aget(SLATES_KEY)
+    if slates is None or slates["strategy"] != strategy():
+        return await sync_to_async(build)()
+    if time.time() - slates["built_at"] > timeout():
+        # starts a thread (or builds right away without background refresh)
+        await sync_to_async(schedule_refresh)()
+    return slates
+
+
+# Background refresh
+
+_lock = threading.Lock()
+_running = False
+_pending = False
+
+
+def schedule_refresh():
+    """
+    Rebuild the slates in a background thread. Calls made while a
+    refresh is running are folded into one more run after it.
+    """
+    global _running, _pending
+    if not in_background():
+        build()
+        return
+    with _lock:
+        if _running:
+            _pending = True
+            return
+        _running = True
+    threading.Thread(target=_refresh_loop, name="featured-refresh", daemon=True).start()
+
+
+def _refresh_loop():
+    global _running, _pending
+    try:
+        while True:
+            try:
+                build()
+            except Exception:
+                logger.exception("Refreshing the featured slates failed")
+            with _lock:
+                if not _pending:
+                    _running = False
+                    return
+                _pending = False
+    finally:
+        # the thread got its own connection
+        connection.close()
@@ -0,0 +1,300 @@
+"""
+Bulk item import/export (CSV or JSON Lines).
+
+One row per item, categories and subcategories given by their url_name:
+
+    id,label,category,subcategory,price,description,element,reality_fragment,rarity,image_url,stock
+
+Rows with an ``id`` of an existing item update it, the others create new
+items. Rows are read one at a time, validated and written in batches
+(one bulk_create + one bulk_update per batch), all inside one
+transaction: if any row is invalid nothing is written and the errors are
+reported instead.
+
+Used by ``manage.py import_items`` / ``export_items`` and by the
+manage/items/import/ and manage/items/export/ pages.
+"""
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import catalogue_cache, featured, search
+from .models import Category, Item, RARITY_CHOICES, SubCategory
+
+
+FIELDS = [
+    "id", "label", "category", "subcategory", "price", "description",
+    "element", "reality_fragment", "rarity", "image_url", "stock",
+]
+
+# Item fields written on import (category/subcategory become the *_id fields)
+WRITE_FIELDS = [
+    "label", "category_id", "subcategory_id", "price", "description",
+    "element", "reality_fragment", "rarity", "image_url", "stock",
+]
+
+FORMATS = ("csv", "jsonl")
+
+BATCH_SIZE = 500
+
+# stop collecting errors after this many, the file is clearly wrong
+MAX_ERRORS = 50
+
+_RARITIES = {value for value, _label in RARITY_CHOICES}
+
+
+def guess_format(filename, default="csv"):
+    name = (filename or "").lower()
+    if name.endswith((".jsonl", ".ndjson", ".json")):
+        return "jsonl"
+    if name.endswith(".csv"):
+        return "csv"
+    return default
+
+
+# Reading
+
+def read_rows(lines, fmt="csv"):
+    """
+    Yield (line_number, row dict) for every row of a text file (or any
+    iterable of lines). Rows that can't be parsed are yielded as
+    (line_number, None).
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield number, row if isinstance(row, dict) else None
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []  # (line number, message)
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def error(self, line, message):
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line, message))
+
+
+class _Lookups:
+    """Category/subcategory url_name -> id maps, loaded once per import."""
+    def __init__(self):
+        self.categories = dict(Category.objects.values_list("url_name", "id"))
+        self.subcategories = {
+            url_name: (sub_id, category_id)
+            for url_name, sub_id, category_id in SubCategory.objects.values_list(
+                "url_name", "id", "category_id"
+            )
+        }
+
+
+def _text(row, name):
+    value = row.get(name)
+    return "" if value is None else str(value).strip()
+
+
+def _limited(row, name):
+    value = _text(row, name)
+    if len(value) > Item._meta.get_field(name).max_length:
+        raise ValueError(f"{name} is too long")
+    return value
+
+
+def _clean(row, lookups):
+    """
+    Turn a raw row into (id or None, dict of WRITE_FIELDS values).
+    Raises ValueError with a readable message for invalid rows.
+    """
+    if row is None:
+        raise ValueError("could not parse the row")
+
+    label = _limited(row, "label")
+    if not label:
+        raise ValueError("label is required")
+
+    category_id = lookups.categories.get(_text(row, "category"))
+    if category_id is None:
+        raise ValueError(f"unknown category {_text(row, 'category')!r}")
+    subcategory = lookups.subcategories.get(_text(row, "subcategory"))
+    if subcategory is None:
+        raise ValueError(f"unknown subcategory {_text(row, 'subcategory')!r}")
+    if subcategory[1] != category_id:
+        raise ValueError("subcategory does not belong to the category")
+
+    try:
+        price = Decimal(_text(row, "price"))
+        if not price.is_finite():  # NaN/Infinity parse fine
+            raise InvalidOperation
+        price = price.quantize(Decimal("0.01"))
+    except InvalidOperation:
+        raise ValueError(f"invalid price {_text(row, 'price')!r}")
+    if price < 0 or price >= Decimal("100000"):
+        raise ValueError("price out of range")
+
+    rarity = _text(row, "rarity") or "common"
+    if rarity not in _RARITIES:
+        raise ValueError(f"unknown rarity {rarity!r}")
+
+    stock = _text(row, "stock")
+    try:
+        stock = int(stock) if stock else None
+    except ValueError:
+        raise ValueError(f"invalid stock {stock!r}")
+    if stock is not None and stock < 0:
+        raise ValueError("stock can't be negative")
+
+    item_id = _text(row, "id")
+    try:
+        item_id = int(item_id) if item_id else None
+    except ValueError:
+        raise ValueError(f"invalid id {item_id!r}")
+
+    return item_id, {
+        "label": label,
+        "category_id": category_id,
+        "subcategory_id": subcategory[0],
+        "price": price,
+        "description": _text(row, "description"),
+        "element": _limited(row, "element"),
+        "reality_fragment": _limited(row, "reality_fragment"),
+        "rarity": rarity,
+        "image_url": _limited(row, "image_url"),
+        "stock": stock,
+    }
+
+
+def _write_batch(batch, result):
+    """Create/update one batch of cleaned rows; returns the touched ids."""
+    ids = [item_id for item_id, _values in batch if item_id is not None]
+    existing = set(Item.objects.filter(id__in=ids).values_list("id", flat=True))
+
+    to_create, to_update = [], []
+    now = timezone.now()
+    for item_id, values in batch:
+        if item_id in existing:
+            to_update.append(Item(id=item_id, updated_at=now, **values))
+        else:
+            # unknown ids are created with that id, like loaddata would
+            to_create.append(Item(id=item_id, **values))
+
+    created = Item.objects.bulk_create(to_create)
+    if any(item_id is not None and item_id not in existing for item_id, _values in batch):
+        _reset_id_sequence()
+    if to_update:
+        Item.objects.bulk_update(to_update, WRITE_FIELDS + ["updated_at"])
+    result.created += len(created)
+    result.updated += len(to_update)
+    return [item.id for item in created] + [item.id for item in to_update]
+
+
+def _reset_id_sequence():
+    # explicit ids don't advance PostgreSQL's sequence (no-op on SQLite)
+    statements = connection.ops.sequence_reset_sql(no_style(), [Item])
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def import_items(rows, batch_size=BATCH_SIZE, dry_run=False):
+    """
+    Import the (line, row) pairs from read_rows(). Returns an ImportResult;
+    nothing is written when it has errors (or with dry_run). A file that
+    isn't UTF-8 or isn't valid CSV is reported as an error too.
+
+    bulk_create/bulk_update skip the model signals, so the search index is
+    updated per batch and the catalogue cache bumped (and the featured
+    slates refreshed) once at the end.
+    """
+    result = ImportResult()
+    lookups = _Lookups()
+
+    with transaction.atomic():
+        batch = []
+        seen = {}  # id -> line, an item can only be written once
+        line = 0
+        try:
+            for line, row in rows:
+                try:
+                    item_id, values = _clean(row, lookups)
+                    if item_id is not None:
+                        if item_id in seen:
+                            raise ValueError(f"id {item_id} is already on line {seen[item_id]}")
+                        seen[item_id] = line
+                    batch.append((item_id, values))
+                except ValueError as exc:
+                    result.error(line, str(exc))
+                    if len(result.errors) >= MAX_ERRORS:
+                        break
+                    continue
+                if len(batch) >= batch_size:
+                    # keep validating after the first error, but stop writing
+                    if result.ok:
+                        search.index_items(_write_batch(batch, result))
+                    batch = []
+        except UnicodeDecodeError:
+            # the rest of the file can't be read
+            result.error(line + 1, "the file is not UTF-8 text")
+        except csv.Error as exc:
+            result.error(line + 1, f"malformed CSV ({exc})")
+        if batch and result.ok:
+            search.index_items(_write_batch(batch, result))
+
+        if dry_run or not result.ok:
+            transaction.set_rollback(True)
+        else:
+            catalogue_cache.bump_version()
+            transaction.on_commit(catalogue_cache.bump_version)
+            transaction.on_commit(featured.schedule_refresh)
+    return result
+
+
+# Writing
+
+class _Echo:
+    """File-like object whose write() just returns the line (for csv.writer)."""
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset=None, chunk_size=2000):
+    """Yield one tuple per item, in FIELDS order, without loading them all."""
+    if queryset is None:
+        queryset = Item.objects.all()
+    rows = queryset.order_by("id").values_list(
+        "id", "label", "category__url_name", "subcategory__url_name", "price",
+        "description", "element", "reality_fragment", "rarity", "image_url", "stock",
+    )
+    return rows.iterator(chunk_size=chunk_size)
+
+
+def export_lines(fmt="csv", queryset=None):
+    """Yield the export file line by line (header first for CSV)."""
+    if fmt == "csv":
+        writer = csv.writer(_Echo())
+        yield writer.writerow(FIELDS)
+        for row in export_rows(queryset):
+            yield writer.writerow(["" if value is None else value for value in row])
+    else:
+        for row in export_rows(queryset):
+            record = dict(zip(FIELDS, row))
+            record["price"] = str(record["price"])
+            yield json.dumps(record, ensure_ascii=False) + "\n"
@@ -0,0 +1,83 @@
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Category, Item, SubCategory
+from core.services import place_order
+
+
+WRITE_PREFIXES = ("INSERT", "UPDATE", "DELETE")
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure how checkout write count and latency scale with cart size. "
+        "Runs inside a transaction that is rolled back, so nothing is kept."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", default="1,5,25,100,250",
+            help="Comma separated cart sizes (distinct items per cart).",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=20,
+            help="Checkouts per cart size.",
+        )
+
+    def handle(self, *args, **options):
+        sizes = [int(s) for s in options["sizes"].split(",") if s.strip()]
+        repeat = options["repeat"]
+
+        try:
+            with transaction.atomic():
+                self.run(sizes, repeat)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, sizes, repeat):
+        category = Category.objects.create(label="Bench", url_name="bench-checkout")
+        sub = SubCategory.objects.create(
+            category=category, label="Bench", url_name="bench-checkout-sub"
+        )
+        items = Item.objects.bulk_create(
+            Item(
+                label=f"Bench item {n}",
+                category=category,
+                subcategory=sub,
+                price=Decimal("9.99"),
+            )
+            for n in range(max(sizes))
+        )
+        user = User.objects.create_user("bench-checkout")
+
+        self.stdout.write(f"{'lines':>6} {'queries':>8} {'writes':>7} {'p50 ms':>8} {'p95 ms':>8}")
+        for size in sizes:
+            cart = {str(item.id): 2 for item in items[:size]}
+            timings = []
+            for _ in range(repeat):
+                with CaptureQueriesContext(connection) as ctx:
+                    start = time.perf_counter()
+                    place_order(user, cart)
+                    timings.append((time.perf_counter() - start) * 1000)
+
+            writes = sum(
+                1 for q in ctx.captured_queries
+                if q["sql"].lstrip().upper().startswith(WRITE_PREFIXES)
+            )
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            self.stdout.write(
+                f"{size:>6} {len(ctx.captured_queries):>8} {writes:>7} "
+                f"{statistics.median(timings):>8.2f} {p95:>8.2f}"
+            )
@@ -0,0 +1,228 @@
+import asyncio
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from core.models import Item
+
+
+# gunicorn at the same worker count: sync workers + the sync views, or
+# uvicorn workers + the async views (asgi.py turns ASYNC_VIEWS on)
+PROFILES = {
+    "wsgi": {
+        "app": "mirage_project.wsgi:application",
+        "worker_class": "sync",
+        "module": "gunicorn",
+        "env": {"ASYNC_VIEWS": "False"},
+    },
+    "asgi": {
+        "app": "mirage_project.asgi:application",
+        "worker_class": "uvicorn_worker.UvicornWorker",
+        "module": "uvicorn_worker",
+        "env": {"ASYNC_VIEWS": "True"},
+    },
+}
+
+DEFAULT_PATHS = ["/", "/catalogue/", "/catalogue/json/", "/item/{item}/", "/cart/json/?lines=0"]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def fetch(host, port, path):
+    """One GET on a new connection; returns the status code."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode()
+        )
+        await writer.drain()
+        status_line = await reader.readline()
+        await reader.read()  # headers and body, up to the server's close
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+async def slow_client(host, port, deadline, byte_delay):
+    """Trickles one request's headers in, a byte at a time."""
+    while time.monotonic() < deadline:
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+        except OSError:
+            await asyncio.sleep(byte_delay)
+            continue
+        try:
+            writer.write(f"GET / HTTP/1.1\r\nHost: {host}\r\n".encode())
+            for byte in b"X-Slow: " + b"z" * 1000:
+                if time.monotonic() >= deadline:
+                    break
+                writer.write(bytes([byte]))
+                await writer.drain()
+                await asyncio.sleep(byte_delay)
+        except OSError:
+            pass
+        finally:
+            writer.close()
+
+
+async def load(host, port, paths, concurrency, duration, slow_clients, byte_delay):
+    deadline = time.monotonic() + duration
+    timings, statuses = [], Counter()
+
+    async def client(n):
+        i = n
+        while time.monotonic() < deadline:
+            path = paths[i % len(paths)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                status = await fetch(host, port, path)
+            except OSError as exc:
+                statuses[f"error: {exc.__class__.__name__}"] += 1
+                continue
+            timings.append((time.perf_counter() - start) * 1000)
+            statuses[status] += 1
+
+    slow = [slow_client(host, port, deadline, byte_delay) for _ in range(slow_clients)]
+    await asyncio.gather(*(client(n) for n in range(concurrency)), *slow)
+    return timings, statuses
+
+
+class Command(BaseCommand):
+    help = (
+        "Start the app under gunicorn with sync workers (WSGI) and with "
+        "uvicorn workers (ASGI, async views), at the same worker count, and "
+        "compare requests per second on the read-heavy pages. Run it on a "
+        "seeded database after collectstatic (see build.sh)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profiles", default="wsgi,asgi",
+                            help=f"Comma separated, out of {', '.join(PROFILES)}.")
+        parser.add_argument("--workers", type=int, default=2, help="Worker processes per server.")
+        parser.add_argument("--concurrency", type=int, default=32,
+                            help="Clients sending requests back to back.")
+        parser.add_argument("--duration", type=float, default=10, help="Seconds measured per profile.")
+        parser.add_argument("--warmup", type=float, default=2, help="Unmeasured seconds first.")
+        parser.add_argument("--slow-clients", type=int, default=0,
+                            help="Extra clients that send their headers a byte at a time.")
+        parser.add_argument("--byte-delay", type=float, default=0.5,
+                            help="Seconds between the slow clients' bytes.")
+        parser.add_argument("--path", action="append", dest="paths",
+                            help="URL to request (repeatable; default: home, catalogue, "
+                                 "catalogue JSON, an item page, cart count).")
+        parser.add_argument("--port", type=int, default=8800)
+        parser.add_argument("--output", help="JSON file (default: bench_servers-<time>.json).")
+        parser.add_argument("--label", default="", help="Free text stored with the results.")
+
+    def handle(self, *args, **options):
+        item = Item.objects.order_by("-created_at", "-id").values_list("id", flat=True).first()
+        if item is None:
+            raise CommandError("No items; run 'manage.py seed_mirage' first.")
+        profiles = [name.strip() for name in options["profiles"].split(",") if name.strip()]
+        for name in profiles:
+            if name not in PROFILES:
+                raise CommandError(f"Unknown profile {name!r}.")
+            module = PROFILES[name]["module"]
+            if importlib.util.find_spec(module) is None:
+                raise CommandError(f"The {name} profile needs {module} (pip install -r requirements.txt).")
+
+        paths = [path.format(item=item) for path in options["paths"] or DEFAULT_PATHS]
+        results = {}
+        for name in profiles:
+            self.stdout.write(f"{name}: {options['workers']} workers ...")
+            results[name] = self.run(PROFILES[name], paths, options)
+
+        report = {
+            "label": options["label"],
+            "timestamp": timezone.now().isoformat(),
+            "environment": {
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "cache": settings.CACHES["default"]["BACKEND"],
+                "cpus": os.cpu_count(),
+                "workers": options["workers"],
+                "concurrency": options["concurrency"],
+                "slow_clients": options["slow_clients"],
+                "duration": options["duration"],
+                "paths": paths,
+            },
+            "profiles": results,
+        }
+        path = options["output"] or f"bench_servers-{timezone.now():%Y%m%d-%H%M%S}.json"
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+
+        self.stdout.write(f"{'profile':<8} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+        for name, row in results.items():
+            self.stdout.write(
+                f"{name:<8} {row['rps']:>9.1f} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} "
+                f"{row['errors']:>7}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Saved {path}"))
+
+    def run(self, profile, paths, options):
+        host, port = "127.0.0.1", options["port"]
+        command = [
+            sys.executable, "-m", "gunicorn", profile["app"],
+            "--worker-class", profile["worker_class"],
+            "--workers", str(options["workers"]),
+            "--bind", f"{host}:{port}",
+            "--log-level", "warning",
+        ]
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get(
+            "DJANGO_SETTINGS_MODULE", "mirage_project.settings"
+        ), **profile["env"])
+        server = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+        try:
+            self.wait_until_up(host, port, server)
+            if options["warmup"]:
+                asyncio.run(load(host, port, paths, options["concurrency"], options["warmup"], 0, 0))
+            timings, statuses = asyncio.run(load(
+                host, port, paths, options["concurrency"], options["duration"],
+                options["slow_clients"], options["byte_delay"],
+            ))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+        if not timings:
+            raise CommandError(f"No request got through: {dict(statuses)}")
+        errors = sum(n for status, n in statuses.items() if not isinstance(status, int) or status >= 500)
+        return {
+            "rps": round(len(timings) / options["duration"], 1),
+            "p50_ms": round(statistics.median(timings), 3),
+            "p95_ms": round(percentile(timings, 0.95), 3),
+            "requests": len(timings),
+            "errors": errors,
+            "status_codes": {str(status): n for status, n in sorted(statuses.items(), key=str)},
+        }
+
+    def wait_until_up(self, host, port, server, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError("The server exited; see its output above.")
+            try:
+                if asyncio.run(fetch(host, port, "/")) < 500:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise CommandError(f"The server did not answer within {timeout}s.")
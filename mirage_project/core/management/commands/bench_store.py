@@ -0,0 +1,151 @@
+import json
+import platform
+import statistics
+import time
+import uuid
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Item, Order
+
+
+class Rollback(Exception):
+    pass
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the main store pages through the test client and report p50/p95 "
+        "latency and query counts per endpoint, saved as JSON. Run it on a "
+        "seeded database (manage.py seed_mirage); everything it writes is "
+        "rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=50,
+                            help="Requests per endpoint.")
+        parser.add_argument("--warmup", type=int, default=3,
+                            help="Unmeasured requests per endpoint first.")
+        parser.add_argument("--cold-cache", action="store_true",
+                            help="Clear the cache before every request.")
+        parser.add_argument("--output", help="JSON file (default: bench_store-<time>.json).")
+        parser.add_argument("--label", default="", help="Free text stored with the results.")
+
+    def handle(self, *args, **options):
+        if not Item.objects.exists():
+            raise CommandError("No items; run 'manage.py seed_mirage' first.")
+
+        results = {}
+        try:
+            with transaction.atomic():
+                results = self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+        report = {
+            "label": options["label"],
+            "timestamp": timezone.now().isoformat(),
+            "environment": {
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "cache": settings.CACHES["default"]["BACKEND"],
+                "cold_cache": options["cold_cache"],
+                "requests": options["requests"],
+            },
+            "data": {
+                "items": Item.objects.count(),
+                "users": User.objects.count(),
+                "orders": Order.objects.count(),
+            },
+            "endpoints": results,
+        }
+
+        path = options["output"] or f"bench_store-{timezone.now():%Y%m%d-%H%M%S}.json"
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+
+        self.stdout.write(f"{'endpoint':<20} {'p50 ms':>8} {'p95 ms':>8} {'queries':>8}")
+        for name, row in results.items():
+            self.stdout.write(
+                f"{name:<20} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['queries_p50']:>8}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Saved {path}"))
+
+    def run(self, options):
+        host = next((h for h in settings.ALLOWED_HOSTS if h and "*" not in h), "localhost")
+        anonymous = Client(HTTP_HOST=host)
+        client = Client(HTTP_HOST=host)
+        user = User.objects.create_user(f"bench-store-{uuid.uuid4().hex[:8]}")
+        client.force_login(user)
+
+        items = list(Item.objects.order_by("-created_at", "-id").values_list("id", "label")[:50])
+        item_id, label = items[0]
+        word = label.split()[0]
+
+        def add():
+            return client.post(reverse("add_to_cart", args=[item_id]))
+
+        def checkout():
+            # measured request only: the cart is refilled before each one
+            return client.post(reverse("checkout"), {"idempotency_key": uuid.uuid4().hex})
+
+        endpoints = [
+            ("home", lambda: anonymous.get(reverse("home")), None),
+            ("catalogue", lambda: anonymous.get(reverse("catalogue")), None),
+            ("catalogue_search", lambda: anonymous.get(reverse("catalogue"), {"q": word}), None),
+            ("catalogue_filters", lambda: anonymous.get(
+                reverse("catalogue"), {"rarity": "rare", "min_price": "10", "max_price": "40"}
+            ), None),
+            ("catalogue_popular", lambda: anonymous.get(reverse("catalogue"), {"sort": "popular"}), None),
+            ("item_detail", lambda: anonymous.get(reverse("item_detail", args=[item_id])), None),
+            ("add_to_cart", add, None),
+            ("view_cart", lambda: client.get(reverse("view_cart")), None),
+            ("checkout", checkout, add),
+            ("dashboard", lambda: client.get(reverse("dashboard")), None),
+        ]
+
+        results = {}
+        for name, request, prepare in endpoints:
+            for _ in range(options["warmup"]):
+                if prepare:
+                    prepare()
+                request()
+
+            timings, queries, statuses = [], [], set()
+            for _ in range(options["requests"]):
+                if prepare:
+                    prepare()
+                if options["cold_cache"]:
+                    cache.clear()
+                with CaptureQueriesContext(connection) as ctx:
+                    start = time.perf_counter()
+                    response = request()
+                    timings.append((time.perf_counter() - start) * 1000)
+                queries.append(len(ctx.captured_queries))
+                statuses.add(response.status_code)
+
+            results[name] = {
+                "p50_ms": round(statistics.median(timings), 3),
+                "p95_ms": round(percentile(timings, 0.95), 3),
+                "mean_ms": round(statistics.fmean(timings), 3),
+                "queries_p50": statistics.median_low(queries),
+                "queries_max": max(queries),
+                "status_codes": sorted(statuses),
+            }
+        return results
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core import assets
+
+
+class Command(BaseCommand):
+    help = (
+        "Concatenate the CSS/JS bundles (core.assets, CSS minified) into "
+        "core/static/bundles/. Run it before collectstatic."
+    )
+
+    def handle(self, *args, **options):
+        for name, before, after in assets.build():
+            self.stdout.write(f"{name:<16} {before:>7} -> {after:>7} bytes")
+        self.stdout.write(self.style.SUCCESS("Bundles written."))
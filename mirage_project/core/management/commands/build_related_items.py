@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import related
+
+
+class Command(BaseCommand):
+    help = (
+        "Precompute the item detail page's related items from the order "
+        "lines and item attributes (run from cron, e.g. nightly)."
+    )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        written = related.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"{written} related item rows written in {time.perf_counter() - start:.1f}s."
+        ))
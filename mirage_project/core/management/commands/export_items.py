@@ -0,0 +1,24 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from core import item_io
+
+
+class Command(BaseCommand):
+    help = "Export every item as CSV or JSON Lines (to a file or stdout)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", help="Defaults to stdout.")
+        parser.add_argument("--format", choices=item_io.FORMATS,
+                            help="Defaults to the file extension (csv).")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or item_io.guess_format(path)
+
+        if path:
+            with open(path, "w", encoding="utf-8", newline="") as handle:
+                handle.writelines(item_io.export_lines(fmt))
+        else:
+            sys.stdout.writelines(item_io.export_lines(fmt))
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import thumbnails
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate WebP/AVIF thumbnails of the item images (new or changed "
+        "images only, in a process pool). Run it before collectstatic."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="*",
+                            help="Image paths under static/ (default: every item image).")
+        parser.add_argument("--force", action="store_true",
+                            help="Regenerate even the images that did not change.")
+        parser.add_argument("--workers", type=int,
+                            help="Worker processes (default: one per CPU).")
+
+    def handle(self, *args, **options):
+        if not thumbnails.available():
+            raise CommandError("Pillow is not installed (pip install Pillow).")
+        if not thumbnails.formats():
+            raise CommandError("This Pillow build can't write any of THUMBNAIL_FORMATS.")
+
+        start = time.perf_counter()
+        result = thumbnails.generate(
+            options["paths"] or None, force=options["force"], workers=options["workers"]
+        )
+        for path in result.missing:
+            self.stderr.write(f"Not found: {path}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(result.generated)} images processed, {result.skipped} unchanged "
+            f"({', '.join(thumbnails.formats())} at {thumbnails.widths()}) "
+            f"in {time.perf_counter() - start:.1f}s."
+        ))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import item_io
+
+
+class Command(BaseCommand):
+    help = (
+        "Import items from a CSV or JSON Lines file (see core/item_io.py for "
+        "the columns). Nothing is written if any row is invalid."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=item_io.FORMATS,
+                            help="Defaults to the file extension (csv).")
+        parser.add_argument("--batch-size", type=int, default=item_io.BATCH_SIZE)
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Validate and roll back.")
+
+    def handle(self, *args, **options):
+        fmt = options["format"] or item_io.guess_format(options["path"])
+        try:
+            handle = open(options["path"], encoding="utf-8-sig", newline="")
+        except OSError as exc:
+            raise CommandError(exc)
+
+        with handle:
+            result = item_io.import_items(
+                item_io.read_rows(handle, fmt),
+                batch_size=options["batch_size"],
+                dry_run=options["dry_run"],
+            )
+
+        if not result.ok:
+            for line, message in result.errors:
+                self.stderr.write(f"line {line}: {message}")
+            raise CommandError("Import failed, nothing was written.")
+
+        prefix = "Dry run: would have " if options["dry_run"] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}created {result.created} and updated {result.updated} items."
+        ))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from core import search
+from core.models import Item
+
+
+class Command(BaseCommand):
+    help = "Rebuild the catalogue full-text search index from scratch."
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            self.stdout.write(self.style.WARNING(
+                "This database backend has no search index; "
+                "the catalogue falls back to icontains filtering."
+            ))
+            return
+
+        search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {Item.objects.count()} items."
+        ))
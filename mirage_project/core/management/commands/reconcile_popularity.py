@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core import popularity
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute Item.wishlist_count and Item.units_sold from the wishlist "
+        "and order rows, fixing any drift (run from cron, e.g. nightly)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Only report how many items drifted.")
+
+    def handle(self, *args, **options):
+        drifted = popularity.reconcile(dry_run=options["dry_run"])
+        verb = "drifted" if options["dry_run"] else "fixed"
+        self.stdout.write(self.style.SUCCESS(f"{drifted} items {verb}."))
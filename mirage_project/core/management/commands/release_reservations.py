@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.stock import release_expired
+
+
+class Command(BaseCommand):
+    help = "Return the units of expired cart reservations to stock (run from cron)."
+
+    def handle(self, *args, **options):
+        released = release_expired()
+        self.stdout.write(self.style.SUCCESS(f"Released {released} expired reservations."))
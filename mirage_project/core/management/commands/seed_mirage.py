@@ -0,0 +1,166 @@
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import catalogue_cache, featured, popularity, related, search
+from core.models import (
+    Category, Item, Order, OrderItem, RARITY_CHOICES, SubCategory, WishlistItem,
+)
+
+
+BATCH_SIZE = 1000
+
+WORDS = [
+    "Ember", "Storm", "Tide", "Ash", "Rune", "Veil", "Ever", "Hollow", "Glass",
+    "Iron", "Thorn", "Star", "Moon", "Frost", "Grove", "Dusk", "Shard", "Echo",
+]
+NOUNS = [
+    "Longbow", "Blade", "Mug", "Poster", "Map", "Cloak", "Relic", "Lantern",
+    "Tome", "Amulet", "Banner", "Shield", "Figurine", "Hoodie", "Compass",
+]
+ELEMENTS = ["Fire", "Water", "Earth", "Air", "Void", ""]
+REALITIES = ["Vaeloria", "Everroot", "Ashen Wastes", "Tidecaller Isles", ""]
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with synthetic categories, items, users, "
+        "wishlists and orders (bulk inserts) for load tests and benchmarks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--categories", type=int, default=4)
+        parser.add_argument("--subcategories", type=int, default=4,
+                            help="Subcategories per category.")
+        parser.add_argument("--items", type=int, default=5000)
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--wishlist", type=int, default=5,
+                            help="Wishlisted items per user.")
+        parser.add_argument("--orders", type=int, default=10, help="Orders per user.")
+        parser.add_argument("--lines", type=int, default=3, help="Lines per order.")
+        parser.add_argument("--password", default="mirage-seed",
+                            help="Password of every generated user.")
+        parser.add_argument("--prefix", default="seed",
+                            help="Prefix for generated usernames and url names.")
+        parser.add_argument("--random-seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["random_seed"])
+        self.prefix = options["prefix"]
+        start = time.perf_counter()
+
+        with transaction.atomic():
+            subcategories = self.seed_categories(options["categories"], options["subcategories"])
+            item_ids, prices = self.seed_items(options["items"], subcategories)
+            users = self.seed_users(options["users"], options["password"])
+            wishlists = self.seed_wishlists(users, item_ids, options["wishlist"])
+            orders = self.seed_orders(users, item_ids, prices, options["orders"], options["lines"])
+
+            # bulk inserts skip the model signals and the popularity counters
+            search.rebuild_index()
+            popularity.reconcile()
+            related.rebuild()
+            catalogue_cache.bump_version()
+            transaction.on_commit(catalogue_cache.bump_version)
+
+        # here rather than in a background thread that would die with the command
+        featured.build()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(subcategories)} subcategories, {len(item_ids)} items, "
+            f"{len(users)} users, {wishlists} wishlist entries and {orders} orders "
+            f"in {time.perf_counter() - start:.1f}s."
+        ))
+
+    def seed_categories(self, count, per_category):
+        subcategories = []
+        for n in range(count):
+            category, _ = Category.objects.get_or_create(
+                url_name=f"{self.prefix}-cat-{n}",
+                defaults={"label": f"{self.random.choice(WORDS)} Collection {n}"},
+            )
+            for m in range(per_category):
+                sub, _ = SubCategory.objects.get_or_create(
+                    url_name=f"{self.prefix}-cat-{n}-{m}",
+                    defaults={"category": category, "label": f"{self.random.choice(NOUNS)}s {m}"},
+                )
+                subcategories.append(sub)
+        return subcategories
+
+    def seed_items(self, count, subcategories):
+        rarities = [value for value, _label in RARITY_CHOICES]
+        ids, prices = [], {}
+        for start in range(0, count, BATCH_SIZE):
+            batch = []
+            for _ in range(min(BATCH_SIZE, count - start)):
+                sub = self.random.choice(subcategories)
+                label = f"{self.random.choice(WORDS)}{self.random.choice(WORDS).lower()} {self.random.choice(NOUNS)}"
+                batch.append(Item(
+                    label=label,
+                    category_id=sub.category_id,
+                    subcategory=sub,
+                    price=Decimal(self.random.randint(199, 7999)) / 100,
+                    element=self.random.choice(ELEMENTS),
+                    reality_fragment=self.random.choice(REALITIES),
+                    rarity=self.random.choices(rarities, weights=[70, 25, 5])[0],
+                    description=f"A {label.lower()} from the Mirage universe.",
+                ))
+            for item in Item.objects.bulk_create(batch):
+                ids.append(item.id)
+                prices[item.id] = item.price
+        return ids, prices
+
+    def seed_users(self, count, password):
+        # hashing once keeps thousands of users fast
+        hashed = make_password(password)
+        usernames = [f"{self.prefix}-user-{n}" for n in range(count)]
+        for start in range(0, count, BATCH_SIZE):
+            User.objects.bulk_create(
+                (User(username=name, password=hashed) for name in usernames[start:start + BATCH_SIZE]),
+                ignore_conflicts=True,
+            )
+        return list(User.objects.filter(username__in=usernames).values_list("id", flat=True))
+
+    def seed_wishlists(self, users, item_ids, per_user):
+        rows = [
+            WishlistItem(user_id=user_id, item_id=item_id)
+            for user_id in users
+            for item_id in self.random.sample(item_ids, min(per_user, len(item_ids)))
+        ]
+        WishlistItem.objects.bulk_create(rows, batch_size=BATCH_SIZE, ignore_conflicts=True)
+        return len(rows)
+
+    def seed_orders(self, users, item_ids, prices, per_user, lines):
+        if not item_ids:
+            return 0
+        created = 0
+        pending = [(user_id, n) for user_id in users for n in range(per_user)]
+        for start in range(0, len(pending), BATCH_SIZE):
+            carts = []
+            for user_id, _n in pending[start:start + BATCH_SIZE]:
+                picked = self.random.sample(item_ids, min(lines, len(item_ids)))
+                carts.append((user_id, {item_id: self.random.randint(1, 3) for item_id in picked}))
+
+            orders = Order.objects.bulk_create(
+                Order(
+                    user_id=user_id,
+                    total_price=sum(prices[item_id] * qty for item_id, qty in cart.items()),
+                )
+                for user_id, cart in carts
+            )
+            OrderItem.objects.bulk_create(
+                (
+                    OrderItem(order=order, item_id=item_id, quantity=qty,
+                              price_at_purchase=prices[item_id])
+                    for order, (_user_id, cart) in zip(orders, carts)
+                    for item_id, qty in cart.items()
+                ),
+                batch_size=BATCH_SIZE,
+            )
+            created += len(orders)
+        return created
@@ -0,0 +1,101 @@
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+
+from core.models import Category, Item, Order, OrderItem, SubCategory
+from core.services import place_order
+from core.stock import OutOfStock
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire many concurrent checkouts at one limited item and check that "
+        "nothing is oversold. Creates its own item/users and removes them after."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--buyers", type=int, default=300)
+        parser.add_argument("--stock", type=int, default=50)
+        parser.add_argument("--quantity", type=int, default=1, help="Units per checkout.")
+        parser.add_argument("--workers", type=int, default=16, help="Concurrent threads.")
+
+    def handle(self, *args, **options):
+        buyers = options["buyers"]
+        initial = options["stock"]
+        quantity = options["quantity"]
+        tag = f"loadtest-{uuid.uuid4().hex[:8]}"
+
+        category = Category.objects.create(label="Load test", url_name=tag)
+        sub = SubCategory.objects.create(category=category, label="Load test", url_name=f"{tag}-sub")
+        item = Item.objects.create(
+            label=f"Legendary drop {tag}",
+            category=category,
+            subcategory=sub,
+            price=Decimal("49.99"),
+            rarity="legendary",
+            stock=initial,
+        )
+        User.objects.bulk_create(User(username=f"{tag}-{n}") for n in range(buyers))
+        users = list(User.objects.filter(username__startswith=f"{tag}-"))
+
+        outcomes = Counter()
+        lock = threading.Lock()
+
+        def buy(user):
+            try:
+                place_order(user, {str(item.id): quantity})
+                result = "sold"
+            except OutOfStock:
+                result = "out_of_stock"
+            except Exception as exc:  # reported, not swallowed
+                result = f"error: {exc.__class__.__name__}: {exc}"
+            finally:
+                connection.close()
+            with lock:
+                outcomes[result] += 1
+
+        try:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+                list(pool.map(buy, users))
+            elapsed = time.perf_counter() - start
+
+            item.refresh_from_db()
+            sold_units = (
+                OrderItem.objects.filter(item=item).aggregate(n=Sum("quantity"))["n"] or 0
+            )
+            expected_sold = min(buyers, initial // quantity)
+
+            self.stdout.write(f"{buyers} checkouts in {elapsed:.2f}s with {options['workers']} workers")
+            for result, count in sorted(outcomes.items()):
+                self.stdout.write(f"  {result}: {count}")
+            self.stdout.write(
+                f"  stock {initial} -> {item.stock}, units on orders: {sold_units}"
+            )
+
+            problems = []
+            if outcomes["sold"] != expected_sold:
+                problems.append(f"expected {expected_sold} successful checkouts")
+            if sold_units != outcomes["sold"] * quantity:
+                problems.append("order lines don't match successful checkouts")
+            if item.stock != initial - sold_units:
+                problems.append("remaining stock doesn't match units sold")
+        finally:
+            connection.close()
+            Order.objects.filter(user__username__startswith=f"{tag}-").delete()
+            User.objects.filter(username__startswith=f"{tag}-").delete()
+            item.delete()
+            sub.delete()
+            category.delete()
+
+        if problems:
+            raise CommandError("; ".join(problems))
+        self.stdout.write(self.style.SUCCESS("OK: no overselling, counts are exact."))
@@ -0,0 +1,88 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.http import FileResponse
+from whitenoise.middleware import WhiteNoiseFileResponse, WhiteNoiseMiddleware
+
+
+class CartMiddleware:
+    """
+    Writes the anonymous cart cookie when the cart changed during the
+    request (see core.cart). Must come after AuthenticationMiddleware.
+    """
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self.save_cart(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        self.save_cart(request, response)
+        return response
+
+    def save_cart(self, request, response):
+        # only a cookie to write: whatever changed the cart loaded it
+        cart = getattr(request, "_cart", None)
+        if cart is not None:
+            cart.save_cookie(response)
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise, usable in an async middleware chain as well. WhiteNoise
+    itself is sync only, which under ASGI would send every request
+    through a thread just to pass it on.
+    """
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            # DEBUG: looks on disk
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await self.aserve(static_file, request)
+        return await self.get_response(request)
+
+    @staticmethod
+    async def aserve(static_file, request):
+        # serve(), streaming the file without blocking the event loop
+        response = await sync_to_async(static_file.get_response, thread_sensitive=False)(
+            request.method, request.META
+        )
+        http_response = WhiteNoiseFileResponse(_read_chunks(response.file), status=int(response.status))
+        del http_response["content-type"]
+        for key, value in response.headers:
+            http_response[key] = value
+        return http_response
+
+
+async def _read_chunks(file, size=FileResponse.block_size):
+    if file is None:
+        return
+    read = sync_to_async(file.read, thread_sensitive=False)
+    try:
+        while chunk := await read(size):
+            yield chunk
+    finally:
+        file.close()
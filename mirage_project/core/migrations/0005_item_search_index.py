@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from core.search import create_index_table
+    create_index_table(schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    from core.search import drop_index_table
+    drop_index_table(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_rename_added_at_wishlistitem_created_at_order_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_order_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='stock',
+            field=models.PositiveIntegerField(blank=True, help_text='Units left to sell. Leave empty for unlimited stock.', null=True),
+        ),
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('holder', models.CharField(db_index=True, max_length=64)),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='core.item')),
+            ],
+            options={
+                'unique_together': {('holder', 'item')},
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_order_user_history_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['-created_at', '-id'], name='item_newest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['category', '-created_at', '-id'], name='item_category_newest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['subcategory', '-created_at', '-id'], name='item_subcat_newest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['rarity', '-created_at', '-id'], name='item_rarity_newest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['price'], name='item_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wishlistitem',
+            index=models.Index(fields=['user', '-created_at'], name='wishlist_user_newest_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:38
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Item = apps.get_model("core", "Item")
+    WishlistItem = apps.get_model("core", "WishlistItem")
+    OrderItem = apps.get_model("core", "OrderItem")
+
+    wished = (
+        WishlistItem.objects.filter(item=OuterRef("pk"))
+        .order_by().values("item").annotate(n=Count("id")).values("n")
+    )
+    sold = (
+        OrderItem.objects.filter(item=OuterRef("pk")).exclude(order__status="cancelled")
+        .order_by().values("item").annotate(n=Sum("quantity")).values("n")
+    )
+    Item.objects.update(
+        wishlist_count=Coalesce(Subquery(wished, output_field=IntegerField()), Value(0)),
+        units_sold=Coalesce(Subquery(sold, output_field=IntegerField()), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_catalogue_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='units_sold',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='wishlist_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['-wishlist_count', '-id'], name='item_most_wished_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['-units_sold', '-id'], name='item_best_sellers_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_item_popularity_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='featured',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(condition=models.Q(('featured', True)), fields=['-created_at', '-id'], name='item_curated_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:20
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def start_from_created_at(apps, schema_editor):
+    Item = apps.get_model("core", "Item")
+    Item.objects.update(updated_at=F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_item_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='subcategory',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(start_from_created_at, migrations.RunPython.noop),
+    ]
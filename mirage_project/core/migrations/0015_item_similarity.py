@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('co_purchases', models.PositiveIntegerField(default=0)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar', to='core.item')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.item')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['item', '-score'], name='item_similar_idx')],
+                'unique_together': {('item', 'related')},
+            },
+        ),
+    ]
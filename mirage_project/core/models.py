@@ -8,6 +8,7 @@ from django.contrib.auth.models import User
 class Category(models.Model):
     label = models.CharField(max_length=50)
     url_name = models.SlugField(unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name_plural = "Categories"
@@ -24,6 +25,7 @@ class SubCategory(models.Model):
     )
     label = models.CharField(max_length=50)
     url_name = models.SlugField(unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.category.label} - {self.label}"
@@ -70,12 +72,155 @@ class Item(models.Model):
         help_text="Path under static/, e.g. 'images/items/emberwreath-longbow.png'",
     )
 
+    # limited drops; empty means unlimited
+    stock = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Units left to sell. Leave empty for unlimited stock.",
+    )
+
     created_at = models.DateTimeField(auto_now_add=True)
+    # also set by the bulk paths (QuerySet.update/bulk_update skip auto_now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # popularity counters, kept up to date with F() increments by the
+    # wishlist toggle and checkout; 'manage.py reconcile_popularity' fixes drift
+    wishlist_count = models.PositiveIntegerField(default=0, editable=False)
+    units_sold = models.PositiveIntegerField(default=0, editable=False)
+
+    # hand-picked for the home page (FEATURED_STRATEGY = "curated")
+    featured = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # catalogue/home: newest first, alone or within a filter
+            models.Index(fields=["-created_at", "-id"], name="item_newest_idx"),
+            models.Index(fields=["category", "-created_at", "-id"], name="item_category_newest_idx"),
+            models.Index(fields=["subcategory", "-created_at", "-id"], name="item_subcat_newest_idx"),
+            models.Index(fields=["rarity", "-created_at", "-id"], name="item_rarity_newest_idx"),
+            # min/max price filters
+            models.Index(fields=["price"], name="item_price_idx"),
+            # "Most wished" / "Best sellers" sorts
+            models.Index(fields=["-wishlist_count", "-id"], name="item_most_wished_idx"),
+            models.Index(fields=["-units_sold", "-id"], name="item_best_sellers_idx"),
+            # curated home page slate
+            models.Index(
+                fields=["-created_at", "-id"], condition=models.Q(featured=True),
+                name="item_curated_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.label
 
 
+class ItemSimilarity(models.Model):
+    """
+    "Related items" of an item, precomputed by core.related (co-purchases
+    plus shared subcategory/element/reality fragment), best first.
+    """
+    item = models.ForeignKey(
+        Item,
+        on_delete=models.CASCADE,
+        related_name="similar",
+    )
+    related = models.ForeignKey(
+        Item,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    score = models.FloatField()
+    co_purchases = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("item", "related")
+        indexes = [
+            # the detail page's lookup: best matches of one item
+            models.Index(fields=["item", "-score"], name="item_similar_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.item_id} -> {self.related_id} ({self.score:.3f})"
+
+
+class ItemImage(models.Model):
+    """
+    A source image under static/ (what Item.image_url points to) and the
+    content hash its thumbnails were generated from (see core.thumbnails).
+    """
+    path = models.CharField(max_length=200, unique=True)
+    content_hash = models.CharField(max_length=64)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    generated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.path
+
+
+class ItemThumbnail(models.Model):
+    """One resized copy of an ItemImage (path is under static/)."""
+    image = models.ForeignKey(
+        ItemImage,
+        on_delete=models.CASCADE,
+        related_name="thumbnails",
+    )
+    format = models.CharField(max_length=10)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    path = models.CharField(max_length=255)
+
+    class Meta:
+        unique_together = ("image", "format", "width")
+
+    def __str__(self):
+        return self.path
+
+
+class StockReservation(models.Model):
+    """
+    Units of a limited item held for one cart for a short time.
+    The units are already taken out of Item.stock while held.
+    """
+    item = models.ForeignKey(
+        Item,
+        on_delete=models.CASCADE,
+        related_name="reservations",
+    )
+    holder = models.CharField(max_length=64, db_index=True)
+    quantity = models.PositiveIntegerField(default=1)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ("holder", "item")
+
+    def __str__(self):
+        return f"{self.quantity} × {self.item.label} held by {self.holder}"
+
+
+class CartLine(models.Model):
+    """
+    One item in a logged-in user's cart (anonymous carts live in a cookie).
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="cart_lines",
+    )
+    item = models.ForeignKey(
+        Item,
+        on_delete=models.CASCADE,
+        related_name="cart_lines",
+    )
+    quantity = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        unique_together = ("user", "item")
+
+    def __str__(self):
+        return f"{self.quantity} × {self.item.label} in {self.user.username}'s cart"
+
+
 class WishlistItem(models.Model):
     user = models.ForeignKey(
         User,
@@ -91,6 +236,10 @@ class WishlistItem(models.Model):
 
     class Meta:
         unique_together = ("user", "item")
+        indexes = [
+            # the dashboard lists a user's wishlist newest first
+            models.Index(fields=["user", "-created_at"], name="wishlist_user_newest_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user.username} → {self.item.label}"
@@ -119,6 +268,21 @@ class Order(models.Model):
         decimal_places=2,
         default=Decimal("0.00"),
     )
+    # sent with the checkout form so a double submit can't create two orders
+    # (unique per user, see Meta)
+    idempotency_key = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        editable=False,
+    )
+
+    class Meta:
+        unique_together = ("user", "idempotency_key")
+        indexes = [
+            # a user's order history, newest first (keyset paginated)
+            models.Index(fields=["user", "-created_at", "-id"], name="order_user_history_idx"),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} by {self.user.username}"
@@ -0,0 +1,149 @@
+"""
+Keyset (cursor) pagination.
+
+Instead of OFFSET, each page remembers the sort key of its first and last
+row and the next query continues from there with a WHERE clause, so page
+1000 costs the same as page 1.
+
+    page = paginate_keyset(items, ("-created_at", "-id"), cursor, 24)
+
+The ordering must end in a unique field (normally ``id``).
+"""
+import base64
+import datetime
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """
+    DjangoJSONEncoder rounds datetimes to milliseconds, which would make
+    rows created within the same millisecond skip or repeat across pages.
+    """
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, prev_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def encode_cursor(values, direction):
+    payload = json.dumps({"v": values, "d": direction}, cls=CursorEncoder)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, model, ordering):
+    """
+    Return (values, direction) or (None, "next") for a missing/bad cursor.
+    """
+    if not cursor:
+        return None, "next"
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        raw_values, direction = payload["v"], payload["d"]
+    except (ValueError, KeyError, TypeError):
+        return None, "next"
+
+    if direction not in ("next", "prev") or len(raw_values) != len(ordering):
+        return None, "next"
+
+    values = []
+    for name, raw in zip(_field_names(ordering), raw_values):
+        try:
+            values.append(model._meta.get_field(name).to_python(raw))
+        except FieldDoesNotExist:
+            # annotations (e.g. search_rank) are plain JSON values
+            values.append(raw)
+        except ValidationError:
+            return None, "next"
+    return values, direction
+
+
+def _field_names(ordering):
+    return [o.lstrip("-") for o in ordering]
+
+
+def _after(ordering, values, reverse=False):
+    """
+    WHERE clause selecting rows that sort strictly after ``values``
+    (or strictly before them when ``reverse`` is set).
+    """
+    condition = Q()
+    equal = Q()
+    for order, value in zip(ordering, values):
+        name = order.lstrip("-")
+        descending = order.startswith("-")
+        lookup = "lt" if descending != reverse else "gt"
+        condition |= equal & Q(**{f"{name}__{lookup}": value})
+        equal &= Q(**{name: value})
+
+    # redundant bound on the first column: the OR above alone makes SQLite
+    # walk the index from the start instead of seeking to the cursor
+    name = ordering[0].lstrip("-")
+    lookup = "lte" if ordering[0].startswith("-") != reverse else "gte"
+    return Q(**{f"{name}__{lookup}": values[0]}) & condition
+
+
+def _reversed(ordering):
+    return [o[1:] if o.startswith("-") else f"-{o}" for o in ordering]
+
+
+def paginate_keyset(queryset, ordering, cursor=None, page_size=24):
+    """
+    Return a KeysetPage of at most ``page_size`` rows of ``queryset``
+    sorted by ``ordering``, starting from ``cursor``.
+    """
+    ordering = list(ordering)
+    names = _field_names(ordering)
+    values, direction = decode_cursor(cursor, queryset.model, ordering)
+
+    if direction == "prev":
+        qs = queryset.filter(_after(ordering, values, reverse=True))
+        rows = list(qs.order_by(*_reversed(ordering))[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size][::-1]
+        has_prev, has_next = has_more, True
+    else:
+        qs = queryset
+        if values is not None:
+            qs = qs.filter(_after(ordering, values))
+        rows = list(qs.order_by(*ordering)[:page_size + 1])
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        has_prev = values is not None
+
+    def key(obj):
+        return [getattr(obj, name) for name in names]
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if has_next:
+            next_cursor = encode_cursor(key(rows[-1]), "next")
+        if has_prev:
+            prev_cursor = encode_cursor(key(rows[0]), "prev")
+
+    return KeysetPage(rows, next_cursor, prev_cursor)
@@ -0,0 +1,269 @@
+"""
+Per-request performance numbers.
+
+PerfMiddleware measures, for a sample of requests (PERF_SAMPLE_RATE):
+
+- wall time of the whole request
+- number and total time of DB queries (connection.execute_wrapper)
+- template render time (through InstrumentedTemplates, the template
+  backend configured in settings.TEMPLATES)
+- response size
+
+and adds them up per URL name in rolling one-minute histograms kept in
+memory for the last PERF_WINDOW_MINUTES. Each worker process keeps its
+own numbers; manage/perf/ shows those of the process that serves it.
+Sampled responses also get a Server-Timing header (PERF_SERVER_TIMING).
+
+Works in both sync (WSGI) and async (ASGI) middleware chains: the timer
+of the current request is found through a context variable, which also
+reaches the threads async views run their queries in.
+"""
+import bisect
+import contextvars
+import random
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates, Template
+
+
+# upper bounds (ms) of the latency histogram buckets; the last one is open
+BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+_current = contextvars.ContextVar("perf_request", default=None)
+
+
+def enabled():
+    return getattr(settings, "PERF_ENABLED", True)
+
+
+def sample_rate():
+    return getattr(settings, "PERF_SAMPLE_RATE", 1.0)
+
+
+def window_minutes():
+    return getattr(settings, "PERF_WINDOW_MINUTES", 60)
+
+
+class RequestTimer:
+    """Numbers collected while one sampled request runs."""
+    def __init__(self):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self.rendering = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_ms += (time.perf_counter() - start) * 1000
+            self.queries += 1
+
+
+def _execute(execute, sql, params, many, context):
+    timer = _current.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+def install(sender=None, connection=None, **kwargs):
+    """
+    connection_created receiver (see core.apps): every connection reports
+    its queries to the sampled request running them, whichever thread
+    that is.
+    """
+    if _execute not in connection.execute_wrappers:
+        # first: connection.execute_wrapper() blocks pop the last one
+        connection.execute_wrappers.insert(0, _execute)
+
+
+class Stats:
+    """Totals and a latency histogram for one URL name."""
+    def __init__(self):
+        self.count = 0
+        self.buckets = [0] * (len(BOUNDS_MS) + 1)
+        self.max_ms = 0.0
+        self.total_ms = 0.0
+        self.queries = 0
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self.bytes = 0
+
+    def add(self, wall_ms, timer, size):
+        self.count += 1
+        self.buckets[bisect.bisect_left(BOUNDS_MS, wall_ms)] += 1
+        self.max_ms = max(self.max_ms, wall_ms)
+        self.total_ms += wall_ms
+        self.queries += timer.queries
+        self.db_ms += timer.db_ms
+        self.template_ms += timer.template_ms
+        self.bytes += size
+
+    def merge(self, other):
+        self.count += other.count
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        self.max_ms = max(self.max_ms, other.max_ms)
+        for name in ("total_ms", "queries", "db_ms", "template_ms", "bytes"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of requests."""
+        wanted = fraction * self.count
+        seen = 0
+        for bound, n in zip(BOUNDS_MS, self.buckets):
+            seen += n
+            if seen >= wanted:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def summary(self):
+        n = self.count or 1
+        return {
+            "count": self.count,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "max_ms": self.max_ms,
+            "avg_ms": self.total_ms / n,
+            "avg_queries": self.queries / n,
+            "avg_db_ms": self.db_ms / n,
+            "avg_template_ms": self.template_ms / n,
+            "avg_bytes": self.bytes / n,
+        }
+
+
+class Recorder:
+    """Rolling per-minute Stats per URL name (thread safe)."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._minutes = {}  # minute -> {url name: Stats}
+
+    def record(self, name, wall_ms, timer, size, now=None):
+        minute = int((time.time() if now is None else now) // 60)
+        with self._lock:
+            per_name = self._minutes.get(minute)
+            if per_name is None:
+                per_name = self._minutes[minute] = {}
+                self._expire(minute)
+            stats = per_name.get(name)
+            if stats is None:
+                stats = per_name[name] = Stats()
+            stats.add(wall_ms, timer, size)
+
+    def _expire(self, minute):
+        oldest = minute - window_minutes() + 1
+        for old in [m for m in self._minutes if m < oldest]:
+            del self._minutes[old]
+
+    def report(self, now=None):
+        """[(url name, summary dict)] over the window, slowest p95 first."""
+        minute = int((time.time() if now is None else now) // 60)
+        totals = {}
+        with self._lock:
+            self._expire(minute)
+            for per_name in self._minutes.values():
+                for name, stats in per_name.items():
+                    totals.setdefault(name, Stats()).merge(stats)
+        rows = [(name, stats.summary()) for name, stats in totals.items()]
+        rows.sort(key=lambda row: (-row[1]["p95_ms"], row[0]))
+        return rows
+
+    def reset(self):
+        with self._lock:
+            self._minutes.clear()
+
+
+recorder = Recorder()
+
+
+# Template backend
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        timer = _current.get()
+        if timer is None:
+            return super().render(context, request)
+        timer.rendering += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timer.rendering -= 1
+            # nested renders are already part of the outer one
+            if not timer.rendering:
+                timer.template_ms += (time.perf_counter() - start) * 1000
+
+
+class InstrumentedTemplates(DjangoTemplates):
+    """DjangoTemplates that reports render time to PerfMiddleware."""
+    def from_string(self, template_code):
+        return InstrumentedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return InstrumentedTemplate(template.template, self)
+
+
+# Middleware
+
+class PerfMiddleware:
+    """
+    Records timings for a sample of requests (see module docstring).
+    Put it first in MIDDLEWARE so the wall time covers everything.
+    """
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not enabled() or random.random() >= sample_rate():
+            return self.get_response(request)
+
+        timer = RequestTimer()
+        token = _current.set(timer)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timer, start)
+
+    async def __acall__(self, request):
+        if not enabled() or random.random() >= sample_rate():
+            return await self.get_response(request)
+
+        timer = RequestTimer()
+        token = _current.set(timer)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timer, start)
+
+    def finish(self, request, response, timer, start):
+        wall_ms = (time.perf_counter() - start) * 1000
+
+        match = getattr(request, "resolver_match", None)
+        name = match.view_name if match else "<unresolved>"
+        size = 0 if response.streaming else len(response.content)
+        recorder.record(name, wall_ms, timer, size)
+
+        if getattr(settings, "PERF_SERVER_TIMING", True):
+            response["Server-Timing"] = (
+                f'total;dur={wall_ms:.1f}, '
+                f'db;dur={timer.db_ms:.1f};desc="{timer.queries} queries", '
+                f'tpl;dur={timer.template_ms:.1f}'
+            )
+        return response
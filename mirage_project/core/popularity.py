@@ -0,0 +1,80 @@
+"""
+Popularity counters on Item (wishlist_count, units_sold).
+
+They are changed with F() increments at the moment something happens
+(wishlist toggle, checkout) so the "Most wished" and "Best sellers"
+sorts are plain indexed ORDER BYs. Anything that bypasses those paths
+(deleted users, cancelled orders, admin edits) can make them drift;
+``python manage.py reconcile_popularity`` recomputes them in bulk.
+
+The counters don't bump the catalogue cache version, so cached
+popularity pages catch up within CATALOGUE_CACHE_TIMEOUT.
+"""
+from django.db.models import (
+    Case, Count, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce
+
+from .models import Item, OrderItem, WishlistItem
+
+
+def wishlist_added(item_id):
+    Item.objects.filter(id=item_id).update(wishlist_count=F("wishlist_count") + 1)
+
+
+def wishlist_removed(item_id, count=1):
+    Item.objects.filter(id=item_id, wishlist_count__gte=count).update(
+        wishlist_count=F("wishlist_count") - count
+    )
+
+
+def sold(quantities):
+    """Add ``{item_id: quantity}`` to units_sold with one UPDATE."""
+    if not quantities:
+        return
+    Item.objects.filter(id__in=list(quantities)).update(
+        units_sold=F("units_sold") + Case(
+            *[When(id=item_id, then=Value(qty)) for item_id, qty in quantities.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    )
+
+
+# Reconciliation
+
+def _actual_wishlist_count():
+    wished = (
+        WishlistItem.objects.filter(item=OuterRef("pk"))
+        .order_by().values("item").annotate(n=Count("id")).values("n")
+    )
+    return Coalesce(Subquery(wished, output_field=IntegerField()), Value(0))
+
+
+def _actual_units_sold():
+    sold_units = (
+        OrderItem.objects.filter(item=OuterRef("pk")).exclude(order__status="cancelled")
+        .order_by().values("item").annotate(n=Sum("quantity")).values("n")
+    )
+    return Coalesce(Subquery(sold_units, output_field=IntegerField()), Value(0))
+
+
+def reconcile(dry_run=False):
+    """
+    Recompute both counters from WishlistItem/OrderItem. Only items that
+    drifted are written (one UPDATE). Returns the number of such items.
+    """
+    drifted = list(
+        Item.objects.annotate(
+            actual_wished=_actual_wishlist_count(),
+            actual_sold=_actual_units_sold(),
+        )
+        .filter(~Q(wishlist_count=F("actual_wished")) | ~Q(units_sold=F("actual_sold")))
+        .values_list("id", flat=True)
+    )
+    if drifted and not dry_run:
+        Item.objects.filter(id__in=drifted).update(
+            wishlist_count=_actual_wishlist_count(),
+            units_sold=_actual_units_sold(),
+        )
+    return len(drifted)
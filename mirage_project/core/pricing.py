@@ -0,0 +1,61 @@
+"""
+Cart pricing shared by the cart page, the dashboard and checkout.
+"""
+from decimal import Decimal
+
+from .models import Item
+
+
+# everything the cart/dashboard tables show, nothing more
+PRICED_FIELDS = ("id", "label", "price", "image_url", "reality_fragment", "rarity")
+
+
+class PricedCart:
+    def __init__(self, lines, total):
+        self.lines = lines
+        self.total = total
+
+    @property
+    def count(self):
+        return sum(line["quantity"] for line in self.lines)
+
+    def __bool__(self):
+        return bool(self.lines)
+
+
+def price_lines(items, quantities):
+    """
+    Price ``items`` against ``quantities`` ({item_id: qty}) in one pass.
+    Returns (lines, total); each line is {"item", "quantity", "line_total"}.
+    """
+    lines = []
+    total = Decimal("0.00")
+    for item in items:
+        quantity = quantities.get(item.id, 0)
+        if quantity <= 0:
+            continue
+        line_total = item.price * quantity
+        total += line_total
+        lines.append({"item": item, "quantity": quantity, "line_total": line_total})
+    return lines, total
+
+
+def price_cart(quantities):
+    """
+    Price a cart ({item_id: qty}) with a single query.
+    """
+    if not quantities:
+        return PricedCart([], Decimal("0.00"))
+    return PricedCart(*price_lines(_priced_items(quantities), quantities))
+
+
+async def aprice_cart(quantities):
+    """price_cart() for async views."""
+    if not quantities:
+        return PricedCart([], Decimal("0.00"))
+    items = [item async for item in _priced_items(quantities)]
+    return PricedCart(*price_lines(items, quantities))
+
+
+def _priced_items(quantities):
+    return Item.objects.filter(id__in=list(quantities)).only(*PRICED_FIELDS).order_by("id")
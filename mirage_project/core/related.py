@@ -0,0 +1,189 @@
+"""
+"Related items" for the item detail page.
+
+Working them out live would mean joining the order tables on every page
+view, so ``python manage.py build_related_items`` (run from cron, e.g.
+nightly, like reconcile_popularity) precomputes them into ItemSimilarity
+and the page reads one item's rows through item_similar_idx.
+
+An item's score for another one is
+
+    co-purchases / sqrt(orders with a * orders with b)   (cosine, 0..1)
+  + ATTRIBUTE_WEIGHT per shared subcategory, element, reality fragment
+
+so items that sell together come first, and items that merely look alike
+fill the rest. Counting is done in one pass over the order lines, with a
+sparse pair counter (only pairs that actually met in an order are kept);
+the attribute side looks only at the newest few items of every
+(subcategory, element, fragment) combination.
+
+Items added since the last run have no rows yet; they get the newest
+items of their subcategory instead (also an indexed lookup).
+"""
+import math
+from collections import Counter, defaultdict
+from itertools import combinations, groupby
+
+from django.conf import settings
+from django.db import transaction
+
+from . import catalogue_cache
+from .models import Item, ItemSimilarity, OrderItem
+
+
+ATTRIBUTE_WEIGHT = 0.1
+
+# (subcategory, element, reality fragment) combinations, most shared first
+ATTRIBUTE_COMBOS = [
+    combo for size in (3, 2, 1) for combo in combinations(range(3), size)
+]
+
+
+def panel_size():
+    return getattr(settings, "RELATED_ITEMS_COUNT", 4)
+
+
+def keep():
+    """How many related items are stored per item."""
+    return getattr(settings, "RELATED_ITEMS_KEEP", 12)
+
+
+def max_basket():
+    # a huge order says little about any pair in it and costs n² pairs
+    return getattr(settings, "RELATED_MAX_BASKET", 50)
+
+
+# Counting
+
+def co_purchases():
+    """
+    Return (orders per item, {(a, b): orders with both}) with a < b, from
+    the order lines of every order that wasn't cancelled.
+    """
+    lines = (
+        OrderItem.objects.exclude(order__status="cancelled")
+        .order_by("order_id")
+        .values_list("order_id", "item_id")
+        .iterator(chunk_size=5000)
+    )
+    orders = Counter()
+    pairs = Counter()
+    for _order_id, basket in groupby(lines, key=lambda line: line[0]):
+        item_ids = sorted({item_id for _order, item_id in basket})
+        if len(item_ids) > max_basket():
+            continue
+        orders.update(item_ids)
+        pairs.update(combinations(item_ids, 2))
+    return orders, pairs
+
+
+def _attribute_candidates(rows, limit):
+    """
+    {item id: [(other id, shared attributes), ...]}: each item's up to
+    ``limit`` best look-alikes (most shared attributes, then newest).
+    ``rows`` are (id, subcategory, element, fragment), newest first.
+    """
+    # newest first, and only as many per combination as can be needed:
+    # self plus the ones already taken from a more specific combination
+    per_combo = 2 * limit + 1
+    groups = defaultdict(list)
+    for item_id, *attrs in rows:
+        for combo in ATTRIBUTE_COMBOS:
+            values = tuple(attrs[i] for i in combo)
+            if any(value in ("", None) for value in values):
+                continue
+            members = groups[combo, values]
+            if len(members) < per_combo:
+                members.append(item_id)
+
+    rank = {row[0]: n for n, row in enumerate(rows)}
+    candidates = {}
+    for item_id, *attrs in rows:
+        picked, seen = [], {item_id}
+        for size in (3, 2, 1):
+            level = set()
+            for combo in ATTRIBUTE_COMBOS:
+                if len(combo) != size:
+                    continue
+                values = tuple(attrs[i] for i in combo)
+                level.update(groups.get((combo, values), ()))
+            for other in sorted(level - seen, key=rank.__getitem__):
+                if len(picked) == limit:
+                    break
+                picked.append((other, size))
+                seen.add(other)
+        candidates[item_id] = picked
+    return candidates
+
+
+def _shared(a, b):
+    return sum(1 for x, y in zip(a, b) if x not in ("", None) and x == y)
+
+
+def compute():
+    """{item id: [(related id, score, co-purchases), ...]} best first."""
+    rows = list(
+        Item.objects.order_by("-created_at", "-id")
+        .values_list("id", "subcategory_id", "element", "reality_fragment")
+    )
+    attrs = {row[0]: row[1:] for row in rows}
+    rank = {row[0]: n for n, row in enumerate(rows)}
+    orders, pairs = co_purchases()
+
+    bought_with = defaultdict(dict)
+    for (a, b), together in pairs.items():
+        bought_with[a][b] = together
+        bought_with[b][a] = together
+
+    limit = keep()
+    result = {}
+    for item_id, look_alikes in _attribute_candidates(rows, limit).items():
+        scored = {other: ATTRIBUTE_WEIGHT * shared for other, shared in look_alikes}
+        for other, together in bought_with.get(item_id, {}).items():
+            if other not in attrs:
+                continue  # deleted meanwhile
+            cosine = together / math.sqrt(orders[item_id] * orders[other])
+            scored[other] = cosine + ATTRIBUTE_WEIGHT * _shared(attrs[item_id], attrs[other])
+        best = sorted(scored, key=lambda other: (-scored[other], rank[other]))[:limit]
+        result[item_id] = [
+            (other, scored[other], bought_with.get(item_id, {}).get(other, 0)) for other in best
+        ]
+    return result
+
+
+def rebuild():
+    """Replace every ItemSimilarity row; returns how many were written."""
+    similar = compute()
+    with transaction.atomic():
+        ItemSimilarity.objects.all().delete()
+        written = ItemSimilarity.objects.bulk_create(
+            (
+                ItemSimilarity(item_id=item_id, related_id=other, score=score, co_purchases=together)
+                for item_id, best in similar.items()
+                for other, score, together in best
+            ),
+            batch_size=1000,
+        )
+        # cached detail pages still show the previous panels
+        transaction.on_commit(catalogue_cache.bump_version)
+    return len(written)
+
+
+# Reading
+
+def related_ids(item, n=None):
+    """Ids of the items to show next to ``item``, best first."""
+    n = n or panel_size()
+    ids = list(
+        ItemSimilarity.objects.filter(item_id=item.id)
+        .order_by("-score", "id")
+        .values_list("related_id", flat=True)[:n]
+    )
+    if not ids:
+        ids = list(
+            Item.objects.filter(subcategory_id=item.subcategory_id)
+            .exclude(id=item.id)
+            .order_by("-created_at", "-id")
+            .values_list("id", flat=True)[:n]
+        )
+    return ids
@@ -0,0 +1,46 @@
+"""
+Role resolution for the management pages.
+
+A role is the name of an auth Group. A user's roles are looked up once,
+kept in the cache for ROLE_CACHE_TIMEOUT seconds and memoized on the
+request, so a management page doesn't query the groups every time.
+Changing a user's groups (or saving the user) drops the cached entry,
+see core.signals.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+
+def timeout():
+    return getattr(settings, "ROLE_CACHE_TIMEOUT", 60)
+
+
+def _key(user_id):
+    return f"roles:{user_id}"
+
+
+def get_roles(user):
+    """The set of group names of ``user`` (empty for anonymous users)."""
+    if not user.is_authenticated:
+        return frozenset()
+    roles = cache.get(_key(user.pk))
+    if roles is None:
+        roles = frozenset(user.groups.values_list("name", flat=True))
+        cache.set(_key(user.pk), roles, timeout())
+    return roles
+
+
+def request_roles(request):
+    """get_roles() for request.user, memoized for the request."""
+    roles = getattr(request, "_roles", None)
+    if roles is None:
+        roles = request._roles = get_roles(request.user)
+    return roles
+
+
+def has_role(request, *roles):
+    return any(role in request_roles(request) for role in roles)
+
+
+def invalidate(*user_ids):
+    cache.delete_many([_key(user_id) for user_id in user_ids])
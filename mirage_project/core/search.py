@@ -0,0 +1,284 @@
+"""
+Full-text search over the catalogue.
+
+Items are mirrored into a side table (``core_item_fts``) holding the
+searchable text plus the denormalized category/subcategory labels:
+
+- SQLite: an FTS5 virtual table, rowid = item id, ranked with bm25()
+- PostgreSQL: a tsvector column with a GIN index, ranked with ts_rank()
+
+Any other backend falls back to the old icontains filter.
+
+A search page ranks at most SEARCH_MAX_RESULTS matches (search_items);
+counts (result total, sidebar facets) use matching_items, which has no
+cap, so the page can say when it shows only the best ones.
+
+The index is kept in sync by the signals in core.signals and can be
+rebuilt from scratch with ``python manage.py rebuild_search_index``.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+
+FTS_TABLE = "core_item_fts"
+
+# label, description, element, reality_fragment, category, subcategory
+SQLITE_BM25_WEIGHTS = "10.0, 1.0, 4.0, 4.0, 2.0, 2.0"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+_SQLITE_SELECT = """
+    SELECT i.id, i.label, i.description, i.element, i.reality_fragment,
+           c.label, s.label
+    FROM core_item i
+    JOIN core_category c ON c.id = i.category_id
+    JOIN core_subcategory s ON s.id = i.subcategory_id
+"""
+
+_POSTGRES_SELECT = """
+    SELECT i.id,
+           setweight(to_tsvector('simple', coalesce(i.label, '')), 'A') ||
+           setweight(to_tsvector('simple', coalesce(i.element, '')), 'B') ||
+           setweight(to_tsvector('simple', coalesce(i.reality_fragment, '')), 'B') ||
+           setweight(to_tsvector('simple', coalesce(c.label, '')), 'C') ||
+           setweight(to_tsvector('simple', coalesce(s.label, '')), 'C') ||
+           setweight(to_tsvector('simple', coalesce(i.description, '')), 'D')
+    FROM core_item i
+    JOIN core_category c ON c.id = i.category_id
+    JOIN core_subcategory s ON s.id = i.subcategory_id
+"""
+
+
+# Schema (used by the migration)
+
+def create_index_table(conn):
+    """
+    Create the search table for this backend and fill it from core_item.
+    """
+    with conn.cursor() as cursor:
+        if conn.vendor == "sqlite":
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                "label, description, element, reality_fragment, "
+                "category_label, subcategory_label, "
+                "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+        elif conn.vendor == "postgresql":
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {FTS_TABLE} ("
+                "item_id bigint PRIMARY KEY REFERENCES core_item (id) "
+                "ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+                "document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {FTS_TABLE}_document_gin "
+                f"ON {FTS_TABLE} USING GIN (document)"
+            )
+        else:
+            return
+    rebuild_index(conn)
+
+
+def drop_index_table(conn):
+    if conn.vendor in ("sqlite", "postgresql"):
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+# Sync
+
+def is_supported(conn=None):
+    conn = conn or connection
+    return conn.vendor in ("sqlite", "postgresql")
+
+
+def _reindex(where_sql="", params=(), conn=None):
+    conn = conn or connection
+    if not is_supported(conn):
+        return
+
+    key = "rowid" if conn.vendor == "sqlite" else "item_id"
+    select = _SQLITE_SELECT if conn.vendor == "sqlite" else _POSTGRES_SELECT
+
+    with conn.cursor() as cursor:
+        if where_sql:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE {key} IN "
+                f"(SELECT i.id FROM core_item i WHERE {where_sql})",
+                params,
+            )
+        else:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+
+        if conn.vendor == "sqlite":
+            columns = (
+                "rowid, label, description, element, reality_fragment, "
+                "category_label, subcategory_label"
+            )
+        else:
+            columns = "item_id, document"
+
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} ({columns}) {select}"
+            + (f" WHERE {where_sql}" if where_sql else ""),
+            params,
+        )
+
+
+def rebuild_index(conn=None):
+    """Drop every row from the search table and re-insert all items."""
+    _reindex(conn=conn)
+
+
+def index_items(item_ids):
+    """(Re)index the given items."""
+    item_ids = list(item_ids)
+    if not item_ids:
+        return
+    placeholders = ", ".join(["%s"] * len(item_ids))
+    _reindex(f"i.id IN ({placeholders})", item_ids)
+
+
+def index_category(category_id):
+    """Reindex every item of a category (its label is denormalized)."""
+    _reindex("i.category_id = %s", [category_id])
+
+
+def index_subcategory(subcategory_id):
+    _reindex("i.subcategory_id = %s", [subcategory_id])
+
+
+def unindex_items(item_ids):
+    item_ids = list(item_ids)
+    if not item_ids or not is_supported():
+        return
+    key = "rowid" if connection.vendor == "sqlite" else "item_id"
+    placeholders = ", ".join(["%s"] * len(item_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {FTS_TABLE} WHERE {key} IN ({placeholders})",
+            item_ids,
+        )
+
+
+# Querying
+
+def max_results():
+    """Hard cap on how many ranked matches a single search returns."""
+    return getattr(settings, "SEARCH_MAX_RESULTS", 500)
+
+
+def _tokens(query):
+    return _TOKEN_RE.findall(query.lower())
+
+
+def _match(tokens):
+    # every word is a prefix, all of them must match
+    if connection.vendor == "sqlite":
+        return " ".join(f'"{t}"*' for t in tokens)
+    return " & ".join(f"{t}:*" for t in tokens)
+
+
+def _icontains_filter(query):
+    return (
+        Q(label__icontains=query) |
+        Q(description__icontains=query) |
+        Q(element__icontains=query) |
+        Q(reality_fragment__icontains=query) |
+        Q(category__label__icontains=query) |
+        Q(subcategory__label__icontains=query)
+    )
+
+
+def ranked_item_ids(query, queryset=None, limit=None):
+    """
+    Return up to ``limit`` (default: max_results()) item ids matching
+    ``query``, best match first. Every word is treated as a prefix and
+    all words must match. If ``queryset`` is given, only its rows are
+    considered.
+    """
+    tokens = _tokens(query)
+    if not tokens:
+        return []
+
+    match = _match(tokens)
+    if connection.vendor == "sqlite":
+        sql = (
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s"
+        )
+        params = [match]
+        if queryset is not None:
+            sub_sql, sub_params = queryset.order_by().values("id").query.sql_with_params()
+            sql += f" AND rowid IN ({sub_sql})"
+            params += list(sub_params)
+        sql += f" ORDER BY bm25({FTS_TABLE}, {SQLITE_BM25_WEIGHTS}) LIMIT %s"
+    else:
+        sql = (
+            f"SELECT f.item_id FROM {FTS_TABLE} f, "
+            "to_tsquery('simple', %s) query WHERE f.document @@ query"
+        )
+        params = [match]
+        if queryset is not None:
+            sub_sql, sub_params = queryset.order_by().values("id").query.sql_with_params()
+            sql += f" AND f.item_id IN ({sub_sql})"
+            params += list(sub_params)
+        sql += " ORDER BY ts_rank(f.document, query) DESC, f.item_id LIMIT %s"
+    params.append(limit or max_results())
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_items(queryset, query):
+    """
+    Narrow an Item queryset down to the matches for ``query``.
+
+    The result is annotated with ``search_rank`` (0 = best match) and
+    ordered by it. Backends without a search index get the plain
+    icontains filter, ordered as the queryset already was.
+    """
+    query = query.strip()
+    if not query:
+        return queryset
+
+    if not is_supported() or not _tokens(query):
+        return queryset.filter(_icontains_filter(query))
+
+    ids = ranked_item_ids(query, queryset)
+    if not ids:
+        return queryset.none()
+
+    rank = Case(
+        *[When(id=item_id, then=Value(pos)) for pos, item_id in enumerate(ids)],
+        output_field=IntegerField(),
+    )
+    return (
+        queryset.filter(id__in=ids)
+        .annotate(search_rank=rank)
+        .order_by("search_rank")
+    )
+
+
+def matching_items(queryset, query):
+    """
+    Every match for ``query`` in ``queryset``, unranked and uncapped
+    (for counting: search_items() stops at max_results()).
+    """
+    query = query.strip()
+    if not query:
+        return queryset
+
+    tokens = _tokens(query)
+    if not is_supported() or not tokens:
+        return queryset.filter(_icontains_filter(query))
+
+    if connection.vendor == "sqlite":
+        sql = f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s"
+    else:
+        sql = f"SELECT item_id FROM {FTS_TABLE} WHERE document @@ to_tsquery('simple', %s)"
+    return queryset.filter(id__in=RawSQL(sql, [_match(tokens)]))
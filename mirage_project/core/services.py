@@ -0,0 +1,154 @@
+"""
+Write-side operations that span several models and must be atomic.
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, F, Value
+from django.db.models.functions import Greatest, Least, Round
+from django.utils import timezone
+
+from . import popularity, stock
+from .models import Item, Order, OrderItem, RARITY_CHOICES
+from .pricing import price_lines
+from .signals import catalogue_batch
+
+
+class EmptyCart(Exception):
+    pass
+
+
+def place_order(user, cart, idempotency_key=None, holder=None):
+    """
+    Turn ``cart`` ({"item_id": quantity, ...}) into an Order for ``user``.
+
+    Everything happens in one transaction: the priced items are locked
+    (select_for_update), the order is inserted with its final total and
+    all lines go in with a single bulk_create and the items' units_sold
+    counters move with one UPDATE, so the write count does not grow with
+    the cart.
+
+    Limited items are taken from stock (using the units ``holder``
+    reserved first); if any of them ran out, stock.OutOfStock is raised
+    and nothing is written.
+
+    Re-submitting the same ``idempotency_key`` returns the order created
+    the first time instead of a duplicate. Returns (order, created).
+    """
+    idempotency_key = (idempotency_key or "").strip()[:64] or None
+    if idempotency_key:
+        existing = Order.objects.filter(user=user, idempotency_key=idempotency_key).first()
+        if existing:
+            return existing, False
+
+    quantities = {int(k): qty for k, qty in cart.items() if qty > 0}
+    if not quantities:
+        raise EmptyCart
+
+    try:
+        with transaction.atomic():
+            items = (
+                Item.objects.select_for_update()
+                .filter(id__in=quantities)
+                .only("id", "label", "price", "stock")
+            )
+            priced, total = price_lines(items, quantities)
+            if not priced:
+                raise EmptyCart
+
+            stock.consume(items, quantities, holder)
+
+            order = Order.objects.create(
+                user=user,
+                status="completed",
+                total_price=total,
+                idempotency_key=idempotency_key,
+            )
+            OrderItem.objects.bulk_create(
+                OrderItem(
+                    order=order,
+                    item=line["item"],
+                    quantity=line["quantity"],
+                    price_at_purchase=line["item"].price,
+                )
+                for line in priced
+            )
+            popularity.sold({line["item"].id: line["quantity"] for line in priced})
+    except IntegrityError:
+        # a concurrent request with the same key won the race
+        if idempotency_key:
+            existing = Order.objects.filter(user=user, idempotency_key=idempotency_key).first()
+            if existing:
+                return existing, False
+        raise
+
+    return order, True
+
+
+# Bulk item actions (management items list)
+#
+# Each action is a single UPDATE or DELETE over the selected ids and
+# returns the number of rows changed. The search index and catalogue
+# cache are refreshed once for the whole batch (core.signals.catalogue_batch).
+
+_PRICE = DecimalField(max_digits=7, decimal_places=2)
+_MAX_PRICE = Decimal("99999.99")  # the most Item.price (and _PRICE) can hold
+
+
+def _selected(item_ids):
+    return Item.objects.filter(id__in=list(item_ids))
+
+
+def bulk_adjust_price(item_ids, percent=None, amount=None):
+    """
+    Change prices by ``percent`` (e.g. Decimal("-10") for 10% off) or by a
+    fixed ``amount``; prices stay between 0 and _MAX_PRICE.
+    """
+    if percent is not None:
+        factor = Value(1 + Decimal(percent) / 100, output_field=_PRICE)
+        new_price = Round(F("price") * factor, 2, output_field=_PRICE)
+    else:
+        new_price = F("price") + Value(Decimal(amount), output_field=_PRICE)
+    new_price = Least(
+        Greatest(new_price, Value(Decimal("0.00"), output_field=_PRICE)),
+        Value(_MAX_PRICE, output_field=_PRICE),
+    )
+
+    with transaction.atomic(), catalogue_batch() as batch:
+        changed = _selected(item_ids).update(price=new_price, updated_at=timezone.now())
+        batch.dirty = True
+    return changed
+
+
+def bulk_set_rarity(item_ids, rarity):
+    if rarity not in dict(RARITY_CHOICES):
+        raise ValueError(f"unknown rarity {rarity!r}")
+    with transaction.atomic(), catalogue_batch() as batch:
+        changed = _selected(item_ids).update(rarity=rarity, updated_at=timezone.now())
+        batch.dirty = True
+    return changed
+
+
+def bulk_move(item_ids, subcategory):
+    """Move items to ``subcategory`` (and its category)."""
+    with transaction.atomic(), catalogue_batch() as batch:
+        items = _selected(item_ids)
+        # category labels are part of the search index
+        moved = list(items.values_list("id", flat=True))
+        changed = items.update(
+            subcategory=subcategory, category_id=subcategory.category_id, updated_at=timezone.now()
+        )
+        batch.changed(moved)
+    return changed
+
+
+def bulk_delete(item_ids):
+    """
+    Delete the selected items. Items that were ever ordered are kept (order
+    history points at them). Returns (deleted, kept).
+    """
+    with transaction.atomic(), catalogue_batch():
+        items = _selected(item_ids)
+        kept = items.filter(order_items__isnull=False).distinct().count()
+        _total, per_model = items.exclude(order_items__isnull=False).delete()
+    return per_model.get(Item._meta.label, 0), kept
@@ -0,0 +1,174 @@
+import threading
+from contextlib import contextmanager
+
+from django.contrib.auth.models import Group, User
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import catalogue_cache, featured, roles, search, thumbnails
+from .cart import merge_anonymous_cart
+from .models import Category, Item, SubCategory
+
+
+# Batching
+
+_local = threading.local()
+
+
+@contextmanager
+def catalogue_batch():
+    """
+    Group many catalogue changes (bulk actions, imports): inside the block
+    the Item handlers below only note the ids, and the search index and
+    catalogue cache version are updated once when it ends.
+    Changes made with QuerySet.update() send no signals; pass their ids
+    to ``changed(ids)``.
+    """
+    outer = getattr(_local, "batch", None)
+    if outer is not None:
+        yield outer
+        return
+
+    batch = _local.batch = _Batch()
+    try:
+        yield batch
+    finally:
+        _local.batch = None
+    batch.flush()
+
+
+class _Batch:
+    def __init__(self):
+        self.saved = set()
+        self.deleted = set()
+        self.dirty = False
+
+    def changed(self, item_ids):
+        self.saved.update(item_ids)
+        self.dirty = True
+
+    def flush(self):
+        deleted, saved = sorted(self.deleted), sorted(self.saved - self.deleted)
+        for start in range(0, len(deleted), 500):
+            search.unindex_items(deleted[start:start + 500])
+        for start in range(0, len(saved), 500):
+            search.index_items(saved[start:start + 500])
+        if self.dirty:
+            _bump_catalogue_version()
+
+
+def _current_batch():
+    return getattr(_local, "batch", None)
+
+
+# Search index sync
+
+@receiver(post_save, sender=Item)
+def item_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    batch = _current_batch()
+    if batch is not None:
+        batch.saved.add(instance.pk)
+        return
+    search.index_items([instance.pk])
+
+
+@receiver(post_delete, sender=Item)
+def item_deleted(sender, instance, **kwargs):
+    batch = _current_batch()
+    if batch is not None:
+        batch.deleted.add(instance.pk)
+        return
+    search.unindex_items([instance.pk])
+
+
+@receiver(post_save, sender=Item)
+def item_image_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    # thumbnails are made in the background; unchanged images are skipped
+    if raw or not instance.image_url:
+        return
+    if update_fields is not None and "image_url" not in update_fields:
+        return
+    path = instance.image_url
+    transaction.on_commit(lambda: thumbnails.generate_later([path]))
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, created=False, raw=False, **kwargs):
+    # a brand new category has no items yet
+    if raw or created:
+        return
+    search.index_category(instance.pk)
+
+
+@receiver(post_save, sender=SubCategory)
+def subcategory_saved(sender, instance, created=False, raw=False, **kwargs):
+    if raw or created:
+        return
+    search.index_subcategory(instance.pk)
+
+
+# Catalogue cache invalidation
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=SubCategory)
+@receiver(post_delete, sender=SubCategory)
+def catalogue_changed(sender, raw=False, **kwargs):
+    if raw:
+        return
+    batch = _current_batch()
+    if batch is not None:
+        batch.dirty = True
+        return
+    _bump_catalogue_version()
+
+
+def _bump_catalogue_version():
+    # bump now, and again on commit in case another request re-cached
+    # the old rows before this transaction became visible
+    catalogue_cache.bump_version()
+    transaction.on_commit(catalogue_cache.bump_version)
+    transaction.on_commit(featured.schedule_refresh)
+
+
+# Cart
+
+@receiver(user_logged_in)
+def merge_cart_on_login(sender, request, user, **kwargs):
+    if request is not None:
+        merge_anonymous_cart(request, user)
+
+
+# Cached roles
+
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # user.groups.add/remove/clear(...)
+        if action in ("post_add", "post_remove", "post_clear"):
+            roles.invalidate(instance.pk)
+    elif action == "pre_clear":
+        # group.user_set.clear(): pk_set is empty, collect the members first
+        roles.invalidate(*instance.user_set.values_list("pk", flat=True))
+    elif action in ("post_add", "post_remove"):
+        roles.invalidate(*pk_set)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        roles.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed(sender, instance, raw=False, **kwargs):
+    # a renamed or deleted group changes the roles of all its members
+    if not raw and instance.pk:
+        roles.invalidate(*instance.user_set.values_list("pk", flat=True))
@@ -0,0 +1,69 @@
+// Catalogue cards: wishlist + add to cart without reloading the page.
+// Both forms still work as normal posts when this script isn't loaded.
+$(function () {
+
+    function post(form) {
+        return fetch(form.action, {
+            method: "POST",
+            body: new FormData(form),
+            headers: { "X-Requested-With": "XMLHttpRequest" },
+            credentials: "same-origin",
+        });
+    }
+
+    // Wishlist toggle
+    $(document).on("submit", ".wishlist-form", function (e) {
+        e.preventDefault();
+        const form = this;
+        const $button = $(form).find("button");
+        $button.prop("disabled", true);
+
+        post(form)
+            .then((response) => {
+                if (!response.ok) throw response;
+                return response.json();
+            })
+            .then((data) => {
+                $(form).find("input[name=state]").val(data.wishlisted ? "off" : "on");
+                $button
+                    .text(data.wishlisted ? "♥ Wishlisted" : "♡ Wishlist")
+                    .attr("aria-pressed", data.wishlisted ? "true" : "false");
+            })
+            .catch(() => form.submit())
+            .finally(() => $button.prop("disabled", false));
+    });
+
+    // Add to cart
+    $(document).on("submit", ".add-to-cart-form", function (e) {
+        e.preventDefault();
+        const form = this;
+        const $button = $(form).find("button");
+        $button.prop("disabled", true);
+
+        post(form)
+            .then((response) => {
+                if (response.status === 409) {
+                    return response.json().then((data) => {
+                        const label = data.error === "cart_full" ? "Cart is full" : "Sold out";
+                        $button.text(label).removeClass("btn-warning").addClass("btn-secondary");
+                    });
+                }
+                if (!response.ok) throw response;
+
+                $button
+                    .text("In cart 🛒")
+                    .removeClass("btn-warning").addClass("btn-success")
+                    .attr({ "aria-disabled": "true", title: "Already in cart — manage quantity from your cart" });
+
+                let $badge = $(".floating-cart-badge");
+                if (!$badge.length) {
+                    $badge = $('<span class="floating-cart-badge">0</span>').appendTo(".floating-cart-btn");
+                }
+                $badge.text(parseInt($badge.text(), 10) + 1);
+            })
+            .catch(() => {
+                $button.prop("disabled", false);
+                form.submit();
+            });
+    });
+});
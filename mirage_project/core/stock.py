@@ -0,0 +1,179 @@
+"""
+Stock for limited items.
+
+Item.stock is only ever changed with conditional UPDATEs
+(``... WHERE stock >= n SET stock = stock - n``), so two checkouts racing
+for the last unit can't both succeed and stock never goes negative.
+
+When STOCK_RESERVATION_MINUTES is set, adding a limited item to a cart
+moves a unit from Item.stock into a StockReservation for that cart.
+Checkout consumes the reservation; expired ones are handed back by
+``python manage.py release_reservations`` (or lazily when an item looks
+sold out).
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Item, StockReservation
+
+
+class OutOfStock(Exception):
+    def __init__(self, items):
+        self.items = list(items)
+        labels = ", ".join(item.label for item in self.items)
+        super().__init__(f"Not enough stock left for: {labels}")
+
+
+def reservation_minutes():
+    return getattr(settings, "STOCK_RESERVATION_MINUTES", 0)
+
+
+def take(item_id, quantity):
+    """
+    Remove ``quantity`` units of a limited item from stock.
+    Returns False (and changes nothing) when there aren't enough left.
+    """
+    updated = (
+        Item.objects.filter(id=item_id, stock__gte=quantity)
+        .update(stock=F("stock") - quantity)
+    )
+    return updated == 1
+
+
+def give_back(item_id, quantity):
+    if quantity > 0:
+        Item.objects.filter(id=item_id, stock__isnull=False).update(
+            stock=F("stock") + quantity
+        )
+
+
+# Reservations
+
+def reserve(holder, item, quantity=1):
+    """
+    Hold ``quantity`` more units of ``item`` for ``holder``.
+    Does nothing for unlimited items or when reservations are disabled.
+    Raises OutOfStock if the units aren't available.
+    """
+    minutes = reservation_minutes()
+    if not minutes or item.stock is None:
+        return
+
+    with transaction.atomic():
+        if not take(item.id, quantity):
+            # expired holds may be keeping the last units
+            release_expired(item_ids=[item.id])
+            if not take(item.id, quantity):
+                raise OutOfStock([item])
+
+        expires_at = timezone.now() + timedelta(minutes=minutes)
+        updated = StockReservation.objects.filter(holder=holder, item=item).update(
+            quantity=F("quantity") + quantity,
+            expires_at=expires_at,
+        )
+        if not updated:
+            StockReservation.objects.create(
+                holder=holder, item=item, quantity=quantity, expires_at=expires_at
+            )
+
+
+def release(holder, item_id=None, quantity=None):
+    """
+    Hand held units back to stock: all of them, those of one item, or
+    ``quantity`` units of one item.
+    """
+    with transaction.atomic():
+        held = StockReservation.objects.select_for_update().filter(holder=holder)
+        if item_id is not None:
+            held = held.filter(item_id=item_id)
+
+        for reservation in held:
+            units = reservation.quantity
+            if quantity is not None and quantity < units:
+                units = quantity
+                reservation.quantity -= units
+                reservation.save(update_fields=["quantity"])
+            else:
+                reservation.delete()
+            give_back(reservation.item_id, units)
+
+
+def transfer(old_holder, new_holder):
+    """
+    Move reservations to another holder (e.g. from an anonymous cart to
+    the user's cart at login), merging with what the new holder has.
+    """
+    with transaction.atomic():
+        for reservation in StockReservation.objects.select_for_update().filter(holder=old_holder):
+            merged = StockReservation.objects.filter(
+                holder=new_holder, item_id=reservation.item_id
+            ).update(quantity=F("quantity") + reservation.quantity)
+            if merged:
+                reservation.delete()
+            else:
+                reservation.holder = new_holder
+                reservation.save(update_fields=["holder"])
+
+
+def release_expired(item_ids=None):
+    """
+    Return the units of every expired reservation to stock.
+    Returns the number of reservations released.
+    """
+    with transaction.atomic():
+        expired = StockReservation.objects.select_for_update().filter(
+            expires_at__lte=timezone.now()
+        )
+        if item_ids is not None:
+            expired = expired.filter(item_id__in=item_ids)
+
+        units = defaultdict(int)
+        ids = []
+        for reservation in expired:
+            units[reservation.item_id] += reservation.quantity
+            ids.append(reservation.id)
+
+        StockReservation.objects.filter(id__in=ids).delete()
+        for item_id, quantity in units.items():
+            give_back(item_id, quantity)
+    return len(ids)
+
+
+# Checkout
+
+def consume(items, quantities, holder=None):
+    """
+    Take the stock for an order, inside the checkout transaction.
+
+    ``items`` are the locked Item rows, ``quantities`` maps item id to the
+    ordered quantity. Units already reserved by ``holder`` are used first;
+    the rest is taken from stock. Raises OutOfStock for anything short.
+    """
+    reserved = {}
+    if holder:
+        held = StockReservation.objects.select_for_update().filter(holder=holder)
+        reserved = dict(held.values_list("item_id", "quantity"))
+        held.delete()
+
+    short = []
+    for item in items:
+        if item.stock is None:
+            continue
+        wanted = quantities[item.id]
+        held_units = reserved.pop(item.id, 0)
+        if held_units > wanted:
+            give_back(item.id, held_units - wanted)
+        elif wanted > held_units and not take(item.id, wanted - held_units):
+            short.append(item)
+
+    # reservations for items that are no longer in the cart
+    for item_id, quantity in reserved.items():
+        give_back(item_id, quantity)
+
+    if short:
+        raise OutOfStock(short)
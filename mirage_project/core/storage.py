@@ -0,0 +1,17 @@
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+class StaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """
+    Content hashed names plus .gz/.br copies (WhiteNoise). A path that
+    was not collected (an image_url typo, a thumbnail generated after the
+    deploy) gets its plain URL instead of a ValueError that would turn
+    the whole page into a 500.
+    """
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
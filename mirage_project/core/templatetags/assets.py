@@ -0,0 +1,25 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from core import assets
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def bundle(name):
+    """
+    <link>/<script defer> tags for one bundle of core.assets.BUNDLES:
+    the built bundle, or its source files when bundling is off.
+    """
+    if assets.enabled():
+        paths = [assets.bundle_path(name)]
+    else:
+        paths = assets.BUNDLES[name]
+    if name.endswith(".css"):
+        markup = '<link rel="stylesheet" href="{}">'
+    else:
+        markup = '<script defer src="{}"></script>'
+    return format_html_join("\n    ", markup, ((static(path),) for path in paths))
@@ -1,3 +1,1394 @@
-from django.test import TestCase
+import io
+import json
+import os
+import random
+import re
+import tempfile
+import time
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import Group, User
+from django.core import signing
+from django.core.management import call_command
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import assets, catalogue_cache, featured, item_io, perf, popularity, related, thumbnails
+from .models import (
+    CartLine, Category, SubCategory, Item, ItemImage, ItemSimilarity, ItemThumbnail, Order,
+    OrderItem, StockReservation, WishlistItem,
+)
+from .facets import facet_counts
+from .roles import get_roles
+from .search import matching_items, search_items
+from .services import EmptyCart, place_order
+from .stock import OutOfStock, release_expired
+
+
+def make_catalogue():
+    """Small catalogue shared by the tests below."""
+    dlc = Category.objects.create(label="DLC", url_name="dlc")
+    merch = Category.objects.create(label="Merch", url_name="merch")
+    maps = SubCategory.objects.create(category=dlc, label="Maps", url_name="maps")
+    weapons = SubCategory.objects.create(category=dlc, label="Weapons", url_name="weapons")
+    mugs = SubCategory.objects.create(category=merch, label="Mugs", url_name="mugs")
+
+    items = {
+        "longbow": Item.objects.create(
+            label="Emberwreath Longbow", category=dlc, subcategory=weapons,
+            price=Decimal("14.99"), element="Fire", rarity="legendary",
+            description="A bow strung with living flame.",
+        ),
+        "blade": Item.objects.create(
+            label="Stormbound Relicblade", category=dlc, subcategory=weapons,
+            price=Decimal("12.50"), element="Storm", rarity="rare",
+            description="Forged where the ember skies split.",
+        ),
+        "ruins": Item.objects.create(
+            label="Ruins of Vaeloria", category=dlc, subcategory=maps,
+            price=Decimal("9.99"), reality_fragment="Vaeloria",
+        ),
+        "mug": Item.objects.create(
+            label="Everroot Grove Mug", category=merch, subcategory=mugs,
+            price=Decimal("18.00"),
+        ),
+    }
+    return items
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.items = make_catalogue()
+
+    def test_ranks_label_matches_first(self):
+        results = list(search_items(Item.objects.all(), "ember"))
+        self.assertEqual(results, [self.items["longbow"], self.items["blade"]])
+
+    def test_prefix_and_denormalized_labels(self):
+        results = set(search_items(Item.objects.all(), "mug"))
+        self.assertEqual(results, {self.items["mug"]})
+
+        results = set(search_items(Item.objects.all(), "weap"))
+        self.assertEqual(results, {self.items["longbow"], self.items["blade"]})
+
+    def test_index_follows_edits(self):
+        mug = self.items["mug"]
+        mug.label = "Aetherstone Tankard"
+        mug.save()
+        self.assertEqual(list(search_items(Item.objects.all(), "tankard")), [mug])
+        self.assertFalse(search_items(Item.objects.all(), "everroot").exists())
+
+        SubCategory.objects.filter(url_name="maps").update(label="Realms")
+        maps = SubCategory.objects.get(url_name="maps")
+        maps.save()
+        self.assertEqual(
+            list(search_items(Item.objects.all(), "realms")), [self.items["ruins"]]
+        )
+
+        mug.delete()
+        self.assertFalse(search_items(Item.objects.all(), "tankard").exists())
+
+    def test_search_respects_other_filters(self):
+        qs = Item.objects.filter(rarity="rare")
+        self.assertEqual(list(search_items(qs, "ember")), [self.items["blade"]])
+
+    def test_catalogue_view(self):
+        response = self.client.get(reverse("catalogue"), {"q": "vaeloria"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [card.id for card in response.context["cards"]], [self.items["ruins"].id]
+        )
+
+
+    @override_settings(SEARCH_MAX_RESULTS=1)
+    def test_counts_are_not_capped(self):
+        cache.clear()
+        response = self.client.get(reverse("catalogue"), {"q": "ember"})
+        self.assertEqual(len(response.context["cards"]), 1)
+        self.assertEqual(response.context["result_count"], 2)
+        rarities = {facet["value"]: facet["count"] for facet in response.context["rarity_facets"]}
+        self.assertEqual((rarities["legendary"], rarities["rare"]), (1, 1))
+        self.assertContains(response, "showing the 1 best matches")
+
+        self.assertEqual(matching_items(Item.objects.all(), "ember").count(), 2)
+
+
+class CataloguePaginationTests(TestCase):
+    def setUp(self):
+        make_catalogue()
+
+    def walk(self, params):
+        """Follow next cursors through the JSON endpoint, return all ids."""
+        seen = []
+        cursor = None
+        while True:
+            response = self.client.get(
+                reverse("catalogue_json"), {**params, "cursor": cursor or ""}
+            )
+            data = response.json()
+            seen += [row["id"] for row in data["items"]]
+            cursor = data["next_cursor"]
+            if not cursor:
+                return seen
+
+    def test_pages_cover_catalogue_once(self):
+        expected = list(
+            Item.objects.order_by("-created_at", "-id").values_list("id", flat=True)
+        )
+        self.assertEqual(self.walk({"page_size": 1}), expected)
+        self.assertEqual(self.walk({"page_size": 3}), expected)
+
+    def test_pages_follow_search_rank(self):
+        ranked = [item.id for item in search_items(Item.objects.all(), "ember")]
+        self.assertEqual(self.walk({"q": "ember", "page_size": 1}), ranked)
+
+    def test_previous_cursor(self):
+        first = self.client.get(reverse("catalogue"), {"page_size": 2}).context["page"]
+        second = self.client.get(
+            reverse("catalogue"), {"page_size": 2, "cursor": first.next_cursor}
+        ).context["page"]
+        back = self.client.get(
+            reverse("catalogue"), {"page_size": 2, "cursor": second.prev_cursor}
+        ).context["page"]
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous)
+
+    def test_bad_cursor_falls_back_to_first_page(self):
+        response = self.client.get(reverse("catalogue"), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["cards"]), 4)
+
+
+class FacetTests(TestCase):
+    def setUp(self):
+        self.items = make_catalogue()
+
+    def test_counts_in_one_query(self):
+        with self.assertNumQueries(1):
+            counts = facet_counts(Item.objects.filter(category__url_name="dlc"))
+
+        dlc = Category.objects.get(url_name="dlc")
+        weapons = SubCategory.objects.get(url_name="weapons")
+        self.assertEqual(counts["total"], 3)
+        self.assertEqual(counts["categories"][dlc.id], 3)
+        self.assertEqual(counts["subcategories"][weapons.id], 2)
+        self.assertEqual(counts["rarities"]["legendary"], 1)
+        self.assertEqual(counts["price_buckets"]["under-10"], 1)
+        self.assertEqual(counts["price_buckets"]["10-25"], 2)
+
+    def test_counts_follow_search(self):
+        counts = facet_counts(search_items(Item.objects.all(), "ember"))
+        self.assertEqual(counts["total"], 2)
+        self.assertEqual(counts["rarities"]["rare"], 1)
+
+    def test_each_facet_ignores_its_own_filter(self):
+        cache.clear()
+        dlc = Category.objects.get(url_name="dlc")
+        merch = Category.objects.get(url_name="merch")
+        weapons = SubCategory.objects.get(url_name="weapons")
+
+        response = self.client.get(reverse("catalogue"), {"category": "dlc", "rarity": "rare"})
+        self.assertEqual(response.context["result_count"], 1)
+        categories = {cat.id: cat.facet_count for cat in response.context["categories"]}
+        # other categories keep their counts (under the rarity filter)
+        self.assertEqual(categories, {dlc.id: 1, merch.id: 0})
+        rarities = {facet["value"]: facet["count"] for facet in response.context["rarity_facets"]}
+        self.assertEqual(rarities["legendary"], 1)
+        self.assertEqual(rarities["common"], 1)
+        subcategories = {sub.id: sub.facet_count for sub in response.context["subcategories"]}
+        self.assertEqual(subcategories[weapons.id], 1)
+
+        response = self.client.get(reverse("catalogue"), {"category": "merch"})
+        categories = {cat.id: cat.facet_count for cat in response.context["categories"]}
+        self.assertEqual(categories, {dlc.id: 3, merch.id: 1})
+
+    def test_sidebar_query_count_is_constant(self):
+        cache.clear()
+        with self.assertNumQueries(5):
+            self.client.get(reverse("catalogue"))
+
+        extra = Category.objects.create(label="Posters", url_name="posters")
+        for n in range(5):
+            SubCategory.objects.create(category=extra, label=f"Size {n}", url_name=f"size-{n}")
+
+        cache.clear()
+        with self.assertNumQueries(5):
+            self.client.get(reverse("catalogue"))
+
+
+class CatalogueCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.items = make_catalogue()
+
+    def test_warm_catalogue_needs_no_queries(self):
+        self.client.get(reverse("catalogue"))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("catalogue"))
+        self.assertContains(response, "Emberwreath Longbow")
+
+    def test_edit_invalidates(self):
+        self.client.get(reverse("catalogue"))
+        longbow = self.items["longbow"]
+        longbow.label = "Emberwreath Greatbow"
+        longbow.save()
+
+        response = self.client.get(reverse("catalogue"))
+        self.assertContains(response, "Emberwreath Greatbow")
+        self.assertNotContains(response, "Emberwreath Longbow")
+
+    def test_per_user_state_is_not_shared(self):
+        self.client.get(reverse("catalogue"))
+        longbow = self.items["longbow"]
+        self.client.post(reverse("add_to_cart", args=[longbow.id]))
+
+        response = self.client.get(reverse("catalogue"))
+        cards = {card.id: card for card in response.context["cards"]}
+        self.assertTrue(cards[longbow.id].in_cart)
+
+        other = self.client_class()
+        response = other.get(reverse("catalogue"))
+        cards = {card.id: card for card in response.context["cards"]}
+        self.assertFalse(cards[longbow.id].in_cart)
+
+    def test_home_featured_fragment(self):
+        self.client.get(reverse("home"))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("home"))
+        self.assertContains(response, "Featured Drops")
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.items = make_catalogue()
+        self.user = User.objects.create_user("buyer", password="pw")
+
+    def test_order_and_lines(self):
+        cart = {str(self.items["longbow"].id): 2, str(self.items["mug"].id): 1}
+        order, created = place_order(self.user, cart)
+
+        self.assertTrue(created)
+        self.assertEqual(order.total_price, Decimal("47.98"))
+        self.assertEqual(
+            sorted(order.items.values_list("item__label", "quantity")),
+            [("Emberwreath Longbow", 2), ("Everroot Grove Mug", 1)],
+        )
+
+    def test_query_count_does_not_grow_with_cart(self):
+        small = {str(self.items["longbow"].id): 1}
+        large = {str(item.id): 3 for item in self.items.values()}
+
+        with self.assertNumQueries(6):
+            place_order(self.user, small)
+        with self.assertNumQueries(6):
+            place_order(self.user, large)
+
+    def test_idempotency_key(self):
+        cart = {str(self.items["ruins"].id): 1}
+        first, created = place_order(self.user, cart, "abc123")
+        again, created_again = place_order(self.user, cart, "abc123")
+
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(first, again)
+        self.assertEqual(Order.objects.count(), 1)
+
+        # keys only have to be unique per user
+        other = User.objects.create_user("other", password="pw")
+        theirs, created = place_order(other, cart, "abc123")
+        self.assertTrue(created)
+        self.assertNotEqual(theirs, first)
+
+    def test_empty_cart(self):
+        with self.assertRaises(EmptyCart):
+            place_order(self.user, {"999999": 1})
+        self.assertFalse(Order.objects.exists())
+
+    def test_double_submit_through_view(self):
+        self.client.login(username="buyer", password="pw")
+        self.client.post(reverse("add_to_cart", args=[self.items["mug"].id]))
+
+        for _ in range(2):
+            response = self.client.post(reverse("checkout"), {"idempotency_key": "k1"})
+            self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 1)
+
+
+class StockTests(TestCase):
+    def setUp(self):
+        self.items = make_catalogue()
+        self.drop = self.items["longbow"]
+        self.drop.stock = 2
+        self.drop.save()
+        self.user = User.objects.create_user("buyer", password="pw")
+
+    def test_checkout_takes_stock(self):
+        place_order(self.user, {str(self.drop.id): 2})
+        self.drop.refresh_from_db()
+        self.assertEqual(self.drop.stock, 0)
+
+    def test_no_overselling(self):
+        place_order(self.user, {str(self.drop.id): 1})
+        with self.assertRaises(OutOfStock):
+            place_order(self.user, {str(self.drop.id): 2, str(self.items["mug"].id): 1})
+
+        # the failed order left nothing behind
+        self.drop.refresh_from_db()
+        self.assertEqual(self.drop.stock, 1)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_unlimited_items_untouched(self):
+        place_order(self.user, {str(self.items["mug"].id): 5})
+        self.items["mug"].refresh_from_db()
+        self.assertIsNone(self.items["mug"].stock)
+
+
+@override_settings(STOCK_RESERVATION_MINUTES=15)
+class ReservationTests(TestCase):
+    def setUp(self):
+        self.items = make_catalogue()
+        self.drop = self.items["longbow"]
+        self.drop.stock = 1
+        self.drop.save()
+        User.objects.create_user("buyer", password="pw")
+
+    def add(self, client):
+        return client.post(reverse("add_to_cart", args=[self.drop.id]))
+
+    def test_reserved_unit_blocks_other_carts(self):
+        self.add(self.client)
+        self.drop.refresh_from_db()
+        self.assertEqual(self.drop.stock, 0)
+
+        other = self.client_class()
+        self.add(other)
+        self.assertEqual(other.get(reverse("view_cart")).context["cart_items"], [])
+
+    def test_reservation_survives_login_and_is_consumed(self):
+        self.add(self.client)
+        self.client.post(reverse("login"), {"username": "buyer", "password": "pw"})
+        response = self.client.post(reverse("checkout"))
+
+        self.assertEqual(response.status_code, 200)
+        self.drop.refresh_from_db()
+        self.assertEqual(self.drop.stock, 0)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_remove_and_expiry_give_units_back(self):
+        self.add(self.client)
+        self.client.post(reverse("remove_from_cart", args=[self.drop.id]))
+        self.drop.refresh_from_db()
+        self.assertEqual(self.drop.stock, 1)
+
+        self.add(self.client)
+        StockReservation.objects.update(expires_at="2000-01-01T00:00:00Z")
+        self.assertEqual(release_expired(), 1)
+        self.drop.refresh_from_db()
+        self.assertEqual(self.drop.stock, 1)
+
+    @override_settings(CART_MAX_LINES=1)
+    def test_full_cart_refuses_and_gives_the_unit_back(self):
+        self.client.post(reverse("add_to_cart", args=[self.items["mug"].id]))
+        response = self.client.post(
+            reverse("add_to_cart", args=[self.drop.id]), headers={"X-Requested-With": "XMLHttpRequest"}
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json(), {"error": "cart_full"})
+        self.drop.refresh_from_db()
+        self.assertEqual(self.drop.stock, 1)
+        self.assertFalse(StockReservation.objects.exists())
+        self.assertEqual(self.client.get(reverse("cart_json")).json()["count"], 1)
+
+        response = self.client.post(reverse("add_to_cart", args=[self.drop.id]), follow=True)
+        self.assertContains(response, "Your cart is full")
+
+
+class CartStorageTests(TestCase):
+    def setUp(self):
+        self.items = make_catalogue()
+        User.objects.create_user("buyer", password="pw")
+
+    def add(self, item):
+        self.client.post(reverse("add_to_cart", args=[item.id]))
+
+    def cart_items(self):
+        response = self.client.get(reverse("view_cart"))
+        return {row["item"].label: row["quantity"] for row in response.context["cart_items"]}
+
+    def test_anonymous_cart_does_not_touch_sessions(self):
+        self.add(self.items["mug"])
+        self.add(self.items["mug"])
+        self.assertIn("mirage_cart", self.client.cookies)
+        self.assertNotIn("sessionid", self.client.cookies)
+        self.assertEqual(self.cart_items(), {"Everroot Grove Mug": 2})
+
+    def test_tampered_cookie_is_ignored(self):
+        self.add(self.items["mug"])
+        self.client.cookies["mirage_cart"] = "abc.1:99"
+        self.assertEqual(self.cart_items(), {})
+
+    def test_merged_at_login(self):
+        self.add(self.items["mug"])
+        self.add(self.items["ruins"])
+        self.client.post(reverse("login"), {"username": "buyer", "password": "pw"})
+        self.assertEqual(self.client.cookies["mirage_cart"].value, "")
+
+        self.add(self.items["mug"])
+        self.assertEqual(self.cart_items(), {"Everroot Grove Mug": 2, "Ruins of Vaeloria": 1})
+
+    def test_logged_in_click_is_one_small_write(self):
+        self.client.login(username="buyer", password="pw")
+        self.add(self.items["mug"])
+        # item, session, user, cart lines, one UPDATE; the session isn't saved
+        with self.assertNumQueries(5):
+            self.add(self.items["mug"])
+
+
+class CartBadgeTests(TestCase):
+    def setUp(self):
+        self.items = make_catalogue()
+        User.objects.create_user("buyer", password="pw")
+        cache.clear()
+
+    def test_badge_on_every_page(self):
+        self.client.post(reverse("add_to_cart", args=[self.items["mug"].id]))
+        self.client.post(reverse("add_to_cart", args=[self.items["mug"].id]))
+        for name in ("home", "catalogue", "view_cart"):
+            response = self.client.get(reverse(name))
+            self.assertContains(response, '<span class="floating-cart-badge">2</span>')
+
+    def test_logged_in_badge_is_one_sum(self):
+        self.client.login(username="buyer", password="pw")
+        self.client.post(reverse("add_to_cart", args=[self.items["mug"].id]))
+        self.client.post(reverse("add_to_cart", args=[self.items["ruins"].id]))
+        self.client.post(reverse("decrement_cart_item", args=[self.items["mug"].id]))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("home"))
+        self.assertContains(response, '<span class="floating-cart-badge">1</span>')
+        cart_queries = [q["sql"] for q in queries if "core_cartline" in q["sql"]]
+        self.assertEqual(len(cart_queries), 1)
+        self.assertIn("SUM", cart_queries[0])
+
+        # lines deleted behind the cart's back (here: with their item)
+        # show up on the next page, in every process
+        self.items["ruins"].delete()
+        response = self.client.get(reverse("home"))
+        self.assertNotContains(response, 'class="floating-cart-badge"')
+
+    def test_old_cookie_format_still_reads(self):
+        # "token.id:qty,..." without the running count
+        legacy = signing.get_cookie_signer(salt="mirage_cartmirage.cart").sign(
+            f"0123456789abcdef.{self.items['mug'].id}:3"
+        )
+        self.client.cookies["mirage_cart"] = legacy
+        response = self.client.get(reverse("home"))
+        self.assertContains(response, '<span class="floating-cart-badge">3</span>')
+
+
+class CartPricingTests(TestCase):
+    def setUp(self):
+        self.items = make_catalogue()
+
+    def test_cart_page_prices_in_one_query(self):
+        self.client.post(reverse("add_to_cart", args=[self.items["mug"].id]))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("view_cart"))
+        self.assertEqual(response.context["cart_total"], Decimal("18.00"))
+
+        for item in self.items.values():
+            self.client.post(reverse("add_to_cart", args=[item.id]))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("view_cart"))
+        self.assertEqual(response.context["cart_total"], Decimal("73.48"))
+
+
+class RoleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner_group = Group.objects.create(name="Owner")
+        self.employee_group = Group.objects.create(name="Employee")
+        self.user = User.objects.create_user("staff", password="pw", is_staff=True)
+        self.client.login(username="staff", password="pw")
+
+    def test_roles_are_cached_between_requests(self):
+        self.user.groups.add(self.owner_group)
+        self.client.get(reverse("admin_panel"))  # warms the role cache
+        # session, user and the cart badge
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("admin_panel"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_group_changes_apply_immediately(self):
+        self.user.groups.add(self.employee_group)
+        self.assertEqual(self.client.get(reverse("admin_users_list")).status_code, 403)
+
+        self.user.groups.add(self.owner_group)
+        self.assertEqual(self.client.get(reverse("admin_users_list")).status_code, 200)
+
+        self.owner_group.user_set.clear()
+        self.assertEqual(self.client.get(reverse("admin_users_list")).status_code, 403)
+
+    def test_user_save_drops_cached_roles(self):
+        self.user.groups.add(self.employee_group)
+        self.assertEqual(get_roles(self.user), {"Employee"})
+        self.assertIsNotNone(cache.get(f"roles:{self.user.pk}"))
+
+        self.user.save()
+        self.assertIsNone(cache.get(f"roles:{self.user.pk}"))
+
+
+class AdminListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.items = make_catalogue()
+        owner = User.objects.create_user("owner", password="pw", is_staff=True)
+        owner.groups.add(Group.objects.create(name="Owner"))
+        self.client.login(username="owner", password="pw")
+        self.client.get(reverse("admin_panel"))  # warms the role cache
+
+    def add_rows(self, n):
+        start = Item.objects.count()
+        mugs = SubCategory.objects.get(url_name="mugs")
+        Item.objects.bulk_create(
+            Item(label=f"Mug {i}", category=mugs.category, subcategory=mugs, price=Decimal("5.00"))
+            for i in range(start, start + n)
+        )
+        User.objects.bulk_create(User(username=f"user{i}") for i in range(start, start + n))
+
+    def test_query_count_does_not_grow_with_rows(self):
+        # session, user, cart badge, one page of rows (+ subcategories for
+        # the bulk actions)
+        for _ in range(2):
+            for name, queries in (("admin_items_list", 5), ("admin_users_list", 4)):
+                with self.assertNumQueries(queries):
+                    self.client.get(reverse(name))
+            self.add_rows(30)
+
+    def test_sort_search_and_pages(self):
+        url = reverse("admin_items_list")
+        response = self.client.get(url, {"sort": "-price"})
+        self.assertEqual(response.context["items"][0], self.items["mug"])
+
+        response = self.client.get(url, {"q": "blade"})
+        self.assertEqual(list(response.context["items"]), [self.items["blade"]])
+
+        self.add_rows(60)
+        with self.settings(ADMIN_PAGE_SIZE=50):
+            first = self.client.get(url)
+            second = self.client.get(url, {"cursor": first.context["page"].next_cursor})
+        self.assertEqual(len(first.context["items"]), 50)
+        self.assertEqual(len(second.context["items"]), 14)
+        self.assertFalse(second.context["page"].has_next)
+
+
+class ItemImportExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.items = make_catalogue()
+        owner = User.objects.create_user("owner", password="pw", is_staff=True)
+        owner.groups.add(Group.objects.create(name="Owner"))
+        self.client.login(username="owner", password="pw")
+
+    def csv_rows(self, *rows):
+        header = "id,label,category,subcategory,price,rarity,stock\n"
+        return header + "".join(row + "\n" for row in rows)
+
+    def test_import_creates_and_updates_in_batches(self):
+        mug = self.items["mug"]
+        data = self.csv_rows(
+            f"{mug.id},Everroot Grove Mug,merch,mugs,20.00,common,",
+            *(f",Tide Mug {i},merch,mugs,7.50,rare,3" for i in range(25)),
+        )
+        result = item_io.import_items(item_io.read_rows(io.StringIO(data)), batch_size=10)
+
+        self.assertTrue(result.ok, result.errors)
+        self.assertEqual((result.created, result.updated), (25, 1))
+        mug.refresh_from_db()
+        self.assertEqual(mug.price, Decimal("20.00"))
+        self.assertEqual(Item.objects.filter(label__startswith="Tide Mug", stock=3).count(), 25)
+        # bulk writes skip the signals, the search index is updated anyway
+        self.assertEqual(search_items(Item.objects.all(), "tide").count(), 25)
+
+    def test_invalid_rows_write_nothing(self):
+        data = self.csv_rows(
+            ",Good Mug,merch,mugs,5.00,common,",
+            ",Bad Mug,merch,weapons,5.00,common,",
+            ",Worse Mug,merch,mugs,free,common,",
+        )
+        result = item_io.import_items(item_io.read_rows(io.StringIO(data)))
+        self.assertEqual(
+            result.errors,
+            [(3, "subcategory does not belong to the category"), (4, "invalid price 'free'")],
+        )
+        self.assertFalse(Item.objects.filter(label="Good Mug").exists())
+
+    def test_long_values_and_repeated_ids_are_row_errors(self):
+        header = "id,label,category,subcategory,price,element,image_url\n"
+        data = header + "".join(row + "\n" for row in (
+            ",Ash Mug,merch,mugs,5.00," + "x" * 31 + ",",
+            ",Bone Mug,merch,mugs,5.00,," + "y" * 201,
+            "900,Clay Mug,merch,mugs,5.00,,",
+            "900,Dust Mug,merch,mugs,5.00,,",
+        ))
+        result = item_io.import_items(item_io.read_rows(io.StringIO(data)))
+        self.assertEqual(result.errors, [
+            (2, "element is too long"),
+            (3, "image_url is too long"),
+            (5, "id 900 is already on line 4"),
+        ])
+        self.assertFalse(Item.objects.filter(id=900).exists())
+
+    def test_unreadable_files_are_import_errors(self):
+        data = self.csv_rows(",NaN Mug,merch,mugs,NaN,common,", ",Big Mug,merch,mugs,Infinity,common,")
+        result = item_io.import_items(item_io.read_rows(io.StringIO(data)))
+        self.assertEqual(result.errors, [(2, "invalid price 'NaN'"), (3, "invalid price 'Infinity'")])
+
+        data = self.csv_rows(",Mug,merch,mugs,5.00,common,", "," + "x" * 200000)
+        result = item_io.import_items(item_io.read_rows(io.StringIO(data)))
+        self.assertEqual(result.errors, [(3, "malformed CSV (field larger than field limit (131072))")])
+        self.assertFalse(Item.objects.filter(label="Mug").exists())
+
+        upload = SimpleUploadedFile("items.csv", self.csv_rows(",Mug,merch,mugs,5.00,common,").encode("utf-16"))
+        response = self.client.post(reverse("admin_items_import"), {"file": upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["result"].errors, [(1, "the file is not UTF-8 text")])
+        self.assertFalse(Item.objects.filter(label="Mug").exists())
+
+    def test_upload_page_and_streaming_export_round_trip(self):
+        response = self.client.get(reverse("admin_items_export"), {"format": "jsonl"})
+        self.assertTrue(response.streaming)
+        exported = b"".join(response.streaming_content).decode()
+        self.assertEqual(len(exported.splitlines()), 4)
+
+        Item.objects.filter(id=self.items["blade"].id).update(price=Decimal("1.00"))
+        upload = SimpleUploadedFile("items.jsonl", exported.encode())
+        response = self.client.post(reverse("admin_items_import"), {"file": upload})
+        self.assertEqual(response.context["result"].updated, 4)
+        self.items["blade"].refresh_from_db()
+        self.assertEqual(self.items["blade"].price, Decimal("12.50"))
+
+        response = self.client.get(reverse("admin_items_export"))
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], ",".join(item_io.FIELDS))
+        self.assertEqual(len(lines), 5)
+
+
+class BulkItemActionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.items = make_catalogue()
+        staff = User.objects.create_user("staff", password="pw", is_staff=True)
+        staff.groups.add(Group.objects.create(name="Employee"))
+        self.client.login(username="staff", password="pw")
+
+    def bulk(self, *items, **data):
+        data["ids"] = [self.items[name].id for name in items]
+        return self.client.post(reverse("admin_items_bulk"), data)
+
+    def price(self, name):
+        self.items[name].refresh_from_db()
+        return self.items[name].price
+
+    def test_price_changes_are_one_update(self):
+        version = catalogue_cache.get_version()
+        with CaptureQueriesContext(connection) as queries:
+            self.bulk("longbow", "blade", action="price_percent", value="-10")
+        self.assertEqual(len([q for q in queries if q["sql"].startswith("UPDATE")]), 1)
+        self.assertEqual(self.price("longbow"), Decimal("13.49"))
+        self.assertEqual(self.price("blade"), Decimal("11.25"))
+        self.assertEqual(self.price("mug"), Decimal("18.00"))
+        # bumped once now and once on commit, not per item
+        self.assertEqual(catalogue_cache.get_version(), version + 1)
+
+        self.bulk("ruins", "mug", action="price_amount", value="-15")
+        self.assertEqual(self.price("ruins"), Decimal("0.00"))
+        self.assertEqual(self.price("mug"), Decimal("3.00"))
+
+    def test_rarity_and_move(self):
+        self.bulk("mug", "ruins", action="rarity", rarity="legendary")
+        self.assertEqual(Item.objects.filter(rarity="legendary").count(), 3)
+
+        mugs = SubCategory.objects.get(url_name="mugs")
+        self.bulk("blade", action="move", subcategory=mugs.id)
+        blade = Item.objects.get(id=self.items["blade"].id)
+        self.assertEqual((blade.category_id, blade.subcategory_id), (mugs.category_id, mugs.id))
+        # the new category label is searchable right away
+        self.assertIn(blade, search_items(Item.objects.all(), "merch"))
+
+    def test_delete_keeps_ordered_items(self):
+        buyer = User.objects.create_user("buyer", password="pw")
+        place_order(buyer, {str(self.items["mug"].id): 1})
+
+        response = self.bulk("mug", "ruins", action="delete", next="/manage/items/?sort=-price")
+        self.assertRedirects(response, "/manage/items/?sort=-price")
+        self.assertTrue(Item.objects.filter(id=self.items["mug"].id).exists())
+        self.assertFalse(Item.objects.filter(id=self.items["ruins"].id).exists())
+        self.assertEqual(search_items(Item.objects.all(), "vaeloria").count(), 0)
+
+    def test_bad_value_changes_nothing(self):
+        self.bulk("mug", action="price_percent", value="NaN")
+        self.assertEqual(self.price("mug"), Decimal("18.00"))
+
+    def test_prices_stop_at_the_field_maximum(self):
+        Item.objects.filter(id=self.items["mug"].id).update(price=Decimal("99999.99"))
+        Item.objects.filter(id=self.items["ruins"].id).update(price=Decimal("99000.00"))
+        self.bulk("mug", "ruins", action="price_percent", value="50")
+        self.assertEqual(self.price("mug"), Decimal("99999.99"))
+        self.assertEqual(self.price("ruins"), Decimal("99999.99"))
+
+        self.bulk("mug", action="price_amount", value="9999")
+        self.assertEqual(self.price("mug"), Decimal("99999.99"))
+        self.assertEqual(self.client.get(reverse("catalogue")).status_code, 200)
+
+
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN output is SQLite specific")
+class QueryPlanTests(TestCase):
+    """
+    Drive the hot pages over a seeded database and EXPLAIN every query
+    they run against the big tables: none may fall back to a full scan.
+    """
+    HOT_TABLES = (
+        "core_item", "core_order", "core_orderitem", "core_wishlistitem",
+        "core_cartline", "core_stockreservation",
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        items = make_catalogue()
+        subcategories = list(SubCategory.objects.all())
+        Item.objects.bulk_create(
+            Item(
+                label=f"Seeded item {i}", category_id=sub.category_id, subcategory=sub,
+                price=Decimal(i % 70), rarity=("common", "rare", "legendary")[i % 3],
+            )
+            for i, sub in enumerate(subcategories * 100)
+        )
+        cls.user = User.objects.create_user("buyer", password="pw")
+        WishlistItem.objects.create(user=cls.user, item=items["mug"])
+        for _ in range(3):
+            place_order(cls.user, {str(items["blade"].id): 1})
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def plans(self, *requests):
+        """Run the requests, return [(sql, plan lines)] for the hot queries."""
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            for url, params in requests:
+                self.assertEqual(self.client.get(url, params).status_code, 200)
+
+        plans = []
+        for sql, params in statements:
+            if not sql.lstrip().upper().startswith("SELECT"):
+                continue
+            if not any(f'"{table}"' in sql for table in self.HOT_TABLES):
+                continue
+            # facet counts aggregate the whole filtered set on purpose (cached)
+            if '"price_bucket"' in sql:
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+                plans.append((sql, [row[-1] for row in cursor.fetchall()]))
+        self.assertTrue(plans)
+        return plans
+
+    def assertNoFullScans(self, *requests):
+        full_scan = re.compile(r"^SCAN (%s)$" % "|".join(self.HOT_TABLES))
+        for sql, plan in self.plans(*requests):
+            for line in plan:
+                self.assertIsNone(full_scan.match(line), f"{line}\n{sql}")
+
+    def test_catalogue_filters_use_indexes(self):
+        url = reverse("catalogue")
+        first = self.client.get(url)
+        self.assertNoFullScans(
+            (url, {}),
+            (url, {"cursor": first.context["page"].next_cursor}),
+            (url, {"rarity": "rare"}),
+            (url, {"category": "dlc"}),
+            (url, {"subcategory": "weapons"}),
+            (url, {"min_price": "10", "max_price": "20"}),
+            (url, {"sort": "popular"}),
+            (url, {"sort": "bestsellers"}),
+            (reverse("home"), {}),
+        )
+
+    def test_newest_first_pages_need_no_sort(self):
+        url = reverse("catalogue")
+        first = self.client.get(url, {"rarity": "rare"})
+        for sql, plan in self.plans(
+            (url, {}),
+            (url, {"rarity": "rare", "cursor": first.context["page"].next_cursor}),
+        ):
+            if "ORDER BY" in sql:
+                self.assertFalse([line for line in plan if "TEMP B-TREE" in line], sql)
+
+    def test_account_pages_use_indexes(self):
+        self.client.post(reverse("add_to_cart", args=[Item.objects.first().id]))
+        self.assertNoFullScans(
+            (reverse("dashboard"), {}),
+            (reverse("order_history"), {}),
+            (reverse("view_cart"), {}),
+        )
+
+
+class SeedAndBenchmarkTests(TestCase):
+    def test_seed_then_benchmark(self):
+        call_command(
+            "seed_mirage", items=30, users=3, wishlist=2, orders=2, lines=2,
+            stdout=io.StringIO(),
+        )
+        self.assertEqual(Item.objects.count(), 30)
+        self.assertEqual(Order.objects.count(), 6)
+        self.assertEqual(Order.objects.filter(items__isnull=True).count(), 0)
+        self.assertEqual(popularity.reconcile(dry_run=True), 0)
+        self.assertTrue(search_items(Item.objects.all(), Item.objects.first().label).exists())
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.json")
+            call_command("bench_store", requests=2, warmup=0, output=path, stdout=io.StringIO())
+            with open(path) as handle:
+                report = json.load(handle)
+
+        self.assertEqual(report["data"]["items"], 30)
+        for name in ("home", "catalogue", "catalogue_search", "add_to_cart", "view_cart",
+                     "checkout", "dashboard"):
+            row = report["endpoints"][name]
+            self.assertLessEqual(row["p50_ms"], row["p95_ms"])
+            self.assertTrue(all(code < 400 for code in row["status_codes"]), (name, row))
+        # everything the benchmark wrote was rolled back
+        self.assertEqual(Order.objects.count(), 6)
+
+
+class PerfTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        perf.recorder.reset()
+        make_catalogue()
+
+    def test_requests_are_measured_per_url_name(self):
+        response = self.client.get(reverse("catalogue"))
+        self.assertRegex(
+            response["Server-Timing"],
+            r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+$',
+        )
+        self.client.get(reverse("catalogue"))
+
+        rows = dict(perf.recorder.report())
+        row = rows["catalogue"]
+        self.assertEqual(row["count"], 2)
+        self.assertGreater(row["avg_queries"], 0)
+        self.assertGreater(row["avg_template_ms"], 0)
+        self.assertGreaterEqual(row["avg_ms"], row["avg_template_ms"])
+        self.assertEqual(row["avg_bytes"], len(response.content))
+
+    @override_settings(PERF_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_left_alone(self):
+        response = self.client.get(reverse("home"))
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(perf.recorder.report(), [])
+
+    def test_histogram_percentiles_and_window(self):
+        recorder = perf.Recorder()
+        timer = perf.RequestTimer()
+        for ms in [3] * 90 + [150] * 10:
+            recorder.record("home", ms, timer, 100, now=0)
+        (name, row), = recorder.report(now=0)
+        self.assertEqual((row["p50_ms"], row["p95_ms"], row["max_ms"]), (5, 150, 150))
+        # an hour later the old minutes are gone
+        self.assertEqual(recorder.report(now=60 * 60), [])
+
+    def test_report_is_owner_only(self):
+        staff = User.objects.create_user("staff", password="pw", is_staff=True)
+        staff.groups.add(Group.objects.create(name="Employee"))
+        self.client.login(username="staff", password="pw")
+        self.assertEqual(self.client.get(reverse("admin_perf")).status_code, 403)
+
+        staff.groups.add(Group.objects.create(name="Owner"))
+        response = self.client.get(reverse("admin_perf"))
+        self.assertContains(response, "<code>admin_perf</code>")
+
+
+class WishlistToggleTests(TestCase):
+    def setUp(self):
+        self.items = make_catalogue()
+        self.user = User.objects.create_user("fan", password="pw")
+        self.client.force_login(self.user)
+        self.url = reverse("toggle_wishlist", args=[self.items["mug"].id])
+
+    def xhr(self, **data):
+        return self.client.post(self.url, data, headers={"X-Requested-With": "XMLHttpRequest"})
+
+    def test_xhr_toggle_answers_json(self):
+        response = self.xhr()
+        self.assertEqual(response.json(), {"item_id": self.items["mug"].id, "wishlisted": True})
+        response = self.xhr()
+        self.assertEqual(response.json()["wishlisted"], False)
+        self.assertFalse(WishlistItem.objects.exists())
+
+    def test_wanted_state_makes_double_clicks_harmless(self):
+        for _ in range(2):
+            self.assertTrue(self.xhr(state="on").json()["wishlisted"])
+        self.assertEqual(WishlistItem.objects.count(), 1)
+        for _ in range(2):
+            self.assertFalse(self.xhr(state="off").json()["wishlisted"])
+        self.assertFalse(WishlistItem.objects.exists())
+
+    def test_single_write_per_toggle(self):
+        self.xhr(state="on")
+        with CaptureQueriesContext(connection) as queries:
+            self.xhr(state="off")
+        writes = [q["sql"].split()[0] for q in queries if q["sql"].startswith(("INSERT", "UPDATE", "DELETE"))]
+        # the row itself plus the wishlist_count decrement
+        self.assertEqual(writes, ["DELETE", "UPDATE"])
+
+    def test_unknown_item_is_404_and_form_post_redirects(self):
+        missing = reverse("toggle_wishlist", args=[999999])
+        self.assertEqual(self.client.post(missing, {"state": "on"}).status_code, 404)
+
+        response = self.client.post(self.url, HTTP_REFERER="/catalogue/?rarity=common")
+        self.assertRedirects(response, "/catalogue/?rarity=common", fetch_redirect_response=False)
+        self.assertTrue(WishlistItem.objects.filter(user=self.user).exists())
+
+
+class PopularityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.items = make_catalogue()
+        self.user = User.objects.create_user("fan", password="pw")
+        self.client.force_login(self.user)
+
+    def counters(self, name):
+        item = Item.objects.get(pk=self.items[name].pk)
+        return item.wishlist_count, item.units_sold
+
+    def test_wishlist_toggle_and_checkout_move_counters(self):
+        url = reverse("toggle_wishlist", args=[self.items["mug"].id])
+        self.client.post(url, {"state": "on"})
+        self.client.post(url, {"state": "on"})  # already there: no double count
+        self.assertEqual(self.counters("mug"), (1, 0))
+        self.client.post(url, {"state": "off"})
+        self.assertEqual(self.counters("mug"), (0, 0))
+
+        place_order(self.user, {str(self.items["mug"].id): 3, str(self.items["blade"].id): 1})
+        self.assertEqual(self.counters("mug"), (0, 3))
+        self.assertEqual(self.counters("blade"), (0, 1))
+        self.assertEqual(self.counters("ruins"), (0, 0))
+
+    def test_reconcile_fixes_drift(self):
+        WishlistItem.objects.create(user=self.user, item=self.items["ruins"])
+        place_order(self.user, {str(self.items["blade"].id): 2})
+        Item.objects.filter(pk=self.items["blade"].pk).update(units_sold=40, wishlist_count=7)
+
+        self.assertEqual(popularity.reconcile(dry_run=True), 2)
+        self.assertEqual(self.counters("blade"), (7, 40))
+
+        out = io.StringIO()
+        call_command("reconcile_popularity", stdout=out)
+        self.assertIn("2 items fixed", out.getvalue())
+        self.assertEqual(self.counters("blade"), (0, 2))
+        self.assertEqual(self.counters("ruins"), (1, 0))
+        self.assertEqual(popularity.reconcile(), 0)
+
+    def test_catalogue_sorts(self):
+        Item.objects.filter(pk=self.items["ruins"].pk).update(wishlist_count=5)
+        Item.objects.filter(pk=self.items["longbow"].pk).update(wishlist_count=2, units_sold=9)
+        Item.objects.filter(pk=self.items["mug"].pk).update(units_sold=4)
+
+        response = self.client.get(reverse("catalogue"), {"sort": "popular", "page_size": 2})
+        self.assertEqual(
+            response.context["page"].object_list, [self.items["ruins"].id, self.items["longbow"].id]
+        )
+        # the cursor continues in the same order
+        response = self.client.get(
+            reverse("catalogue"),
+            {"sort": "popular", "page_size": 2, "cursor": response.context["page"].next_cursor},
+        )
+        self.assertEqual(
+            response.context["page"].object_list, [self.items["mug"].id, self.items["blade"].id]
+        )
+
+        response = self.client.get(reverse("catalogue"), {"sort": "bestsellers"})
+        self.assertEqual(response.context["page"].object_list[:2],
+                         [self.items["longbow"].id, self.items["mug"].id])
+        # unknown sorts fall back to newest first
+        response = self.client.get(reverse("catalogue"), {"sort": "nope"})
+        self.assertEqual(response.context["page"].object_list[0], self.items["mug"].id)
+
+    def test_home_shelves(self):
+        Item.objects.filter(pk=self.items["ruins"].pk).update(wishlist_count=5)
+        response = self.client.get(reverse("home"))
+        self.assertContains(response, "Most Wished")
+        self.assertNotContains(response, "Best Sellers")
+
+
+@override_settings(FEATURED_REFRESH_IN_BACKGROUND=False, FEATURED_COUNT=2)
+class FeaturedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.items = make_catalogue()
+
+    def ids(self, rows):
+        return [row["id"] for row in rows]
+
+    def test_home_runs_no_catalogue_query(self):
+        self.client.get(reverse("home"))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("home"))
+        self.assertFalse([q for q in queries if "core_item" in q["sql"]])
+        self.assertContains(response, "Everroot Grove Mug")
+
+    @override_settings(FEATURED_STRATEGY="curated")
+    def test_curated_is_topped_up_with_newest(self):
+        Item.objects.filter(pk=self.items["longbow"].pk).update(featured=True)
+        slate = featured.build()["featured"]
+        self.assertEqual(self.ids(slate), [self.items["longbow"].id, self.items["mug"].id])
+
+    @override_settings(FEATURED_STRATEGY="rarity")
+    def test_rarity_draw_prefers_rare_items(self):
+        picks = {}
+        rng = random.Random(7)
+        for _ in range(200):
+            for row in featured._rarity(1, rng):
+                picks[row["id"]] = picks.get(row["id"], 0) + 1
+        self.assertGreater(picks[self.items["longbow"].id], picks[self.items["mug"].id])
+        self.assertEqual(len(featured.build()["featured"]), 2)
+
+    def test_edit_refreshes_after_commit(self):
+        featured.get_slates()
+        with self.captureOnCommitCallbacks(execute=True):
+            newer = Item.objects.create(
+                label="Veilburst Poster", category=self.items["mug"].category,
+                subcategory=self.items["mug"].subcategory, price=Decimal("5.00"),
+            )
+        self.assertEqual(self.ids(featured.get_slates()["featured"])[0], newer.id)
+
+    def test_stale_slate_is_served_while_rebuilt(self):
+        stale = featured.build()
+        stale["built_at"] -= featured.timeout() + 1
+        stale["featured"] = []
+        cache.set(featured.SLATES_KEY, stale)
+
+        self.assertEqual(featured.get_slates()["featured"], [])
+        self.assertEqual(len(featured.get_slates()["featured"]), 2)
+
+
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.items = make_catalogue()
+        Item.objects.filter(pk=self.items["mug"].pk).update(image_url="images/items/everroot-grove-mug.png")
+
+    def test_cards_use_srcset_when_thumbnails_exist(self):
+        image = ItemImage.objects.create(
+            path="images/items/everroot-grove-mug.png", content_hash="0" * 64, width=512, height=512,
+        )
+        for fmt in ("webp", "avif"):
+            for width in (160, 320):
+                ItemThumbnail.objects.create(
+                    image=image, format=fmt, width=width, height=width,
+                    path=f"images/thumbs/everroot-grove-mug-000000000000-{width}.{fmt}",
+                )
+
+        response = self.client.get(reverse("catalogue"))
+        self.assertContains(
+            response,
+            '<source type="image/avif" srcset="/static/images/thumbs/everroot-grove-mug-000000000000-160.avif 160w, '
+            '/static/images/thumbs/everroot-grove-mug-000000000000-320.avif 320w"',
+        )
+        self.assertContains(response, 'width="512"')
+        # items without thumbnails keep their plain (lazy) image
+        self.assertContains(response, 'alt="Emberwreath Longbow" class="product-image" loading="lazy"')
+
+    @skipUnless(thumbnails.available(), "Pillow is not installed")
+    def test_generate_is_incremental(self):
+        from PIL import Image
+
+        with tempfile.TemporaryDirectory() as source, tempfile.TemporaryDirectory() as out:
+            os.makedirs(os.path.join(source, "images", "test"))
+            original = os.path.join(source, "images", "test", "relic.png")
+            Image.new("RGB", (400, 200), "purple").save(original)
+            Item.objects.filter(pk=self.items["mug"].pk).update(image_url="images/test/relic.png")
+
+            with override_settings(STATICFILES_DIRS=[source], THUMBNAIL_DIR=out,
+                                   THUMBNAIL_WIDTHS=(160, 320, 640), THUMBNAIL_FORMATS=("webp",)):
+                result = thumbnails.generate(workers=1)
+                self.assertEqual(result.generated, ["images/test/relic.png"])
+                image = ItemImage.objects.get(path="images/test/relic.png")
+                self.assertEqual((image.width, image.height), (400, 200))
+                # 640 is never upscaled past the original
+                self.assertEqual(
+                    sorted(image.thumbnails.values_list("width", "height")), [(160, 80), (320, 160), (400, 200)]
+                )
+                first_files = set(os.listdir(out))
+                self.assertEqual(len(first_files), 3)
+
+                self.assertEqual(thumbnails.generate(workers=1).skipped, 1)
+
+                # a fresh checkout: the rows are there, the files aren't
+                for name in first_files:
+                    os.remove(os.path.join(out, name))
+                self.assertEqual(thumbnails.generate(workers=1).generated, ["images/test/relic.png"])
+                self.assertEqual(set(os.listdir(out)), first_files)
+
+                Image.new("RGB", (400, 200), "gold").save(original)
+                self.assertEqual(thumbnails.generate(workers=1).generated, ["images/test/relic.png"])
+                # new hash, new names; the old files are gone
+                self.assertFalse(first_files & set(os.listdir(out)))
+                self.assertEqual(len(os.listdir(out)), 3)
+
+
+class AssetBundleTests(TestCase):
+    def test_minify_css_keeps_strings(self):
+        css = '/* theme */\n.card :hover ,\n.tag {\n    content: "a ; b" ;\n    margin: calc(1px + 2px);\n}\n'
+        self.assertEqual(
+            assets.minify_css(css),
+            '.card :hover,.tag{content: "a ; b";margin: calc(1px + 2px)}',
+        )
+
+    def test_build_writes_every_bundle(self):
+        with tempfile.TemporaryDirectory() as out:
+            report = assets.build(out)
+            self.assertEqual(sorted(os.listdir(out)), sorted(assets.BUNDLES))
+            for name, before, after in report:
+                if name.endswith(".css"):
+                    self.assertLess(after, before, name)
+            with open(os.path.join(out, "site.css"), encoding="utf-8") as handle:
+                self.assertNotIn("/*", handle.read())
+            # scripts go in as they are
+            with open(os.path.join(out, "site.js"), encoding="utf-8") as handle:
+                site_js = handle.read()
+            for source in assets.BUNDLES["site.js"]:
+                with open(os.path.join(assets.source_dir(), source), encoding="utf-8") as handle:
+                    self.assertIn(handle.read().strip(), site_js)
+
+    def test_pages_link_bundles_or_sources(self):
+        with override_settings(ASSET_BUNDLES=True):
+            response = self.client.get(reverse("home"))
+        self.assertContains(response, '<link rel="stylesheet" href="/static/bundles/site.css">')
+        self.assertContains(response, '<script defer src="/static/bundles/site.js"></script>')
+        self.assertNotContains(response, "css-files/")
+
+        with override_settings(ASSET_BUNDLES=False):
+            response = self.client.get(reverse("home"))
+        self.assertContains(response, "/static/css-files/theme-dark.css")
+        self.assertContains(response, "/static/css-files/home.css")
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.items = make_catalogue()
+
+    def revalidate(self, name, response, **extra):
+        return self.client.get(reverse(name), headers={"If-None-Match": response["ETag"]}, **extra)
+
+    def test_unchanged_catalogue_is_304(self):
+        self.client.get(reverse("catalogue"))  # sets the CSRF cookie
+        first = self.client.get(reverse("catalogue"))
+        self.assertIn("no-cache", first["Cache-Control"])
+        self.assertIn("Cookie", first["Vary"])
+        with self.assertNumQueries(0):
+            second = self.revalidate("catalogue", first)
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second["ETag"], first["ETag"])
+
+        self.assertEqual(self.revalidate("home", self.client.get(reverse("home"))).status_code, 304)
+
+    def test_edit_changes_etag(self):
+        first = self.client.get(reverse("catalogue"))
+        longbow = self.items["longbow"]
+        longbow.label = "Emberwreath Greatbow"
+        longbow.save()
+
+        response = self.revalidate("catalogue", first)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Emberwreath Greatbow")
+
+    def test_cart_and_wishlist_change_etag(self):
+        user = User.objects.create_user("fan", password="pw")
+        self.client.force_login(user)
+        self.client.get(reverse("catalogue"))
+        first = self.client.get(reverse("catalogue"))
+        self.assertEqual(self.revalidate("catalogue", first).status_code, 304)
+        self.assertIn("private", first["Cache-Control"])
+        self.assertNotIn("Last-Modified", first)
+
+        self.client.post(
+            reverse("add_to_cart", args=[self.items["longbow"].id]),
+            headers={"X-Requested-With": "XMLHttpRequest"},
+        )
+        self.assertEqual(self.revalidate("catalogue", first).status_code, 200)
+        second = self.client.get(reverse("catalogue"))
+        self.assertNotEqual(second["ETag"], first["ETag"])
+        # AJAX adds leave no flash message behind to block the next 304
+        self.assertNotContains(second, "was added to your cart")
+        self.assertEqual(self.revalidate("catalogue", second).status_code, 304)
+
+        self.client.post(
+            reverse("toggle_wishlist", args=[self.items["mug"].id]), {"state": "on"},
+            headers={"X-Requested-With": "XMLHttpRequest"},
+        )
+        self.assertEqual(self.revalidate("catalogue", second).status_code, 200)
+
+    def test_first_page_with_csrf_cookie_is_private(self):
+        for url in (reverse("catalogue"), reverse("item_detail", args=[self.items["mug"].id])):
+            self.client.cookies.clear()
+            response = self.client.get(url)
+            self.assertIn("csrftoken", response.cookies)
+            self.assertIn("private", response["Cache-Control"])
+            self.assertNotIn("public", response["Cache-Control"])
+
+    def test_changes_from_other_workers_change_etag(self):
+        user = User.objects.create_user("fan", password="pw")
+        self.client.force_login(user)
+        self.client.get(reverse("catalogue"))
+        first = self.client.get(reverse("catalogue"))
+
+        # written by another process: nothing in this one's cache moved
+        CartLine.objects.create(user=user, item=self.items["longbow"], quantity=1)
+        second = self.revalidate("catalogue", first)
+        self.assertEqual(second.status_code, 200)
+        self.assertContains(second, '<span class="floating-cart-badge">1</span>')
+
+        WishlistItem.objects.create(user=user, item=self.items["mug"])
+        self.assertEqual(self.revalidate("catalogue", second).status_code, 200)
+
+    def test_json_uses_last_modified(self):
+        url = reverse("catalogue_json")
+        # a catalogue last changed, and a page cached, a minute ago
+        a_minute_ago = time.time() - 60
+        cache.set(catalogue_cache.CHANGED_KEY, a_minute_ago)
+        with mock.patch("core.views.time.time", return_value=a_minute_ago):
+            self.client.get(url)
+
+        first = self.client.get(url)
+        self.assertIn("Last-Modified", first)
+        self.assertIn("public", first["Cache-Control"])
+        response = self.client.get(url, headers={"If-Modified-Since": first["Last-Modified"]})
+        self.assertEqual(response.status_code, 304)
+
+        catalogue_cache.bump_version()
+        response = self.client.get(url, headers={"If-Modified-Since": first["Last-Modified"]})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Last-Modified", response)  # changed less than a second ago
+
+
+class RelatedItemsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.items = make_catalogue()
+        self.user = User.objects.create_user("fan", password="pw")
+
+    def order(self, *names, status="completed"):
+        order = Order.objects.create(user=self.user, status=status)
+        for name in names:
+            OrderItem.objects.create(order=order, item=self.items[name], price_at_purchase=Decimal("1.00"))
+
+    def test_rebuild_ranks_co_purchases_then_look_alikes(self):
+        self.order("longbow", "mug")
+        self.order("longbow", "mug")
+        self.order("longbow", "ruins")
+        self.order("longbow", "blade", status="cancelled")
+        related.rebuild()
+
+        rows = list(
+            ItemSimilarity.objects.filter(item=self.items["longbow"]).order_by("-score")
+            .values_list("related__label", "co_purchases")
+        )
+        # mug 2/sqrt(3*2), ruins 1/sqrt(3*1), blade only shares the subcategory
+        self.assertEqual(rows, [
+            ("Everroot Grove Mug", 2), ("Ruins of Vaeloria", 1), ("Stormbound Relicblade", 0),
+        ])
+        self.assertEqual(related.related_ids(self.items["longbow"], 2),
+                         [self.items["mug"].id, self.items["ruins"].id])
+
+    def test_detail_page(self):
+        self.order("blade", "mug")
+        related.rebuild()
+        url = reverse("item_detail", args=[self.items["blade"].id])
+
+        response = self.client.get(url)
+        self.assertContains(response, "Stormbound Relicblade")
+        self.assertEqual(
+            [card.id for card in response.context["cards"]],
+            [self.items["mug"].id, self.items["longbow"].id],
+        )
+        # warm: only the item itself
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+        self.assertEqual(self.client.get(reverse("item_detail", args=[999999])).status_code, 404)
+
+    def test_new_items_fall_back_to_their_subcategory(self):
+        response = self.client.get(reverse("item_detail", args=[self.items["blade"].id]))
+        self.assertEqual([card.id for card in response.context["cards"]], [self.items["longbow"].id])
+
+
+@override_settings(ROOT_URLCONF="mirage_project.urls_asgi")
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.items = make_catalogue()
+        self.user = User.objects.create_user("fan", password="pw")
+
+    async def test_pages_match_the_sync_views(self):
+        for name in ("home", "catalogue"):
+            response = await self.async_client.get(reverse(name))
+            self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Emberwreath Longbow")
+        with override_settings(ROOT_URLCONF="mirage_project.urls"):
+            sync = await sync_to_async(self.client.get)(reverse("catalogue"))
+        self.assertEqual(
+            [card.id for card in response.context["cards"]],
+            [card.id for card in sync.context["cards"]],
+        )
+
+        data = (await self.async_client.get(reverse("catalogue_json"))).json()
+        self.assertEqual(len(data["items"]), len(self.items))
+
+        response = await self.async_client.get(reverse("item_detail", args=[self.items["blade"].id]))
+        self.assertContains(response, "Stormbound Relicblade")
+        self.assertEqual([card.id for card in response.context["cards"]], [self.items["longbow"].id])
+        missing = await self.async_client.get(reverse("item_detail", args=[999999]))
+        self.assertEqual(missing.status_code, 404)
+
+    async def test_unchanged_catalogue_is_304(self):
+        await self.async_client.get(reverse("catalogue"))  # sets the CSRF cookie
+        first = await self.async_client.get(reverse("catalogue"))
+        second = await self.async_client.get(
+            reverse("catalogue"), headers={"If-None-Match": first["ETag"]}
+        )
+        self.assertEqual(second.status_code, 304)
+
+    async def test_logged_in_cart(self):
+        await self.async_client.aforce_login(self.user)
+        longbow = self.items["longbow"]
+        await self.async_client.post(reverse("add_to_cart", args=[longbow.id]))
+        await self.async_client.post(reverse("add_to_cart", args=[longbow.id]))
+
+        self.assertEqual(
+            (await self.async_client.get(reverse("cart_json"), {"lines": "0"})).json(), {"count": 2}
+        )
+        data = (await self.async_client.get(reverse("cart_json"))).json()
+        self.assertEqual(data["lines"][0]["quantity"], 2)
+        self.assertEqual(data["total"], "29.98")
+
+        response = await self.async_client.get(reverse("view_cart"))
+        self.assertContains(response, "Emberwreath Longbow")
+        self.assertContains(response, "29.98")
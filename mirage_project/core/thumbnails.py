@@ -0,0 +1,340 @@
+"""
+Responsive item images.
+
+Item.image_url points at a full size PNG under static/. This module
+turns every such image into smaller WebP/AVIF copies at a few widths
+(settings.THUMBNAIL_WIDTHS), written to THUMBNAIL_DIR, which is part of
+the app's static files (so collectstatic picks them up):
+
+    images/items/emberwreath-longbow.png
+    -> images/thumbs/emberwreath-longbow-<hash>-320.webp, ...
+
+The source file's content hash is stored on ItemImage (with the
+ItemThumbnail rows), so a run only touches images that are new, whose
+file changed or whose thumbnail files are missing; the hash is also part of the file names, so browsers never
+see a stale thumbnail. Resizing runs in a process pool.
+
+    python manage.py generate_thumbnails [--force] [--workers N]
+
+Saving an item queues its image for a background run as well. Pillow is
+optional: without it nothing is generated and the cards keep using the
+original images (still lazy loaded).
+"""
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.db import connection, transaction
+from django.templatetags.static import static
+from django.utils.text import slugify
+
+from . import catalogue_cache
+from .models import Item, ItemImage, ItemThumbnail
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional
+    Image = None
+
+
+logger = logging.getLogger(__name__)
+
+MIME_TYPES = {"avif": "image/avif", "webp": "image/webp"}
+
+
+class PillowMissing(Exception):
+    pass
+
+
+def available():
+    return Image is not None
+
+
+def widths():
+    return sorted(getattr(settings, "THUMBNAIL_WIDTHS", (160, 320, 640)))
+
+
+def formats():
+    """The wanted formats (best first) this Pillow build can write."""
+    if Image is None:
+        return []
+    Image.init()
+    wanted = getattr(settings, "THUMBNAIL_FORMATS", ("avif", "webp"))
+    return [fmt for fmt in wanted if fmt.upper() in Image.SAVE]
+
+
+def quality():
+    return getattr(settings, "THUMBNAIL_QUALITY", 80)
+
+
+def output_dir():
+    return str(getattr(
+        settings, "THUMBNAIL_DIR", settings.BASE_DIR / "core" / "static" / "images" / "thumbs"
+    ))
+
+
+def url_prefix():
+    """Where output_dir() is found under static/."""
+    return getattr(settings, "THUMBNAIL_PREFIX", "images/thumbs")
+
+
+def content_hash(filename):
+    digest = hashlib.sha256()
+    with open(filename, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def target_widths(source_width):
+    # never upscale: widths above the original collapse into the original
+    return sorted({min(width, source_width) for width in widths()})
+
+
+# Resizing (runs in the worker processes: no Django in here)
+
+def _render(source_file, out_dir, stem, wanted_widths, wanted_formats, quality):
+    """
+    Write the thumbnails of one image. Returns (width, height, [(format,
+    width, height, file name), ...]) where width/height are the original's.
+    """
+    made = []
+    with Image.open(source_file) as original:
+        original.load()
+        source_width, source_height = original.size
+        image = original if original.mode in ("RGB", "RGBA") else original.convert("RGBA")
+        for width in sorted({min(w, source_width) for w in wanted_widths}):
+            height = max(1, round(source_height * width / source_width))
+            resized = image.resize((width, height), Image.LANCZOS)
+            for fmt in wanted_formats:
+                name = f"{stem}-{width}.{fmt}"
+                partial = os.path.join(out_dir, f".{name}.tmp")
+                resized.save(partial, fmt.upper(), quality=quality)
+                os.replace(partial, os.path.join(out_dir, name))
+                made.append((fmt, width, height, name))
+    return source_width, source_height, made
+
+
+# Generating
+
+class GenerateResult:
+    def __init__(self):
+        self.generated = []
+        self.skipped = 0
+        self.missing = []
+
+
+def _up_to_date(image, digest, wanted_formats):
+    if image is None or image.content_hash != digest:
+        return False
+    thumbs = image.thumbnails.all()
+    have = {(thumb.format, thumb.width) for thumb in thumbs}
+    wanted = {(fmt, width) for fmt in wanted_formats for width in target_widths(image.width)}
+    # the rows outlive the files: output_dir() isn't in git, so a fresh
+    # checkout (or another server) has none of them
+    return have == wanted and all(
+        os.path.exists(os.path.join(output_dir(), os.path.basename(thumb.path))) for thumb in thumbs
+    )
+
+
+def generate(paths=None, force=False, workers=None):
+    """
+    Generate the thumbnails of the given image paths (default: every
+    Item.image_url) that are missing or out of date. Returns a
+    GenerateResult.
+    """
+    if not available():
+        raise PillowMissing("Pillow is not installed")
+
+    if paths is None:
+        paths = Item.objects.exclude(image_url="").values_list("image_url", flat=True).distinct()
+    paths = sorted(set(paths))
+    wanted_formats = formats()
+    known = {
+        image.path: image
+        for image in ItemImage.objects.filter(path__in=paths).prefetch_related("thumbnails")
+    }
+
+    result = GenerateResult()
+    jobs = []
+    for path in paths:
+        source_file = finders.find(path)
+        if not source_file:
+            result.missing.append(path)
+            continue
+        digest = content_hash(source_file)
+        if not force and _up_to_date(known.get(path), digest, wanted_formats):
+            result.skipped += 1
+            continue
+        stem = f"{slugify(os.path.splitext(os.path.basename(path))[0])}-{digest[:12]}"
+        jobs.append((path, digest, (
+            source_file, output_dir(), stem, widths(), wanted_formats, quality(),
+        )))
+
+    if not jobs:
+        return result
+
+    os.makedirs(output_dir(), exist_ok=True)
+    if workers == 1 or len(jobs) == 1:
+        rendered = [_render(*args) for _path, _digest, args in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_render, *args) for _path, _digest, args in jobs]
+            rendered = [future.result() for future in futures]
+
+    for (path, digest, _args), (width, height, made) in zip(jobs, rendered):
+        _store(path, digest, width, height, made, known.get(path))
+        result.generated.append(path)
+
+    # cached cards and home shelves still point at the old images
+    from . import featured  # imports this module
+    catalogue_cache.bump_version()
+    featured.build()
+    return result
+
+
+def _store(path, digest, width, height, made, previous):
+    old_files = set()
+    with transaction.atomic():
+        image, _created = ItemImage.objects.update_or_create(
+            path=path,
+            defaults={"content_hash": digest, "width": width, "height": height},
+        )
+        if previous is not None:
+            old_files = {thumb.path for thumb in previous.thumbnails.all()}
+            image.thumbnails.all().delete()
+        thumbs = ItemThumbnail.objects.bulk_create(
+            ItemThumbnail(
+                image=image, format=fmt, width=thumb_width, height=thumb_height,
+                path=f"{url_prefix()}/{name}",
+            )
+            for fmt, thumb_width, thumb_height, name in made
+        )
+    # files of a previous version of the image
+    for stale in old_files - {thumb.path for thumb in thumbs}:
+        try:
+            os.remove(os.path.join(output_dir(), os.path.basename(stale)))
+        except FileNotFoundError:
+            pass
+
+
+# Background runs (after an item is saved)
+
+_lock = threading.Lock()
+_running = False
+_queued = set()
+
+
+def generate_later(paths):
+    """Queue image paths for a background generate()."""
+    global _running
+    if not available() or not getattr(settings, "THUMBNAILS_ON_SAVE", True):
+        return
+    with _lock:
+        _queued.update(paths)
+        if _running:
+            return
+        _running = True
+    threading.Thread(target=_generate_loop, name="thumbnails", daemon=True).start()
+
+
+def _generate_loop():
+    global _running
+    try:
+        while True:
+            with _lock:
+                if not _queued:
+                    _running = False
+                    return
+                paths = sorted(_queued)
+                _queued.clear()
+            try:
+                generate(paths, workers=1)
+            except Exception:
+                logger.exception("Generating thumbnails failed")
+    finally:
+        connection.close()
+
+
+# Rendering
+
+def _published(path):
+    # with a collectstatic manifest only collected files are served;
+    # thumbnails made since the last deploy wait for the next one
+    hashed = getattr(staticfiles_storage, "hashed_files", None)
+    return not hashed or path in hashed
+
+
+def pictures(paths):
+    """
+    {image path: picture dict} for the given paths that have thumbnails,
+    with one query. A picture dict holds what partials/item_picture.html
+    needs: src, width, height and one {type, srcset} per format.
+    """
+    paths = {path for path in paths if path}
+    if not paths:
+        return {}
+    return _collect(_thumbnails_of(paths))
+
+
+async def apictures(paths):
+    """pictures() for async views."""
+    paths = {path for path in paths if path}
+    if not paths:
+        return {}
+    return _collect([thumb async for thumb in _thumbnails_of(paths)])
+
+
+def _thumbnails_of(paths):
+    return (
+        ItemThumbnail.objects.filter(image__path__in=paths)
+        .select_related("image")
+        .order_by("image_id", "width")
+    )
+
+
+def _collect(thumbs):
+    found = {}
+    for thumb in thumbs:
+        if not _published(thumb.path):
+            continue
+        picture = found.get(thumb.image.path)
+        if picture is None:
+            picture = found[thumb.image.path] = {
+                "src": static(thumb.image.path),
+                "width": thumb.image.width,
+                "height": thumb.image.height,
+                "srcsets": {},
+            }
+        picture["srcsets"].setdefault(thumb.format, []).append(
+            f"{static(thumb.path)} {thumb.width}w"
+        )
+
+    order = {fmt: n for n, fmt in enumerate(MIME_TYPES)}
+    for picture in found.values():
+        srcsets = picture.pop("srcsets")
+        picture["sources"] = [
+            {"type": MIME_TYPES.get(fmt, f"image/{fmt}"), "srcset": ", ".join(entries)}
+            for fmt, entries in sorted(srcsets.items(), key=lambda pair: order.get(pair[0], 99))
+        ]
+    return found
+
+
+def attach(items):
+    """Set ``item.picture`` (or None) on Item objects, with one query."""
+    found = pictures(item.image_url for item in items)
+    for item in items:
+        item.picture = found.get(item.image_url)
+    return items
+
+
+async def aattach(items):
+    found = await apictures(item.image_url for item in items)
+    for item in items:
+        item.picture = found.get(item.image_url)
+    return items
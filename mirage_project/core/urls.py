@@ -6,6 +6,9 @@ urlpatterns = [
 
     path("manage/items/", views.admin_items_list, name="admin_items_list"),
     path("manage/items/new/", views.admin_item_create, name="admin_item_create"),
+    path("manage/items/bulk/", views.admin_items_bulk, name="admin_items_bulk"),
+    path("manage/items/import/", views.admin_items_import, name="admin_items_import"),
+    path("manage/items/export/", views.admin_items_export, name="admin_items_export"),
     path("manage/items/<int:item_id>/edit/", views.admin_item_edit, name="admin_item_edit"),
     path("manage/items/<int:item_id>/delete/", views.admin_item_delete, name="admin_item_delete"),
 
@@ -14,6 +17,8 @@ urlpatterns = [
     path("manage/categories/<int:category_id>/edit/", views.admin_category_edit, name="admin_category_edit"),
     path("manage/categories/<int:category_id>/delete/", views.admin_category_delete, name="admin_category_delete"),
 
+    path("manage/perf/", views.admin_perf, name="admin_perf"),
+
     path("manage/users/", views.admin_users_list, name="admin_users_list"),
     path("manage/users/<int:user_id>/edit/", views.admin_user_edit, name="admin_user_edit"),
     path("manage/users/<int:user_id>/delete/", views.admin_user_delete, name="admin_user_delete"),  # ✅ ADD THIS
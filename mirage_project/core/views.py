@@ -1,30 +1,41 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from .models import Category, SubCategory, Item, WishlistItem, Order, OrderItem
+from django.urls import reverse
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.conf import settings
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.db import IntegrityError, transaction
 from django.db.models import Q
+from django.templatetags.static import static
+from .models import Category, SubCategory, Item, WishlistItem, RARITY_CHOICES
+from . import (
+    catalogue_cache, conditional, featured, item_io, perf, popularity, related, stock, thumbnails,
+)
+from .cart import get_cart
+from .facets import catalogue_counts, price_facets, rarity_facets
+from .pagination import KeysetPage, paginate_keyset
+from .search import matching_items, max_results, search_items
+from .services import (
+    EmptyCart, bulk_adjust_price, bulk_delete, bulk_move, bulk_set_rarity, place_order,
+)
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
+import io
+import uuid
+import time
 
 # imports for roles + admin management
-from functools import wraps
-from django.http import HttpResponseForbidden
 from django.contrib.auth.models import User
+from .decorators import role_required
 from .forms_admin import ItemAdminForm, CategoryAdminForm, UserSiteAdminForm
 
 
 # Cart helpers
 
-def _get_cart(session):
-    """
-    Return cart dict from session.
-    Structure: {"item_id": quantity, ...}
-    """
-    return session.get("cart", {})
-
-
-def _save_cart(session, cart):
-    session["cart"] = cart
-    session.modified = True
+def _release_stock(cart, item_id=None, quantity=None):
+    """Hand reserved units of limited items back when they leave the cart."""
+    if stock.reservation_minutes():
+        stock.release(cart.holder, item_id, quantity)
 
 
 
@@ -34,61 +45,83 @@ def _save_cart(session, cart):
 def home(request):
     """
     Landing page (hero + info). No catalogue here.
+
+    The shelves come precomputed from the cache (see core.featured), so
+    a normal hit runs no catalogue query; a repeat visit gets a 304 (see
+    core.conditional).
     """
-    cart = _get_cart(request.session)
-    cart_count = sum(cart.values())
+    slates = featured.get_slates()
+    validators = conditional.Validators(
+        request, ("home", slates["strategy"], slates["built_at"]), slates["built_at"]
+    )
+    not_modified = validators.not_modified()
+    if not_modified is not None:
+        return not_modified
 
-    featured_items = Item.objects.all().order_by("-created_at")[:6]
+    return validators.apply(render(request, "core/home.html", {"shelves": _shelves(slates)}))
 
-    context = {
-        "cart_count": cart_count,
-        "featured_items": featured_items,
-    }
-    return render(request, "core/home.html", context)
 
+def _shelves(slates):
+    return [
+        ("Featured Drops", slates["featured"], ""),
+        ("Most Wished", slates["popular"], "popular"),
+        ("Best Sellers", slates["bestsellers"], "bestsellers"),
+    ]
 
-def catalogue(request):
+
+# ?sort= values of the catalogue (newest first without one), each backed
+# by an index; search results keep their relevance order
+CATALOGUE_SORTS = {
+    'popular': ('-wishlist_count', '-id'),
+    'bestsellers': ('-units_sold', '-id'),
+}
+
+
+def _catalogue_filters(params):
     """
-    Store catalogue page (filters + items grid).
-    This is basically your old home() catalogue logic.
+    Read and clean the catalogue filters from a GET QueryDict.
     """
-    query = request.GET.get('q', '').strip()
-    category_slug = request.GET.get('category', '').strip()
-    subcategory_slug = request.GET.get('subcategory', '').strip()
-    rarity = request.GET.get('rarity', '').strip()
-    min_price = request.GET.get('min_price', '').strip()
-    max_price = request.GET.get('max_price', '').strip()
+    query = params.get('q', '').strip()
+    # hard cap to prevent huge inputs
+    if len(query) > 60:
+        query = query[:60]
+    sort = params.get('sort', '').strip()
 
-    items = Item.objects.all().order_by('-created_at')
+    return {
+        'query': query,
+        'category': params.get('category', '').strip(),
+        'subcategory': params.get('subcategory', '').strip(),
+        'rarity': params.get('rarity', '').strip(),
+        'min_price': params.get('min_price', '').strip(),
+        'max_price': params.get('max_price', '').strip(),
+        'sort': sort if sort in CATALOGUE_SORTS else '',
+    }
 
-    # Search
-    if query:
-        # hard cap to prevent huge inputs
-        if len(query) > 60:
-            query = query[:60]
-
-        items = items.filter(
-            Q(label__icontains=query) |
-            Q(description__icontains=query) |
-            Q(element__icontains=query) |
-            Q(reality_fragment__icontains=query) |
-            Q(category__label__icontains=query) |
-            Q(subcategory__label__icontains=query)
-        )
+
+def _filtered_items(filters, ranked=True):
+    """
+    Apply the catalogue filters and return (items, ordering).
+    Search results are ordered by relevance, everything else by the
+    chosen sort (newest first by default). With ranked=False a search
+    keeps every match instead of the best max_results() (for counts).
+    """
+    items = Item.objects.all()
 
     # Category filter
-    if category_slug:
-        items = items.filter(category__url_name=category_slug)
+    if filters['category']:
+        items = items.filter(category__url_name=filters['category'])
 
     # Subcategory filter
-    if subcategory_slug:
-        items = items.filter(subcategory__url_name=subcategory_slug)
+    if filters['subcategory']:
+        items = items.filter(subcategory__url_name=filters['subcategory'])
 
     # Rarity filter
-    if rarity:
-        items = items.filter(rarity=rarity)
+    if filters['rarity']:
+        items = items.filter(rarity=filters['rarity'])
 
     # Price range
+    min_price = filters['min_price']
+    max_price = filters['max_price']
     if min_price:
         if len(min_price) <= 6:
             try:
@@ -102,40 +135,270 @@ def catalogue(request):
             except ValueError:
                 pass
 
-    categories = Category.objects.all().order_by('label')
-    subcategories = SubCategory.objects.all().order_by('label')
+    # Search (ranked, best match first)
+    if filters['query']:
+        if not ranked:
+            return matching_items(items, filters['query']), None
+        items = search_items(items, filters['query'])
+        if 'search_rank' in items.query.annotations:
+            return items, ('search_rank', 'id')
+
+    return items, CATALOGUE_SORTS.get(filters['sort'], ('-created_at', '-id'))
+
+
+def _page_size(params):
+    page_size = getattr(settings, "CATALOGUE_PAGE_SIZE", 24)
+    max_page_size = getattr(settings, "CATALOGUE_MAX_PAGE_SIZE", 96)
+    try:
+        page_size = int(params.get('page_size', page_size))
+    except ValueError:
+        pass
+    return max(1, min(page_size, max_page_size))
+
+
+def _catalogue_page(request):
+    """
+    Return (page, filters) for the current request.
+    The page holds item ids only; it is cached per catalogue version
+    (page.computed_at tells when it was worked out).
+    """
+    filters, cursor, page_size = _page_request(request)
+    cached = catalogue_cache.get_or_set(
+        'page', (sorted(filters.items()), cursor, page_size),
+        lambda: _compute_page(filters, cursor, page_size),
+    )
+    return _keyset_page(cached), filters
+
+
+def _page_request(request):
+    """(filters, cursor, page_size) of a catalogue request."""
+    return _catalogue_filters(request.GET), request.GET.get('cursor', ''), _page_size(request.GET)
+
+
+def _compute_page(filters, cursor, page_size):
+    items, ordering = _filtered_items(filters)
+    page = paginate_keyset(
+        # the cursor reads the sort key from these
+        items.only('id', 'created_at', 'wishlist_count', 'units_sold'),
+        ordering,
+        cursor=cursor,
+        page_size=page_size,
+    )
+    return {
+        'ids': [item.id for item in page],
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+        'computed_at': time.time(),
+    }
+
+
+def _keyset_page(cached):
+    page = KeysetPage(cached['ids'], cached['next_cursor'], cached['prev_cursor'])
+    page.computed_at = cached.get('computed_at', time.time())
+    return page
+
+
+def _catalogue_validators(request, page, per_visitor=True):
+    """
+    ETag/Last-Modified of a catalogue page: the catalogue version covers
+    the cards and facets, the ids the page itself (popularity sorts can
+    change without a new version).
+    """
+    return conditional.Validators(
+        request,
+        _catalogue_parts(request, page, catalogue_cache.get_version()),
+        max(catalogue_cache.changed_at(), page.computed_at),
+        per_visitor=per_visitor,
+    )
+
+
+def _catalogue_parts(request, page, version):
+    return (request.path, version, sorted(request.GET.lists()),
+            page.object_list, page.next_cursor, page.prev_cursor)
 
-    # which items this user has wishlisted
+
+def _load_items(ids):
+    return Item.objects.select_related('category', 'subcategory').filter(id__in=ids)
+
+
+def _load_card_items(ids):
+    # cards also need the thumbnails for their <picture>
+    return thumbnails.attach(list(_load_items(ids)))
+
+
+def _catalogue_sidebar(filters):
+    """
+    Categories and subcategories annotated with facet counts (cached).
+    """
+    version = catalogue_cache.get_version()
+    counts = catalogue_cache.get_or_set(
+        'facets', (sorted(filters.items()),), lambda: _compute_counts(filters), version=version
+    )
+    categories, subcategories = catalogue_cache.get_or_set(
+        'sidebar', (), _compute_sidebar, version=version
+    )
+    return _count_sidebar(categories, subcategories, counts)
+
+
+def _compute_counts(filters):
+    return catalogue_counts(lambda selected: _filtered_items(selected, ranked=False)[0], filters)
+
+
+def _search_limit(filters, counts):
+    """How many matches a search page can reach, when there are more."""
+    if filters['query'] and counts['total'] > max_results():
+        return max_results()
+    return None
+
+
+def _compute_sidebar():
+    return (
+        list(Category.objects.all().order_by('label')),
+        list(SubCategory.objects.select_related('category').order_by('label')),
+    )
+
+
+def _count_sidebar(categories, subcategories, counts):
+    for cat in categories:
+        cat.facet_count = counts['categories'][cat.id]
+    for sub in subcategories:
+        sub.facet_count = counts['subcategories'][sub.id]
+    return categories, subcategories, counts
+
+
+def _mark_cards(request, cards):
+    """
+    Set the per-user button state (in_cart, cart_qty, wishlisted) on
+    cards (or items).
+    """
+    # which of these the user has wishlisted
     wishlist_ids = set()
-    if request.user.is_authenticated:
-        wishlist_ids = set(
-            WishlistItem.objects.filter(user=request.user)
-            .values_list("item_id", flat=True)
-        )
+    if request.user.is_authenticated and cards:
+        wishlist_ids = set(_wishlisted(request.user, cards))
+
+    # Cart info so buttons can reflect current state even after reload
+    return _set_card_state(cards, get_cart(request), wishlist_ids)
+
+
+def _wishlisted(user, cards):
+    return WishlistItem.objects.filter(
+        user=user, item_id__in=[card.id for card in cards]
+    ).values_list("item_id", flat=True)
+
+
+def _set_card_state(cards, cart, wishlist_ids):
+    for card in cards:
+        qty = cart.quantity(card.id)
+        card.in_cart = qty > 0
+        card.cart_qty = qty
+        card.wishlisted = card.id in wishlist_ids
+    return cards
+
+
+def catalogue(request):
+    """
+    Store catalogue page (filters + items grid), one page at a time.
 
-    # Cart info so buttons & badge can reflect current state even after reload
-    cart = _get_cart(request.session)
-    cart_count = sum(cart.values())
+    The grid is built from cached, pre-rendered item cards; only the
+    per-user buttons (cart / wishlist state) are rendered per request.
+    """
+    page, filters = _catalogue_page(request)
+    validators = _catalogue_validators(request, page)
+    not_modified = validators.not_modified()
+    if not_modified is not None:
+        return not_modified
 
-    for item in items:
-        qty = cart.get(str(item.id), 0)
-        item.in_cart = qty > 0
-        item.cart_qty = qty
+    categories, subcategories, counts = _catalogue_sidebar(filters)
+    cards = _mark_cards(request, catalogue_cache.render_cards(page.object_list, _load_card_items))
 
     context = {
-        'items': items,
+        'cards': cards,
+        'page': page,
         'categories': categories,
         'subcategories': subcategories,
-        'selected_category': category_slug,
-        'selected_subcategory': subcategory_slug,
-        'selected_rarity': rarity,
-        'query': query,
-        'min_price': min_price,
-        'max_price': max_price,
-        'wishlist_ids': wishlist_ids,
-        'cart_count': cart_count,
+        'rarity_facets': rarity_facets(counts),
+        'price_facets': price_facets(counts),
+        'result_count': counts['total'],
+        'search_limit': _search_limit(filters, counts),
+        'selected_category': filters['category'],
+        'selected_subcategory': filters['subcategory'],
+        'selected_rarity': filters['rarity'],
+        'query': filters['query'],
+        'min_price': filters['min_price'],
+        'max_price': filters['max_price'],
+        'sort': filters['sort'],
+    }
+    return validators.apply(render(request, 'core/catalogue.html', context))
+
+
+def item_detail(request, item_id):
+    """
+    One item with a "related items" panel.
+
+    The related items are precomputed (core.related) and cached per
+    catalogue version; their cards are the catalogue's cached cards.
+    """
+    item = get_object_or_404(Item.objects.select_related('category', 'subcategory'), pk=item_id)
+    related_ids = catalogue_cache.get_or_set(
+        'related', (item.id,), lambda: related.related_ids(item)
+    )
+    validators = conditional.Validators(
+        request,
+        ("item", item.id, item.updated_at, catalogue_cache.get_version(), related_ids),
+        catalogue_cache.changed_at(),
+    )
+    not_modified = validators.not_modified()
+    if not_modified is not None:
+        return not_modified
+
+    thumbnails.attach([item])
+    cards = catalogue_cache.render_cards(related_ids, _load_card_items)
+    # the item's own buttons and the cards' in one go
+    _mark_cards(request, [item] + cards)
+
+    context = {
+        'item': item,
+        'cards': cards,
+    }
+    return validators.apply(render(request, 'core/item_detail.html', context))
+
+
+def catalogue_json(request):
+    """
+    Same pages as catalogue(), as JSON (for infinite scroll / API use).
+    """
+    page, filters = _catalogue_page(request)
+    # the same for everybody
+    validators = _catalogue_validators(request, page, per_visitor=False)
+    not_modified = validators.not_modified()
+    if not_modified is not None:
+        return not_modified
+
+    items = _load_items(page.object_list).in_bulk()
+    return validators.apply(JsonResponse(_catalogue_data(page, items)))
+
+
+def _catalogue_data(page, items):
+    return {
+        "items": [
+            {
+                "id": item.id,
+                "label": item.label,
+                "description": item.description,
+                "price": str(item.price),
+                "rarity": item.rarity,
+                "element": item.element,
+                "reality_fragment": item.reality_fragment,
+                "category": item.category.url_name,
+                "subcategory": item.subcategory.url_name,
+                "image_url": static(item.image_url) if item.image_url else None,
+                "updated_at": item.updated_at,
+            }
+            for item in (items[i] for i in page.object_list if i in items)
+        ],
+        "next_cursor": page.next_cursor,
+        "prev_cursor": page.prev_cursor,
     }
-    return render(request, 'core/catalogue.html', context)
 
 
 
@@ -143,17 +406,48 @@ def catalogue(request):
 
 @login_required
 def toggle_wishlist(request, item_id):
-    """Add or remove an item from the logged-in user's wishlist."""
-    item = get_object_or_404(Item, pk=item_id)
-    existing = WishlistItem.objects.filter(user=request.user, item=item)
+    """
+    Add or remove an item from the logged-in user's wishlist.
 
-    if existing.exists():
-        existing.delete()
-        messages.info(request, f"{item.label} removed from your wishlist.")
+    The form sends the wanted ``state`` ("on"/"off") so a double click
+    can't flip it back; without it the item is toggled. Removing is a
+    single DELETE, adding a single INSERT (a duplicate from a racing
+    request is ignored); the item's wishlist_count follows with F().
+    """
+    if request.method != "POST":
+        return redirect("catalogue")
+
+    wanted = request.POST.get("state")
+    removed = 0
+    if wanted != "on":
+        removed, _ = WishlistItem.objects.filter(user=request.user, item_id=item_id).delete()
+        if removed:
+            popularity.wishlist_removed(item_id, removed)
+
+    label = None
+    if removed or wanted == "off":
+        wishlisted = False
     else:
-        WishlistItem.objects.create(user=request.user, item=item)
-        messages.success(request, f"{item.label} added to your wishlist.")
+        label = Item.objects.filter(pk=item_id).values_list("label", flat=True).first()
+        if label is None:
+            raise Http404("No such item.")
+        try:
+            with transaction.atomic():
+                WishlistItem.objects.create(user=request.user, item_id=item_id)
+                popularity.wishlist_added(item_id)
+        except IntegrityError:
+            pass  # already wishlisted
+        wishlisted = True
 
+    if request.headers.get("X-Requested-With") == "XMLHttpRequest":
+        return JsonResponse({"item_id": item_id, "wishlisted": wishlisted})
+
+    if label is None:
+        label = Item.objects.filter(pk=item_id).values_list("label", flat=True).first() or "Item"
+    if wishlisted:
+        messages.success(request, f"{label} added to your wishlist.")
+    else:
+        messages.info(request, f"{label} removed from your wishlist.")
     return redirect(request.META.get("HTTP_REFERER", "catalogue"))
 
 
@@ -168,19 +462,38 @@ def add_to_cart(request, item_id):
 
     # Validate item
     item = get_object_or_404(Item, pk=item_id)
-
-    cart = _get_cart(request.session)
-    key = str(item_id)
-    cart[key] = cart.get(key, 0) + 1
-    _save_cart(request.session, cart)
-
-    messages.success(request, f"{item.label} was added to your cart.")
+    # AJAX adds update the button and badge in place: no flash messages,
+    # they would only pile up for the next full page
+    ajax = request.headers.get("X-Requested-With") == "XMLHttpRequest"
+
+    # limited items: refuse sold out ones, hold a unit while in the cart
+    try:
+        if item.stock is not None:
+            if stock.reservation_minutes():
+                stock.reserve(get_cart(request).holder, item)
+            elif item.stock == 0:
+                raise stock.OutOfStock([item])
+    except stock.OutOfStock:
+        if ajax:
+            return JsonResponse({"error": "sold_out"}, status=409)
+        messages.error(request, f"{item.label} is sold out.")
+        return redirect(request.META.get("HTTP_REFERER", 'catalogue'))
+
+    cart = get_cart(request)
+    if not cart.add(item.id):
+        # CART_MAX_LINES different items already: hand the held unit back
+        _release_stock(cart, item.id, 1)
+        if ajax:
+            return JsonResponse({"error": "cart_full"}, status=409)
+        messages.error(request, f"Your cart is full, {item.label} was not added.")
+        return redirect(request.META.get("HTTP_REFERER", 'catalogue'))
 
     # If it's an AJAX request, so JS can update UI without reload
-    if request.headers.get("X-Requested-With") == "XMLHttpRequest":
+    if ajax:
         from django.http import HttpResponse
         return HttpResponse(status=204)
 
+    messages.success(request, f"{item.label} was added to your cart.")
     return redirect(request.META.get("HTTP_REFERER", 'catalogue'))
 
 
@@ -188,43 +501,44 @@ def view_cart(request):
     """
     Show current cart contents.
     """
-    cart = _get_cart(request.session)
-    cart_count = sum(cart.values())
-
-    if not cart:
-        context = {
-            "cart_items": [],
-            "cart_total": Decimal("0.00"),
-            "cart_count": cart_count,
-        }
-        return render(request, "core/cart.html", context)
-
-    item_ids = [int(k) for k in cart.keys()]
-    items = Item.objects.filter(id__in=item_ids)
-
-    cart_items = []
-    total = Decimal("0.00")
-
-    for item in items:
-        quantity = cart.get(str(item.id), 0)
-        if quantity <= 0:
-            continue
-        line_total = item.price * quantity
-        total += line_total
-        cart_items.append(
+    cart = get_cart(request)
+    return render(request, "core/cart.html", _cart_context(cart.priced()))
+
+
+def _cart_context(priced):
+    return {
+        "cart_items": priced.lines,
+        "cart_total": priced.total,
+        "checkout_key": uuid.uuid4().hex,
+    }
+
+
+def cart_json(request):
+    """
+    The cart as JSON: unit count (for the navbar badge) and priced lines.
+    ?lines=0 returns just the count, which needs no query.
+    """
+    cart = get_cart(request)
+    if request.GET.get("lines") == "0":
+        return JsonResponse({"count": cart.count})
+    return JsonResponse(_cart_data(cart.count, cart.priced()))
+
+
+def _cart_data(count, priced):
+    return {
+        "count": count,
+        "lines": [
             {
-                "item": item,
-                "quantity": quantity,
-                "line_total": line_total,
+                "id": line["item"].id,
+                "label": line["item"].label,
+                "quantity": line["quantity"],
+                "price": str(line["item"].price),
+                "line_total": str(line["line_total"]),
             }
-        )
-
-    context = {
-        "cart_items": cart_items,
-        "cart_total": total,
-        "cart_count": cart_count,
+            for line in priced.lines
+        ],
+        "total": str(priced.total),
     }
-    return render(request, "core/cart.html", context)
 
 
 def remove_from_cart(request, item_id):
@@ -234,9 +548,9 @@ def remove_from_cart(request, item_id):
     if request.method != "POST":
         return redirect('view_cart')
 
-    cart = _get_cart(request.session)
-    cart.pop(str(item_id), None)
-    _save_cart(request.session, cart)
+    cart = get_cart(request)
+    cart.remove(item_id)
+    _release_stock(cart, item_id)
     return redirect('view_cart')
 
 
@@ -247,7 +561,9 @@ def clear_cart(request):
     if request.method != "POST":
         return redirect('view_cart')
 
-    _save_cart(request.session, {})
+    cart = get_cart(request)
+    cart.clear()
+    _release_stock(cart)
     return redirect('view_cart')
 
 
@@ -259,16 +575,9 @@ def decrement_cart_item(request, item_id):
     if request.method != "POST":
         return redirect('view_cart')
 
-    cart = _get_cart(request.session)
-    key = str(item_id)
-    qty = cart.get(key, 0)
-
-    if qty > 1:
-        cart[key] = qty - 1
-    elif qty == 1:
-        cart.pop(key, None)
-
-    _save_cart(request.session, cart)
+    cart = get_cart(request)
+    if cart.decrement(item_id):
+        _release_stock(cart, item_id, quantity=1)
     return redirect('view_cart')
 
 
@@ -277,81 +586,70 @@ def checkout(request):
     """
     Convert the current cart into an Order + OrderItems.
     """
-    cart = _get_cart(request.session)
-    if not cart:
-        messages.info(request, "Your cart is empty.")
-        return redirect('view_cart')
-
+    cart = get_cart(request)
     if request.method != "POST":
+        if not cart:
+            messages.info(request, "Your cart is empty.")
         return redirect('view_cart')
 
-    item_ids = [int(k) for k in cart.keys()]
-    items = Item.objects.filter(id__in=item_ids)
-
-    if not items:
+    try:
+        order, created = place_order(
+            request.user,
+            cart.lines,
+            request.POST.get("idempotency_key"),
+            holder=cart.holder,
+        )
+    except EmptyCart:
         messages.info(request, "Your cart is empty.")
         return redirect('view_cart')
+    except stock.OutOfStock as exc:
+        labels = ", ".join(item.label for item in exc.items)
+        messages.error(request, f"Sorry, not enough stock left for: {labels}.")
+        return redirect('view_cart')
 
-    total = Decimal("0.00")
-    order = Order.objects.create(
-        user=request.user,
-        status="completed",
-        total_price=Decimal("0.00"),
-    )
-
-    for item in items:
-        quantity = cart.get(str(item.id), 0)
-        if quantity <= 0:
-            continue
-
-        line_total = item.price * quantity
-        total += line_total
-
-        OrderItem.objects.create(
-            order=order,
-            item=item,
-            quantity=quantity,
-            price_at_purchase=item.price,
-        )
+    if created:
+        cart.clear()
 
-    order.total_price = total
-    order.save()
+    context = {
+        "order": order,
+        "order_items": order.items.select_related("item"),
+    }
+    return render(request, "core/checkout_success.html", context)
 
-    _save_cart(request.session, {})
 
-    return render(request, "core/checkout_success.html", {"order": order})
+# Site management views (Owner/Employee)
 
+ADMIN_ITEM_SORTS = ("id", "label", "price", "created_at")
+ADMIN_USER_SORTS = ("id", "username", "email", "date_joined")
 
-# Roles
 
-def role_required(*roles):
+def _admin_list(request, queryset, sorts, search_fields):
     """
-    @role_required("Owner") -> only Owner (and superuser)
-    @role_required("Owner", "Employee") -> Owner + Employee (and superuser)
+    One keyset page of a management list, sorted by ?sort= (a field from
+    ``sorts``, "-" for descending) and filtered by ?q= over search_fields.
+    Returns (page, context for the list template).
     """
-    def decorator(view_func):
-        @wraps(view_func)
-        @login_required
-        def _wrapped(request, *args, **kwargs):
-            user = request.user
-
-            if user.is_superuser:
-                return view_func(request, *args, **kwargs)
-
-            if not user.is_staff:
-                return HttpResponseForbidden("Admins only.")
-
-            user_roles = set(user.groups.values_list("name", flat=True))
-            if any(r in user_roles for r in roles):
-                return view_func(request, *args, **kwargs)
-
-            return HttpResponseForbidden("Insufficient role.")
-        return _wrapped
-    return decorator
+    query = request.GET.get("q", "").strip()
+    if query:
+        condition = Q()
+        for field in search_fields:
+            condition |= Q(**{f"{field}__icontains": query})
+        queryset = queryset.filter(condition)
+
+    sort = request.GET.get("sort", "id")
+    if sort.lstrip("-") not in sorts:
+        sort = "id"
+    ordering = [sort] if sort.lstrip("-") == "id" else [sort, "id"]
+
+    page = paginate_keyset(
+        queryset,
+        ordering,
+        cursor=request.GET.get("cursor", ""),
+        page_size=getattr(settings, "ADMIN_PAGE_SIZE", 50),
+    )
+    return page, {"page": page, "sort": sort, "query": query}
 
 
-# Site management views (Owner/Employee)
-
 @role_required("Owner", "Employee")
 def admin_panel(request):
     return render(request, "admin/panel.html")
@@ -360,8 +658,20 @@ def admin_panel(request):
 # items (Owner + Employee)
 @role_required("Owner", "Employee")
 def admin_items_list(request):
-    items = Item.objects.all().order_by("id")
-    return render(request, "admin/items_list.html", {"items": items})
+    subcategories = SubCategory.objects.select_related("category").order_by("category__label", "label")
+    items = (
+        Item.objects.select_related("category", "subcategory__category")
+        .only(
+            "id", "label", "price", "stock", "created_at",
+            "category__label",
+            "subcategory__label", "subcategory__category__label",
+        )
+    )
+    page, context = _admin_list(request, items, ADMIN_ITEM_SORTS, ("label",))
+    context["items"] = page.object_list
+    context["subcategories"] = subcategories
+    context["rarities"] = RARITY_CHOICES
+    return render(request, "admin/items_list.html", context)
 
 @role_required("Owner", "Employee")
 def admin_item_create(request):
@@ -371,6 +681,82 @@ def admin_item_create(request):
         return redirect("admin_items_list")
     return render(request, "admin/item_form.html", {"form": form, "mode": "create"})
 
+def _bulk_value(request):
+    value = Decimal(request.POST.get("value", "").strip())
+    if not value.is_finite() or abs(value) >= 10000:
+        raise ValueError(value)
+    return value
+
+@role_required("Owner", "Employee")
+def admin_items_bulk(request):
+    """
+    Apply one action to the items ticked on the items list.
+    Each action is a single UPDATE/DELETE (see core.services).
+    """
+    back = request.POST.get("next", "")
+    if not url_has_allowed_host_and_scheme(back, allowed_hosts={request.get_host()}):
+        back = reverse("admin_items_list")
+    if request.method != "POST":
+        return redirect(back)
+
+    ids = [int(i) for i in request.POST.getlist("ids") if i.isdigit()]
+    action = request.POST.get("action", "")
+    if not ids:
+        messages.error(request, "Select at least one product.")
+        return redirect(back)
+
+    try:
+        if action == "price_percent":
+            changed = bulk_adjust_price(ids, percent=_bulk_value(request))
+        elif action == "price_amount":
+            changed = bulk_adjust_price(ids, amount=_bulk_value(request))
+        elif action == "rarity":
+            changed = bulk_set_rarity(ids, request.POST.get("rarity", ""))
+        elif action == "move":
+            subcategory = get_object_or_404(SubCategory, id=request.POST.get("subcategory") or 0)
+            changed = bulk_move(ids, subcategory)
+        elif action == "delete":
+            deleted, kept = bulk_delete(ids)
+            messages.success(request, f"{deleted} product(s) deleted.")
+            if kept:
+                messages.warning(request, f"{kept} ordered product(s) were kept for the order history.")
+            return redirect(back)
+        else:
+            messages.error(request, "Unknown action.")
+            return redirect(back)
+    except (InvalidOperation, ValueError):
+        messages.error(request, "Enter a valid value for this action.")
+        return redirect(back)
+
+    messages.success(request, f"{changed} product(s) updated.")
+    return redirect(back)
+
+@role_required("Owner", "Employee")
+def admin_items_import(request):
+    context = {}
+    upload = request.FILES.get("file")
+    if request.method == "POST" and upload:
+        fmt = item_io.guess_format(upload.name)
+        # large uploads are on disk; read them line by line
+        lines = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+        context["dry_run"] = bool(request.POST.get("dry_run"))
+        context["result"] = item_io.import_items(
+            item_io.read_rows(lines, fmt), dry_run=context["dry_run"]
+        )
+    return render(request, "admin/items_import.html", context)
+
+@role_required("Owner", "Employee")
+def admin_items_export(request):
+    fmt = request.GET.get("format", "csv")
+    if fmt not in item_io.FORMATS:
+        fmt = "csv"
+    content_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    response = StreamingHttpResponse(
+        item_io.export_lines(fmt), content_type=f"{content_type}; charset=utf-8"
+    )
+    response["Content-Disposition"] = f'attachment; filename="mirage-items.{fmt}"'
+    return response
+
 @role_required("Owner", "Employee")
 def admin_item_edit(request, item_id):
     item = get_object_or_404(Item, id=item_id)
@@ -421,11 +807,34 @@ def admin_category_delete(request, category_id):
     return render(request, "admin/confirm_delete.html", {"object": category, "type": "Category"})
 
 
+# performance numbers
+@role_required("Owner")
+def admin_perf(request):
+    if request.method == "POST" and "reset" in request.POST:
+        perf.recorder.reset()
+        return redirect("admin_perf")
+    context = {
+        "rows": perf.recorder.report(),
+        "window_minutes": perf.window_minutes(),
+        "sample_rate": perf.sample_rate(),
+        "enabled": perf.enabled(),
+    }
+    return render(request, "admin/perf.html", context)
+
+
 # users/employees 
 @role_required("Owner")
 def admin_users_list(request):
-    users = User.objects.all().order_by("id")
-    return render(request, "admin/users_list.html", {"users": users})
+    users = User.objects.only(
+        "id", "username", "email", "first_name", "last_name",
+        "is_active", "is_staff", "is_superuser", "date_joined",
+    )
+    page, context = _admin_list(
+        request, users, ADMIN_USER_SORTS,
+        ("username", "email", "first_name", "last_name"),
+    )
+    context["users"] = page.object_list
+    return render(request, "admin/users_list.html", context)
 
 @role_required("Owner")
 def admin_user_edit(request, user_id):
@@ -0,0 +1,197 @@
+"""
+Async versions of the read-heavy pages, served by the ASGI profile
+(settings.ASYNC_VIEWS, mirage_project.urls_asgi).
+
+Under gunicorn's sync workers every request holds a worker until the
+client has its response; in an event loop a slow client only holds a
+coroutine. These views give the same responses as their counterparts in
+core.views (and share their helpers) but never block the loop:
+
+- the user and session are loaded with request.auser(), so the templates
+  (user, flash messages) read them without a query;
+- cache reads go through the async cache API;
+- queries use the async ORM (async iteration, aget, ain_bulk);
+- cache misses that need the catalogue queries run those in a thread.
+"""
+from asgiref.sync import sync_to_async
+from django.http import Http404, JsonResponse
+from django.shortcuts import render
+
+from . import catalogue_cache, conditional, featured, related, thumbnails, views
+from .cart import get_cart
+from .facets import price_facets, rarity_facets
+from .models import Item
+
+
+async def _load_request(request):
+    # the session is loaded along with the user
+    request.user = await request.auser()
+
+
+async def _render(request, template, context):
+    # the navbar badge reads the cart count while rendering
+    await get_cart(request).acount()
+    return render(request, template, context)
+
+
+# Public pages
+
+async def home(request):
+    """Async views.home()."""
+    await _load_request(request)
+    slates = await featured.aget_slates()
+    validators = await conditional.Validators.acreate(
+        request, ("home", slates["strategy"], slates["built_at"]), slates["built_at"]
+    )
+    not_modified = validators.not_modified()
+    if not_modified is not None:
+        return not_modified
+
+    response = await _render(request, "core/home.html", {"shelves": views._shelves(slates)})
+    return validators.apply(response)
+
+
+# every cache call is a round trip here, so the catalogue version is
+# read once per request and passed along
+
+async def _catalogue_page(request, version):
+    filters, cursor, page_size = views._page_request(request)
+    cached = await catalogue_cache.aget_or_set(
+        'page', (sorted(filters.items()), cursor, page_size),
+        sync_to_async(lambda: views._compute_page(filters, cursor, page_size)),
+        version=version,
+    )
+    return views._keyset_page(cached), filters
+
+
+async def _catalogue_validators(request, page, version, per_visitor=True):
+    return await conditional.Validators.acreate(
+        request,
+        views._catalogue_parts(request, page, version),
+        max(await catalogue_cache.achanged_at(), page.computed_at),
+        per_visitor=per_visitor,
+    )
+
+
+async def _catalogue_sidebar(filters, version):
+    counts = await catalogue_cache.aget_or_set(
+        'facets', (sorted(filters.items()),),
+        sync_to_async(lambda: views._compute_counts(filters)), version=version,
+    )
+    categories, subcategories = await catalogue_cache.aget_or_set(
+        'sidebar', (), sync_to_async(views._compute_sidebar), version=version
+    )
+    return views._count_sidebar(categories, subcategories, counts)
+
+
+async def _load_card_items(ids):
+    return await thumbnails.aattach([item async for item in views._load_items(ids)])
+
+
+async def _mark_cards(request, cards):
+    wishlist_ids = set()
+    if request.user.is_authenticated and cards:
+        wishlist_ids = {item_id async for item_id in views._wishlisted(request.user, cards)}
+    cart = get_cart(request)
+    await cart.alines()
+    return views._set_card_state(cards, cart, wishlist_ids)
+
+
+async def catalogue(request):
+    """Async views.catalogue()."""
+    await _load_request(request)
+    version = await catalogue_cache.aget_version()
+    page, filters = await _catalogue_page(request, version)
+    validators = await _catalogue_validators(request, page, version)
+    not_modified = validators.not_modified()
+    if not_modified is not None:
+        return not_modified
+
+    categories, subcategories, counts = await _catalogue_sidebar(filters, version)
+    cards = await _mark_cards(
+        request,
+        await catalogue_cache.arender_cards(page.object_list, _load_card_items, version=version),
+    )
+
+    context = {
+        'cards': cards,
+        'page': page,
+        'categories': categories,
+        'subcategories': subcategories,
+        'rarity_facets': rarity_facets(counts),
+        'price_facets': price_facets(counts),
+        'result_count': counts['total'],
+        'search_limit': views._search_limit(filters, counts),
+        'selected_category': filters['category'],
+        'selected_subcategory': filters['subcategory'],
+        'selected_rarity': filters['rarity'],
+        'query': filters['query'],
+        'min_price': filters['min_price'],
+        'max_price': filters['max_price'],
+        'sort': filters['sort'],
+    }
+    return validators.apply(await _render(request, 'core/catalogue.html', context))
+
+
+async def item_detail(request, item_id):
+    """Async views.item_detail()."""
+    await _load_request(request)
+    try:
+        item = await Item.objects.select_related('category', 'subcategory').aget(pk=item_id)
+    except Item.DoesNotExist:
+        raise Http404("No such item.")
+    version = await catalogue_cache.aget_version()
+    related_ids = await catalogue_cache.aget_or_set(
+        'related', (item.id,), sync_to_async(lambda: related.related_ids(item)), version=version
+    )
+    validators = await conditional.Validators.acreate(
+        request,
+        ("item", item.id, item.updated_at, version, related_ids),
+        await catalogue_cache.achanged_at(),
+    )
+    not_modified = validators.not_modified()
+    if not_modified is not None:
+        return not_modified
+
+    await thumbnails.aattach([item])
+    cards = await catalogue_cache.arender_cards(related_ids, _load_card_items, version=version)
+    await _mark_cards(request, [item] + cards)
+
+    context = {
+        'item': item,
+        'cards': cards,
+    }
+    return validators.apply(await _render(request, 'core/item_detail.html', context))
+
+
+async def catalogue_json(request):
+    """Async views.catalogue_json()."""
+    await _load_request(request)
+    version = await catalogue_cache.aget_version()
+    page, _filters = await _catalogue_page(request, version)
+    validators = await _catalogue_validators(request, page, version, per_visitor=False)
+    not_modified = validators.not_modified()
+    if not_modified is not None:
+        return not_modified
+
+    items = await views._load_items(page.object_list).ain_bulk()
+    return validators.apply(JsonResponse(views._catalogue_data(page, items)))
+
+
+# Cart
+
+async def view_cart(request):
+    """Async views.view_cart()."""
+    await _load_request(request)
+    priced = await get_cart(request).apriced()
+    return await _render(request, "core/cart.html", views._cart_context(priced))
+
+
+async def cart_json(request):
+    """Async views.cart_json()."""
+    await _load_request(request)
+    cart = get_cart(request)
+    if request.GET.get("lines") == "0":
+        return JsonResponse({"count": await cart.acount()})
+    return JsonResponse(views._cart_data(await cart.acount(), await cart.apriced()))
+
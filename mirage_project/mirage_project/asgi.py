@@ -3,6 +3,11 @@ ASGI config for mirage_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Run with gunicorn's uvicorn workers (or plain uvicorn), same worker count
+as the WSGI setup:
+
+    gunicorn mirage_project.asgi:application -k uvicorn_worker.UvicornWorker -w 4
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -12,5 +17,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mirage_project.settings')
+# async versions of the read-only pages (see settings.ASYNC_VIEWS)
+os.environ.setdefault('ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
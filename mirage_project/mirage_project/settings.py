@@ -40,21 +40,28 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.perf.PerfMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'core.middleware.StaticFilesMiddleware',  # WhiteNoise, async capable
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.CartMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'mirage_project.urls'
+# The ASGI profile (asgi.py) serves the read-only pages with their async
+# versions (core.views_async, routed by mirage_project.urls_asgi).
+ASYNC_VIEWS = os.environ.get("ASYNC_VIEWS", "False") == "True"
+
+ROOT_URLCONF = 'mirage_project.urls_asgi' if ASYNC_VIEWS else 'mirage_project.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that also reports render time to core.perf
+        'BACKEND': 'core.perf.InstrumentedTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -62,6 +69,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.context_processors.cart',
             ],
         },
     },
@@ -76,6 +84,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # wait for the write lock instead of failing under concurrent
+        # checkouts, and take it up front so transactions can't deadlock
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
@@ -103,6 +117,18 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# collectstatic gives every file a content hashed name and writes .gz/.br
+# copies (brotli needs the Brotli package); WhiteNoise serves the hashed
+# names with a year-long immutable Cache-Control. build.sh runs
+# build_assets first so the CSS/JS bundles are collected too.
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "core.storage.StaticFilesStorage"},
+}
+
+# link the built bundles (core.assets) instead of the source CSS/JS files
+ASSET_BUNDLES = not DEBUG
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -111,3 +137,69 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGIN_URL = "login"
 LOGIN_REDIRECT_URL = "home"
 LOGOUT_REDIRECT_URL = "home"
+
+# Catalogue
+CATALOGUE_PAGE_SIZE = 24
+CATALOGUE_MAX_PAGE_SIZE = 96
+SEARCH_MAX_RESULTS = 500
+CATALOGUE_CACHE_TIMEOUT = 600
+
+# Home page shelves (core.featured)
+# "newest", "curated" (items ticked as featured), "rarity" (weighted
+# random draw, rotates on every refresh) or "popular"
+FEATURED_STRATEGY = os.environ.get("FEATURED_STRATEGY", "newest")
+FEATURED_COUNT = 3
+# items the "rarity" draw picks from (the newest ones)
+FEATURED_POOL = 48
+# seconds before the shelves are rebuilt (in the background)
+FEATURED_TIMEOUT = 15 * 60
+FEATURED_REFRESH_IN_BACKGROUND = True
+
+# Item image thumbnails (core.thumbnails, needs Pillow)
+# written to core/static/images/thumbs/ by 'manage.py generate_thumbnails'
+THUMBNAIL_WIDTHS = (160, 320, 640)
+THUMBNAIL_FORMATS = ("avif", "webp")  # best first; unsupported ones are skipped
+THUMBNAIL_QUALITY = 80
+# also generate (in the background) when an item is saved
+THUMBNAILS_ON_SAVE = True
+
+# Cache
+# LocMemCache by default; point CACHE_BACKEND/CACHE_LOCATION at e.g.
+# django.core.cache.backends.filebased.FileBasedCache and a directory to
+# share the catalogue cache between worker processes.
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", "mirage"),
+    }
+}
+
+# Stock
+# Minutes a limited item stays reserved after being added to a cart
+# (0 = no reservations, stock is only checked at checkout).
+STOCK_RESERVATION_MINUTES = int(os.environ.get("STOCK_RESERVATION_MINUTES", "0"))
+
+# Cart
+# anonymous carts live in a signed cookie, logged-in carts in CartLine
+CART_COOKIE_NAME = "mirage_cart"
+CART_COOKIE_AGE = 60 * 60 * 24 * 30
+CART_MAX_LINES = 100
+
+# Customer order history: orders per page
+ORDER_HISTORY_PAGE_SIZE = 50
+
+# Site management lists (items, users): rows per page
+ADMIN_PAGE_SIZE = 50
+
+# Performance numbers (core.perf, shown on manage/perf/)
+PERF_ENABLED = os.environ.get("PERF_ENABLED", "True") == "True"
+# fraction of requests measured
+PERF_SAMPLE_RATE = float(os.environ.get("PERF_SAMPLE_RATE", "1.0"))
+PERF_WINDOW_MINUTES = 60
+PERF_SERVER_TIMING = True
+
+# Roles
+# seconds a user's group names stay cached for role_required
+ROLE_CACHE_TIMEOUT = 60
@@ -15,6 +15,7 @@ urlpatterns = [
 
     # Cart routes
     path("cart/", core_views.view_cart, name="view_cart"),
+    path("cart/json/", core_views.cart_json, name="cart_json"),
     path("cart/add/<int:item_id>/", core_views.add_to_cart, name="add_to_cart"),
     path("cart/decrement/<int:item_id>/", core_views.decrement_cart_item, name="decrement_cart_item"),
     path("cart/remove/<int:item_id>/", core_views.remove_from_cart, name="remove_from_cart"),
@@ -23,5 +24,7 @@ urlpatterns = [
 
     # Pages
     path("catalogue/", core_views.catalogue, name="catalogue"),
+    path("catalogue/json/", core_views.catalogue_json, name="catalogue_json"),
+    path("item/<int:item_id>/", core_views.item_detail, name="item_detail"),
     path("", core_views.home, name="home"),
 ]
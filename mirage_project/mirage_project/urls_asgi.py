@@ -0,0 +1,19 @@
+"""
+URLs of the ASGI profile (settings.ASYNC_VIEWS): the same routes as
+mirage_project.urls, with the read-heavy pages served by their async
+versions (core.views_async). Listed first, so they win the match.
+"""
+from django.urls import path
+
+from core import views_async
+
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path("cart/", views_async.view_cart, name="view_cart"),
+    path("cart/json/", views_async.cart_json, name="cart_json"),
+    path("catalogue/", views_async.catalogue, name="catalogue"),
+    path("catalogue/json/", views_async.catalogue_json, name="catalogue_json"),
+    path("item/<int:item_id>/", views_async.item_detail, name="item_detail"),
+    path("", views_async.home, name="home"),
+] + sync_urlpatterns